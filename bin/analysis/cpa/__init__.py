@@ -26,6 +26,9 @@ from . constraintextractor import ExtractDataflow
 from . constraints import AssignmentConstraint, DirectCallConstraint
 
 from . import codecloner
+from . import worklist
+
+import config
 
 # Only used for creating return variables
 from language.python import ast
@@ -65,7 +68,7 @@ def foldFunctionIR(extractor, func, vargs=(), kargs={}):
 ###############################
 
 class InterproceduralDataflow(object):
-	def __init__(self, compiler, graph, opPathLength, clone):
+	def __init__(self, compiler, graph, opPathLength, clone, callPath=None):
 		self.decompileTime = 0
 		self.console   = compiler.console
 		self.extractor = compiler.extractor
@@ -80,7 +83,13 @@ class InterproceduralDataflow(object):
 		self.constraints = []
 
 		# The worklist
-		self.dirty = collections.deque()
+		if config.cpaOrderedWorklist:
+			self.dirty = worklist.OrderedWorklist(self, config.cpaCollapseCycles)
+		else:
+			self.dirty = collections.deque()
+
+		# Should constraints only process values they have not seen before?
+		self.differential = config.cpaDifferentialPropagation
 
 		self.canonical = graph.canonical
 		self._canonicalContext = util.canonical.CanonicalCache(base.AnalysisContext)
@@ -90,6 +99,9 @@ class InterproceduralDataflow(object):
 		self.opPathLength = opPathLength
 		self.cache = {}
 
+		# If set, decides how many ops are remembered for each code, instead.
+		self.callPath = callPath
+
 		# Information for contextual operations.
 		self.opAllocates      = collections.defaultdict(set)
 		self.opReads          = collections.defaultdict(set)
@@ -130,10 +142,12 @@ class InterproceduralDataflow(object):
 
 		return self.cache.setdefault(path, path)
 
-	def advanceOpPath(self, original, op):
+	def advanceOpPath(self, original, op, code):
 		assert not isinstance(op, canonicalobjects.OpContext)
 
-		if self.opPathLength == 0:
+		if self.callPath is not None:
+			path = self.callPath.advance(self, original, op, code)
+		elif self.opPathLength == 0:
 			path = None
 		elif self.opPathLength == 1:
 			path = op
@@ -141,6 +155,7 @@ class InterproceduralDataflow(object):
 			path = original[1:]+(op,)
 
 		return self.cache.setdefault(path, path)
+
 	def ensureLoaded(self, obj):
 		# TODO the timing is no longer guaranteed, as the store graph bypasses this...
 		start = time.clock()
@@ -187,7 +202,7 @@ class InterproceduralDataflow(object):
 		assert code.isCode(), type(code)
 
 		sig     = self._signature(code, selfparam, params)
-		opPath  = self.advanceOpPath(srcOp.context.opPath, srcOp.op)
+		opPath  = self.advanceOpPath(srcOp.context.opPath, srcOp.op, code)
 
 		if code.annotation.primitive:
 			# Call path does not matter.
@@ -518,22 +533,52 @@ class InterproceduralDataflow(object):
 	def slotMemory(self):
 		return self.storeGraph.setManager.memory()
 
+	def contextsPerCode(self):
+		counts = collections.defaultdict(int)
+		for context in self.liveContexts:
+			counts[context.signature.code] += 1
+		return counts
+
+	def dumpContextsPerCode(self, limit=10):
+		counts = self.contextsPerCode()
+		ranked = sorted(counts.iteritems(), key=lambda (code, count): count, reverse=True)
+
+		for code, count in ranked[:limit]:
+			if count <= 1: break
+			if self.callPath is not None:
+				self.console.output("    %5d  %s (depth %d)" % (count, code.codeName(), self.callPath.codeDepth(code)))
+			else:
+				self.console.output("    %5d  %s" % (count, code.codeName()))
+
 	def dumpSolveInfo(self):
 		console = self.console
+		console.count('constraints', len(self.constraints))
+		console.count('contexts', len(self.liveContexts))
+		console.count('code', len(self.liveCode))
+
 		console.output("Constraints:   %d" % len(self.constraints))
 		console.output("Contexts:      %d" % len(self.liveContexts))
 		console.output("Code:          %d" % len(self.liveCode))
 		console.output("Contexts/Code: %.1f" % (float(len(self.liveContexts))/max(len(self.liveCode), 1)))
+		self.dumpContextsPerCode()
 		console.output("Slot Memory:   %s" % formatting.memorySize(self.slotMemory()))
+		if hasattr(self.storeGraph.setManager, 'frozensetMemory'):
+			console.output("As frozensets: %s" % formatting.memorySize(self.storeGraph.setManager.frozensetMemory()))
 		console.output('')
 		console.output("Decompile:     %s" % formatting.elapsedTime(self.decompileTime))
+		console.output("Decompiler:    %s" % formatting.elapsedTime(self.extractor.decompileTime))
+		if self.extractor.codeCache is not None:
+			console.output("Code cache:    %s" % self.extractor.codeCache.status())
 		console.output("Solve:         %s" % formatting.elapsedTime(self.solveTime))
+		if isinstance(self.dirty, worklist.OrderedWorklist):
+			console.output("Reorders:      %d" % self.dirty.reorders)
+			console.output("Copy cycles:   %d" % self.dirty.collapsed)
 		console.output('')
 
 
-def evaluateWithImage(compiler, prgm, opPathLength=0, firstPass=True, clone=False):
+def evaluateWithImage(compiler, prgm, opPathLength=0, firstPass=True, clone=False, callPath=None):
 	with compiler.console.scope('cpa analysis'):
-		dataflow = InterproceduralDataflow(compiler, prgm.storeGraph, opPathLength, clone)
+		dataflow = InterproceduralDataflow(compiler, prgm.storeGraph, opPathLength, clone, callPath)
 		dataflow.firstPass = firstPass # HACK for debugging
 
 		for entryPoint, args in prgm.entryPoints:
@@ -557,6 +602,6 @@ def evaluateWithImage(compiler, prgm, opPathLength=0, firstPass=True, clone=Fals
 
 		return dataflow
 
-def evaluate(compiler, prgm, opPathLength=0, firstPass=True):
+def evaluate(compiler, prgm, opPathLength=0, firstPass=True, callPath=None):
 	simpleimagebuilder.build(compiler, prgm)
-	return evaluateWithImage(compiler, prgm, opPathLength, firstPass)
+	return evaluateWithImage(compiler, prgm, opPathLength, firstPass, callPath=callPath)
@@ -0,0 +1,128 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Adaptive call-path sensitivity.
+# Instead of remembering the same number of call sites for every context,
+# each code gets its own depth.  The analysis starts out insensitive to the
+# call path.  After each solve, the code containing an imprecise call is
+# made one call site deeper, and the analysis is run again.
+# A call is imprecise if it may invoke more than one code, or if it invokes
+# a descriptive stub (an intrinsic) with more than one signature.
+# Once the context budget is spent, new contexts stop distinguishing call paths.
+
+import collections
+
+import analysis.cpa
+
+class CallPathPolicy(object):
+	def __init__(self, maxDepth, budget=0):
+		self.maxDepth = maxDepth
+		self.budget   = budget
+		self.depth    = {}
+
+		# Set when the context budget runs out.
+		self.exhausted = False
+
+	def codeDepth(self, code):
+		return self.depth.get(code, 0)
+
+	def advance(self, sys, original, op, code):
+		depth = self.depth.get(code, 0)
+
+		if depth == 0:
+			return None
+
+		if self.budget and len(sys.liveContexts) >= self.budget:
+			self.exhausted = True
+			return None
+
+		if original is None:
+			original = ()
+
+		return (original+(op,))[-depth:]
+
+	def deepen(self, code, depth, callers):
+		# A context can only remember as many call sites as its caller remembers, plus one.
+		pending = [(code, depth)]
+		changed = False
+
+		while pending:
+			code, depth = pending.pop()
+			if depth <= self.depth.get(code, 0):
+				continue
+
+			self.depth[code] = depth
+			changed = True
+
+			if depth > 1:
+				for caller in callers[code]:
+					pending.append((caller, depth-1))
+
+		return changed
+
+	def refine(self, sys):
+		if self.exhausted:
+			return False
+
+		callers = collections.defaultdict(set)
+		targets = collections.defaultdict(lambda: collections.defaultdict(set))
+
+		for cop, dsts in sys.opInvokes.iteritems():
+			for dst in dsts:
+				callers[dst.code].add(cop.code)
+				targets[(cop.code, cop.op)][dst.code].add(dst.context.signature)
+
+		changed = False
+		for (code, op), lut in targets.iteritems():
+			if not impreciseCall(lut):
+				continue
+
+			depth = self.depth.get(code, 0)
+			if depth < self.maxDepth:
+				changed |= self.deepen(code, depth+1, callers)
+
+		return changed
+
+	def dumpInfo(self, console):
+		histogram = collections.defaultdict(int)
+		for depth in self.depth.itervalues():
+			histogram[depth] += 1
+
+		console.output("Call path depths: %s" % ", ".join(["%d:%d" % item for item in sorted(histogram.iteritems())]))
+		if self.exhausted:
+			console.output("Context budget of %d exhausted." % self.budget)
+
+def impreciseCall(lut):
+	if len(lut) > 1:
+		return True
+
+	for code, signatures in lut.iteritems():
+		if code.annotation.descriptive and len(signatures) > 1:
+			return True
+
+	return False
+
+def evaluate(compiler, prgm, maxDepth, budget=0, firstPass=False):
+	policy = CallPathPolicy(maxDepth, budget)
+
+	with compiler.console.scope('adaptive'):
+		while True:
+			dataflow = analysis.cpa.evaluate(compiler, prgm, 0, firstPass, callPath=policy)
+
+			if not policy.refine(dataflow):
+				break
+
+		policy.dumpInfo(compiler.console)
+
+	return dataflow
@@ -74,20 +74,47 @@ class Constraint(object):
 			console.output('')
 
 class CachedConstraint(Constraint):
-	__slots__ = 'observing', 'cache'
+	__slots__ = 'observing', 'cache', 'seen'
+
+	# Can this constraint be updated with only the new combinations of values?
+	differential = True
+
 	def __init__(self, sys, *args):
 		self.observing = args
 		self.cache = set()
+		self.seen  = None
 
 		Constraint.__init__(self, sys)
 
 	def update(self):
 		values = [slotRefs(slot) for slot in self.observing]
 
-		for args in itertools.product(*values):
-			if not args in self.cache:
-				self.cache.add(args)
-			self.concreteUpdate(*args)
+		if self.differential and self.sys.differential:
+			self.differentialUpdate(values)
+		else:
+			for args in itertools.product(*values):
+				if not args in self.cache:
+					self.cache.add(args)
+				self.concreteUpdate(*args)
+
+	def differentialUpdate(self, values):
+		seen = self.seen
+
+		if seen is None:
+			for args in itertools.product(*values):
+				self.concreteUpdate(*args)
+		else:
+			# Each new combination is processed exactly once:
+			# for the first argument with a new value, the arguments
+			# before it take old values, and the arguments after it take any value.
+			for i, current in enumerate(values):
+				new = [value for value in current if value not in seen[i]]
+				if new:
+					for args in itertools.product(*(seen[:i]+[new]+values[i+1:])):
+						self.concreteUpdate(*args)
+
+		# The reference sets are immutable, so they do not need to be copied.
+		self.seen = values
 
 	def attach(self):
 		self.sys.constraint(self)
@@ -111,19 +138,33 @@ class CachedConstraint(Constraint):
 	def writes(self):
 		return (self.target,)
 
+# A cycle of assignments, where all the slots must end up with the same values.
+class CopyCycle(object):
+	__slots__ = 'slots'
+	def __init__(self, slots):
+		self.slots = slots
+
+	def update(self, source):
+		for i, slot in enumerate(self.slots):
+			self.slots[i] = slot.update(source)
+
 class AssignmentConstraint(Constraint):
-	__slots__ = 'sourceslot', 'destslot'
+	__slots__ = 'sourceslot', 'destslot', 'cycle'
 	def __init__(self, sys, sourceslot, destslot):
 		assert isinstance(sourceslot, storegraph.SlotNode), sourceslot
 		assert isinstance(destslot, storegraph.SlotNode), destslot
 
 		self.sourceslot = sourceslot
 		self.destslot   = destslot
+		self.cycle      = None
 
 		Constraint.__init__(self, sys)
 
 	def update(self):
-		self.destslot = self.destslot.update(self.sourceslot)
+		if self.cycle is not None:
+			self.cycle.update(self.sourceslot)
+		else:
+			self.destslot = self.destslot.update(self.sourceslot)
 
 	def attach(self):
 		self.sys.constraint(self)
@@ -363,6 +404,9 @@ class SimpleCheckConstraint(Constraint):
 # Resolves the type of the expression, varg, and karg
 class AbstractCallConstraint(CachedConstraint):
 	__slots__ = 'op', 'selfarg', 'args', 'kwds', 'vargs', 'kargs', 'targets'
+
+	# The length of vargs is not observed, so old combinations must be revisited.
+	differential = False
 	def __init__(self, sys, op, selfarg, args, kwds, vargs, kargs, targets):
 		assert isinstance(op, canonicalobjects.OpContext), type(op)
 		assert isinstance(args, (list, tuple)), args
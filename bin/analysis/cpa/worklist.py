@@ -0,0 +1,122 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A worklist for the CPA solver that processes constraints in the
+# topological order of the strongly connected components of the
+# constraint graph.  Constraints are created while solving, so the order
+# is recomputed whenever the number of constraints has doubled.
+# Constraints created in between are ranked with the constraint that
+# created them.
+
+import heapq
+import collections
+
+from PADS.StrongConnectivity import StronglyConnectedComponents
+
+from . import constraints
+
+# Constraints are processed in the order they are added, until there are this many.
+minimumRanked = 64
+
+class OrderedWorklist(object):
+	def __init__(self, sys, collapseCycles=False):
+		self.sys  = sys
+		self.heap = []
+		self.rank = {}
+		self.uid  = 0
+
+		self.currentRank = 0
+		self.rankedCount = 0
+
+		self.collapseCycles = collapseCycles
+
+		# Statistics
+		self.reorders  = 0
+		self.collapsed = 0
+
+	def __len__(self):
+		return len(self.heap)
+
+	def append(self, constraint):
+		rank = self.rank.get(constraint)
+		if rank is None:
+			rank = self.currentRank
+			self.rank[constraint] = rank
+
+		heapq.heappush(self.heap, (rank, self.uid, constraint))
+		self.uid += 1
+
+	def popleft(self):
+		if len(self.sys.constraints) >= 2*self.rankedCount+minimumRanked:
+			self.reorder()
+
+		rank, uid, constraint = heapq.heappop(self.heap)
+		self.currentRank = rank
+		return constraint
+
+	def constraintGraph(self):
+		readers = collections.defaultdict(list)
+		for c in self.sys.constraints:
+			for slot in c.reads():
+				if slot is not None and hasattr(slot, 'getForward'):
+					readers[slot.getForward()].append(c)
+
+		G = {}
+		for c in self.sys.constraints:
+			nexts = set()
+			for slot in c.writes():
+				if slot is not None and hasattr(slot, 'getForward'):
+					nexts.update(readers.get(slot.getForward(), ()))
+			G[c] = nexts
+		return G
+
+	def reorder(self):
+		G = self.constraintGraph()
+
+		# Components are found in reverse topological order.
+		components = list(StronglyConnectedComponents(G))
+		components.reverse()
+
+		rank = {}
+		for i, component in enumerate(components):
+			for c in component:
+				rank[c] = i
+
+			if self.collapseCycles and len(component) > 1:
+				self.collapseCopyCycle(component)
+
+		self.rank = rank
+		self.rankedCount = len(self.sys.constraints)
+		self.reorders += 1
+
+		# Re-rank the pending constraints.
+		self.heap = [(rank[c], uid, c) for _rank, uid, c in self.heap]
+		heapq.heapify(self.heap)
+
+	def collapseCopyCycle(self, component):
+		# In a cycle consisting only of copies, all the slots must end
+		# up with the same values.  Make each copy update every slot in
+		# the cycle at once, instead of one hop at a time.
+		slots = []
+		for c in component:
+			if type(c) is not constraints.AssignmentConstraint:
+				return
+			slots.append(c.sourceslot)
+			slots.append(c.destslot)
+
+		cycle = constraints.CopyCycle(slots)
+		for c in component:
+			c.cycle = cycle
+
+		self.collapsed += 1
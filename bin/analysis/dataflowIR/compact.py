@@ -0,0 +1,244 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A frozen, integer indexed view of a dataflow graph.
+# Every node reachable from the roots of the graph gets a dense ID, in
+# breadth first order.  The edges are stored as CSR arrays: the successors
+# of node i are forwardEdges[forwardStart[i]:forwardStart[i+1]], and the
+# predecessors are stored the same way in the reverse arrays.  The kind
+# of each node, and a few flags the transforms need, are stored in arrays
+# indexed by the same ID.
+#
+# Freezing calls forward() once per node, and costs about as much as one
+# traversal of the object graph, so a view pays off when it is shared by
+# several passes.  The reverse edges are found when first needed, by
+# transposing the forward edges.  This relies on the graph being well
+# formed: each use of a slot is mirrored by a read of the op.
+# The traversals run over the arrays, and return the original nodes, so
+# their results apply directly to the mutable graph.  Transforming the
+# graph invalidates the view.
+
+from array import array
+
+from . import graph
+
+ENTRY, EXIT, GENERIC, GATE, MERGE, SPLIT, LOCAL, FIELD, PREDICATE, EXISTING, NULL = range(11)
+
+kindLUT = {
+	graph.Entry:ENTRY, graph.Exit:EXIT, graph.GenericOp:GENERIC,
+	graph.Gate:GATE, graph.Merge:MERGE, graph.Split:SPLIT,
+	graph.LocalNode:LOCAL, graph.FieldNode:FIELD, graph.PredicateNode:PREDICATE,
+	graph.ExistingNode:EXISTING, graph.NullNode:NULL,
+	}
+
+opKinds = frozenset([ENTRY, EXIT, GENERIC, GATE, MERGE, SPLIT])
+
+# Flags
+OP          = 1
+LOAD        = 2
+PASSTHROUGH = 4 # A field defined by the entry.
+
+def nodeFlags(node, kind):
+	if kind == GENERIC:
+		return LOAD if node.isLoad() else 0
+	elif kind == FIELD:
+		return PASSTHROUGH if node.defn is not None and node.defn.isEntry() else 0
+	return 0
+
+class CompactGraph(object):
+	__slots__ = ('dataflow', 'nodes', 'index', 'kinds', 'flags',
+		'forwardStart', 'forwardEdges', '_reverseStart', '_reverseEdges',
+		'roots', 'exit')
+
+	def __init__(self, dataflow):
+		self.dataflow = dataflow
+		self.nodes    = []
+		self.index    = {}
+
+		# The roots of the graph, in the order the traversals mark them.
+		roots = [dataflow.entry]
+		roots.extend(dataflow.existing.itervalues())
+		roots.append(dataflow.null)
+		roots.append(dataflow.entryPredicate)
+		self.roots = array('l', [self.number(root) for root in roots if root is not None])
+
+		self.build()
+
+		self.exit = self.index.get(dataflow.exit, -1)
+
+		# Only liveness needs the reverse edges, so they are found on demand.
+		self._reverseStart = None
+		self._reverseEdges = None
+
+	def number(self, node):
+		i = self.index.get(node)
+		if i is None:
+			i = len(self.nodes)
+			self.index[node] = i
+			self.nodes.append(node)
+		return i
+
+	def build(self):
+		nodes = self.nodes
+		index = self.index
+		edges = []
+		start = [0]
+
+		# The node list grows as new successors are numbered.
+		# This loop is most of the cost of freezing, so it is kept lean.
+		i = 0
+		while i < len(nodes):
+			for child in nodes[i].forward():
+				j = index.get(child)
+				if j is None:
+					if child is None: continue
+					j = len(nodes)
+					index[child] = j
+					nodes.append(child)
+				edges.append(j)
+			start.append(len(edges))
+			i += 1
+
+		self.forwardStart = array('l', start)
+		self.forwardEdges = array('l', edges)
+
+		kinds = map(kindLUT.__getitem__, map(type, nodes))
+		flags = [OP if kind in opKinds else 0 for kind in kinds]
+		for i, kind in enumerate(kinds):
+			if kind == GENERIC or kind == FIELD:
+				flags[i] |= nodeFlags(nodes[i], kind)
+
+		self.kinds = array('b', kinds)
+		self.flags = array('b', flags)
+
+	def transpose(self):
+		# A counting sort of the edges by destination, which keeps the
+		# predecessors of each node in order.
+		count = len(self.nodes)
+		edges = self.forwardEdges.tolist()
+		start = self.forwardStart.tolist()
+
+		reverseStart = [0]*(count+1)
+		for j in edges:
+			reverseStart[j+1] += 1
+
+		total = 0
+		for i in xrange(count+1):
+			total += reverseStart[i]
+			reverseStart[i] = total
+
+		fill = reverseStart[:count]
+		reverseEdges = [0]*len(edges)
+		k = 0
+		for i in xrange(count):
+			end = start[i+1]
+			while k < end:
+				j = edges[k]
+				reverseEdges[fill[j]] = i
+				fill[j] += 1
+				k += 1
+
+		self._reverseStart = array('l', reverseStart)
+		self._reverseEdges = array('l', reverseEdges)
+
+	@property
+	def reverseStart(self):
+		if self._reverseStart is None: self.transpose()
+		return self._reverseStart
+
+	@property
+	def reverseEdges(self):
+		if self._reverseEdges is None: self.transpose()
+		return self._reverseEdges
+
+	def __len__(self):
+		return len(self.nodes)
+
+	def successors(self, i):
+		return self.forwardEdges[self.forwardStart[i]:self.forwardStart[i+1]]
+
+	def predecessors(self, i):
+		return self.reverseEdges[self.reverseStart[i]:self.reverseStart[i+1]]
+
+	def thaw(self, ids):
+		# Maps node IDs back to the nodes of the mutable graph.
+		nodes = self.nodes
+		return [nodes[i] for i in ids]
+
+	def order(self):
+		# The same order analysis.dataflowIR.ordering finds: ops in reverse postorder.
+		count = len(self.nodes)
+		start = self.forwardStart
+		edges = self.forwardEdges
+		flags = self.flags
+
+		enqueued = bytearray(count)
+		visited  = bytearray(count)
+		stack    = []
+		order    = []
+
+		for i in self.roots:
+			if not enqueued[i]:
+				enqueued[i] = 1
+				stack.append(i)
+
+		while stack:
+			i = stack.pop()
+			if not visited[i]:
+				visited[i] = 1
+				stack.append(i)
+				for k in xrange(start[i], start[i+1]):
+					j = edges[k]
+					if not enqueued[j]:
+						enqueued[j] = 1
+						stack.append(j)
+			elif flags[i] & OP:
+				order.append(i)
+
+		order.reverse()
+		return self.thaw(order)
+
+	def live(self):
+		# The nodes the exit depends on.  Fields that only bridge the entry
+		# to the exit are not live.
+		if self.exit < 0:
+			return set()
+
+		start = self.reverseStart
+		edges = self.reverseEdges
+		flags = self.flags
+		kinds = self.kinds
+
+		live  = bytearray(len(self.nodes))
+		stack = [self.exit]
+		live[self.exit] = 1
+
+		while stack:
+			i = stack.pop()
+			skip = PASSTHROUGH if kinds[i] == EXIT else 0
+			for k in xrange(start[i], start[i+1]):
+				j = edges[k]
+				if not live[j] and not flags[j] & skip:
+					live[j] = 1
+					stack.append(j)
+
+		nodes = self.nodes
+		return set([nodes[i] for i in xrange(len(nodes)) if live[i]])
+
+	def loads(self):
+		flags = self.flags
+		return self.thaw([i for i in xrange(len(self.nodes)) if flags[i] & LOAD])
+
+def freeze(dataflow):
+	return CompactGraph(dataflow)
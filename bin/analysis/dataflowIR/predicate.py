@@ -98,12 +98,18 @@ class PredicateGraphBuilder(TypeDispatcher):
 				src = prev.defn.read
 				self.pg.depends(src, dst)
 
-	def process(self, dataflow):
+	def process(self, dataflow, frozen=None):
 		self.pg.entry = dataflow.entryPredicate.canonical()
-		dfs(dataflow, self)
+
+		if frozen is not None:
+			for node in frozen.nodes:
+				self(node)
+		else:
+			dfs(dataflow, self)
+
 		self.pg.finalize()
 		return self.pg
 
-def buildPredicateGraph(dataflow):
+def buildPredicateGraph(dataflow, frozen=None):
 	pgb = PredicateGraphBuilder()
-	return pgb.process(dataflow)
+	return pgb.process(dataflow, frozen)
@@ -14,7 +14,7 @@
 
 from analysis.dataflowIR import graph
 from analysis.dataflowIR import predicate
-from analysis.dataflowIR.traverse import dfs
+from analysis.dataflowIR import compact
 
 def findLoadSrc(g):
 	for node in g.heapReads.itervalues():
@@ -82,22 +82,14 @@ def attemptTransform(g, pg):
 	return False
 
 
-def collectLoads(dataflow):
-	loads = set()
-
-	def collect(node):
-		if isinstance(node, graph.GenericOp) and node.isLoad():
-			loads.add(node)
-
-	dfs(dataflow, collect)
-
-	return loads
-
-
 def evaluateDataflow(dataflow):
-	pg = predicate.buildPredicateGraph(dataflow)
+	# The predicate graph and the loads are both found from one frozen view.
+	# The view cannot outlive this pass, as the transform redirects nodes.
+	frozen = compact.freeze(dataflow)
+
+	pg = predicate.buildPredicateGraph(dataflow, frozen)
 
-	loads = collectLoads(dataflow)
+	loads = frozen.loads()
 
 	print "LOADS", len(loads)
 
@@ -16,15 +16,21 @@ import os.path
 import pydot
 import util.graphalgorithim.dominator
 from analysis.dump import dumputil
-from util.application.async import *
 from util.io import filesystem
 
 def dumpGraph(directory, name, format, g, prog='dot'):
+	# Graphviz is slow, so it is skipped if the graph has not changed since the last dump.
+	source = g.to_string()
+	if os.path.exists(filesystem.join(directory, name, format)) and os.path.exists(filesystem.join(directory, name, 'dot')):
+		if filesystem.fileHash(directory, name, 'dot') == filesystem.dataHash(source):
+			return False
+
 	s = g.create(prog=prog, format=format)
 	filesystem.writeBinaryData(directory, name, format, s)
+	filesystem.writeData(directory, name, 'dot', source)
+	return True
 
-@async
-def dump(compiler, liveInvoke, links, reportDir):
+def dump(compiler, liveInvoke, links, reportDir, queue):
 	# Filter out primitive nodes
 	def keepCode(code):
 		return code is None or not code.annotation.primitive
@@ -45,6 +51,15 @@ def dump(compiler, liveInvoke, links, reportDir):
 			#concentrate=True,
 			)
 
+	# Name the nodes after their report files, so the graph is the same from dump to dump.
+	def nodeName(code):
+		if code is None:
+			return 'entry'
+		link = links.codeRef(code, None)
+		if link is None:
+			return "c%d" % id(code)
+		return os.path.splitext(link)[0]
+
 	# Create nodes
 	def makeNode(tree, sg, node):
 		if node is not None:
@@ -58,16 +73,16 @@ def dump(compiler, liveInvoke, links, reportDir):
 				nodecolor = '#BBBBBB'
 			else:
 				nodecolor = '#33FF33'
-			sg.add_node(pydot.Node(str(id(node)), label=dumputil.codeShortName(code),
+			sg.add_node(pydot.Node(nodeName(node), label=dumputil.codeShortName(code),
 				shape='box', style="filled", fontsize=8,
 				fillcolor=nodecolor, URL=links.codeRef(node, None)))
 		else:
-			sg.add_node(pydot.Node(str(id(node)), label="entry",
+			sg.add_node(pydot.Node(nodeName(node), label="entry",
 				shape='point', style="filled", fontsize=8))
 
 		children = tree.get(node)
 		if children:
-			csg = pydot.Cluster(str(id(node)))
+			csg = pydot.Cluster(nodeName(node))
 			sg.add_subgraph(csg)
 			for child in children:
 				makeNode(tree, csg, child)
@@ -82,7 +97,7 @@ def dump(compiler, liveInvoke, links, reportDir):
 				weight = 10
 			else:
 				weight = 1
-			g.add_edge(pydot.Edge(str(id(src)), str(id(dst)), weight=weight))
+			g.add_edge(pydot.Edge(nodeName(src), nodeName(dst), weight=weight))
 
 	# Output
-	dumpGraph(reportDir, 'invocations', 'svg', g)
+	queue.add(dumpGraph, reportDir, 'invocations', 'svg', g)
@@ -18,8 +18,11 @@ from util.asttools import astpprint
 from util.asttools.origin import originString
 
 import config
+import os
 import os.path
-from util.io.filesystem import ensureDirectoryExists
+import multiprocessing
+from cStringIO import StringIO
+from util.io.filesystem import ensureDirectoryExists, writeFileIfChanged
 
 from analysis import programculler
 
@@ -86,12 +89,16 @@ def makeReportDirectory(moduleName):
 
 	return reportdir
 
-def makeOutput(reportDir, filename):
-	fullpath = os.path.join(reportDir, filename)
-	fout = open(fullpath, 'w')
-	out = XMLOutput(fout)
+def makeOutput():
+	buffer = StringIO()
+	out = XMLOutput(buffer)
 	scg = simplecodegen.SimpleCodeGen(out) # HACK?
-	return out, scg
+	return out, scg, buffer
+
+def writePage(reportDir, filename, data):
+	# Pages that have not changed since the last dump are left alone.
+	name, ext = os.path.splitext(filename)
+	return writeFileIfChanged(reportDir, name, ext[1:], data)
 
 def dumpHeader(out):
 	out << "["
@@ -141,10 +148,12 @@ def tableRow(out, links, label, *args):
 	out.end('tr')
 	out.endl()
 
-#@async_limited(2)
-def dumpFunctionInfo(func, compiler, derived, links, reportDir):
-	out, scg = makeOutput(reportDir, links.functionFile[func])
+def dumpFunctionInfo(func, compiler, derived, links):
+	out, scg, buffer = makeOutput()
+	writeFunctionInfo(out, scg, func, compiler, derived, links)
+	return buffer.getvalue()
 
+def writeFunctionInfo(out, scg, func, compiler, derived, links):
 	dumpHeader(out)
 
 	code = func
@@ -434,10 +443,12 @@ def dumpFunctionInfo(func, compiler, derived, links, reportDir):
 	out.endl()
 	out.close()
 
-#@async_limited(2)
-def dumpHeapInfo(heap, compiler, heapContexts, links, reportDir):
-	out, scg = makeOutput(reportDir, links.objectFile[heap])
+def dumpHeapInfo(heap, compiler, heapContexts, links):
+	out, scg, buffer = makeOutput()
+	writeHeapInfo(out, heap, compiler, heapContexts, links)
+	return buffer.getvalue()
 
+def writeHeapInfo(out, heap, compiler, heapContexts, links):
 	dumpHeader(out)
 
 	out.begin('h3')
@@ -533,7 +544,7 @@ def dumpReport(name, compiler, prgm, derived, liveInvocations, liveHeap, heapCon
 
 	liveHeap = set(heapContexts.keys()) # TODO elo,omate?
 
-	out, scg = makeOutput(reportDir, 'function_index.html')
+	out, scg, buffer = makeOutput()
 	dumpHeader(out)
 
 	out.begin('h2')
@@ -565,8 +576,9 @@ def dumpReport(name, compiler, prgm, derived, liveInvocations, liveHeap, heapCon
 			out.endl()
 
 	printChildren(head)
+	writePage(reportDir, 'function_index.html', buffer.getvalue())
 
-	out, scg = makeOutput(reportDir, 'object_index.html')
+	out, scg, buffer = makeOutput()
 	dumpHeader(out)
 
 	out.begin('h2')
@@ -619,18 +631,75 @@ def dumpReport(name, compiler, prgm, derived, liveInvocations, liveHeap, heapCon
 			print node
 		print
 
-	out.close()
+	writePage(reportDir, 'object_index.html', buffer.getvalue())
+
+	# Name every context before the pages are rendered, so pages rendered
+	# in different processes agree on the anchors.
+	for func in prgm.liveCode:
+		if func.annotation.contexts is not None:
+			for context in func.annotation.contexts:
+				links.contextRef(context)
 
-	with compiler.console.scope('function reports'):
-		for func in prgm.liveCode:
-			dumpFunctionInfo(func, compiler, derived, links, reportDir)
+	for heap in liveHeap:
+		for context in heapContexts[heap]:
+			links.contextRef(context)
 
-	with compiler.console.scope('heap reports'):
-		for heap in liveHeap:
-			dumpHeapInfo(heap, compiler, heapContexts, links, reportDir)
+	pages = [('function', func) for func in prgm.liveCode]
+	pages.extend([('heap', heap) for heap in liveHeap])
+
+	with compiler.console.scope('pages'):
+		state = (compiler, derived, links, heapContexts, pages)
+
+		processes = min(config.dumpProcesses, len(pages))
+		if processes > 1 and hasattr(os, 'fork'):
+			results = renderParallel(state, processes)
+		else:
+			results = [renderPage(state, index) for index in range(len(pages))]
 
+		written = 0
+		for filename, data in results:
+			if writePage(reportDir, filename, data):
+				written += 1
+
+		compiler.console.output("%d pages written, %d unchanged" % (written, len(results)-written))
+
+	# Graphviz is started only once the pages are rendered, as forking the
+	# page renderers while its threads are running may deadlock the children.
 	with compiler.console.scope('graphs'):
-		dumpgraphs.dump(compiler, liveInvocations, links, reportDir)
+		graphs = WorkQueue(config.dumpProcesses)
+		dumpgraphs.dump(compiler, liveInvocations, links, reportDir, graphs)
+		graphs.join(compiler.console, 'graphs')
+
+def renderPage(state, index):
+	compiler, derived, links, heapContexts, pages = state
+	kind, obj = pages[index]
+
+	if kind == 'function':
+		return links.functionFile[obj], dumpFunctionInfo(obj, compiler, derived, links)
+	else:
+		return links.objectFile[obj], dumpHeapInfo(obj, compiler, heapContexts, links)
+
+# The report data, inherited by forked worker processes.
+_reportState = None
+
+def _renderWorker(index):
+	return renderPage(_reportState, index)
+
+def renderParallel(state, processes):
+	global _reportState
+
+	# The pool must be created after the state is set, so the workers inherit it.
+	# Only the rendered pages are sent back.
+	_reportState = state
+	try:
+		pool = multiprocessing.Pool(processes)
+		try:
+			return pool.map(_renderWorker, range(len(state[-1])), 16)
+		finally:
+			pool.close()
+			pool.join()
+	finally:
+		_reportState = None
 
 
 class DerivedData(object):
@@ -131,13 +131,60 @@ class NoValue(object):
 	__slots__ = ()
 noValue = NoValue()
 
+# The default size of the persistent caches of the manager's own functions.
+defaultCacheLimit = 1<<15
+
+class OpCache(object):
+	# The computed table of a tree function.
+	# With a limit of zero, the table is cleared after each call, as the
+	# function may not give the same result for the same nodes next time.
+	# Otherwise the table persists between calls.  The entries keep their
+	# nodes alive, so the table is split into two generations.  When the
+	# current generation fills up, the previous generation is dropped, and the
+	# nodes only it referenced fall out of the manager's weakcache.
+	# Entries found in the previous generation are moved to the current one.
+	__slots__ = 'limit', 'current', 'previous'
+
+	def __init__(self, limit=0):
+		self.limit    = limit
+		self.current  = {}
+		self.previous = {}
+
+	def get(self, key):
+		result = self.current.get(key)
+		if result is None and self.previous:
+			result = self.previous.pop(key, None)
+			if result is not None:
+				self.store(key, result)
+		return result
+
+	def store(self, key, result):
+		result = self.current.setdefault(key, result)
+		if self.limit and len(self.current) >= self.limit:
+			self.previous = self.current
+			self.current  = {}
+		return result
+
+	def finish(self):
+		if not self.limit:
+			self.clear()
+
+	def clear(self):
+		self.current.clear()
+		self.previous.clear()
+
+	def __len__(self):
+		return len(self.current)+len(self.previous)
+
 class UnaryTreeFunction(object):
 	__slots__ = ['manager', 'func', 'cache', 'cacheHit', 'cacheMiss']
 
-	def __init__(self, manager, func):
+	def __init__(self, manager, func, cacheLimit=0):
 		self.manager    = manager
 		self.func       = func
-		self.cache     = {}
+		self.cache     = OpCache(cacheLimit)
+		self.cacheHit  = 0
+		self.cacheMiss = 0
 
 	def compute(self, a):
 		if a.cond.uid == -1:
@@ -151,22 +198,20 @@ class UnaryTreeFunction(object):
 	def _apply(self, a):
 		# See if we've alread computed this.
 		key = a
-		if key in self.cache:
+		result = self.cache.get(key)
+		if result is not None:
 			self.cacheHit += 1
-			return self.cache[key]
+			return result
 		else:
 			self.cacheMiss += 1
 
 		result = self.compute(a)
 
-		return self.cache.setdefault(key, result)
+		return self.cache.store(key, result)
 
 	def __call__(self, a):
-		self.cacheHit  = 0
-		self.cacheMiss = 0
 		result = self._apply(a)
-		#print "%d/%d" % (self.cacheHit, self.cacheHit+self.cacheMiss)
-		self.cache.clear() # HACK don't retain cache between computations?
+		self.cache.finish()
 		return result
 
 class UnaryTreeVisitor(object):
@@ -176,6 +221,8 @@ class UnaryTreeVisitor(object):
 		self.manager    = manager
 		self.func       = func
 		self.cache      = set()
+		self.cacheHit   = 0
+		self.cacheMiss  = 0
 
 	def compute(self, context, a):
 		if a.cond.uid == -1:
@@ -197,11 +244,9 @@ class UnaryTreeVisitor(object):
 		self.cache.add(key)
 
 	def __call__(self, context, a):
-		self.cacheHit  = 0
-		self.cacheMiss = 0
 		result = self._apply(context, a)
-		#print "%d/%d" % (self.cacheHit, self.cacheHit+self.cacheMiss)
-		self.cache.clear() # HACK don't retain cache between computations?
+		# The visit depends on the context, so it cannot be reused by the next call.
+		self.cache.clear()
 		return result
 
 class BinaryTreeFunction(object):
@@ -212,7 +257,7 @@ class BinaryTreeFunction(object):
 
 	def __init__(self, manager, func, symmetric=False, stationary=False,
 			identity=noValue, leftIdentity=noValue, rightIdentity=noValue,
-			null=noValue, leftNull=noValue, rightNull=noValue):
+			null=noValue, leftNull=noValue, rightNull=noValue, cacheLimit=0):
 
 		assert identity is noValue or isinstance(identity, LeafNode)
 		assert leftIdentity is noValue or isinstance(leftIdentity, LeafNode)
@@ -248,7 +293,9 @@ class BinaryTreeFunction(object):
 			self.leftNull  = leftNull
 			self.rightNull = rightNull
 
-		self.cache     = {}
+		self.cache     = OpCache(cacheLimit)
+		self.cacheHit  = 0
+		self.cacheMiss = 0
 
 	def compute(self, a, b):
 		if self.stationary and a is b:
@@ -269,16 +316,17 @@ class BinaryTreeFunction(object):
 	def _apply(self, a, b):
 		# See if we've alread computed this.
 		key = (a, b)
-		if key in self.cache:
+		result = self.cache.get(key)
+		if result is not None:
 			self.cacheHit += 1
-			return self.cache[key]
+			return result
 		else:
 			if self.symmetric:
 				# If the function is symetric, try swaping the arguments.
-				altkey = (b, a)
-				if altkey in self.cache:
+				result = self.cache.get((b, a))
+				if result is not None:
 					self.cacheHit += 1
-					return self.cache[altkey]
+					return result
 
 			self.cacheMiss += 1
 
@@ -297,22 +345,21 @@ class BinaryTreeFunction(object):
 			# Cache miss, no identities, must compute
 			result = self.compute(a, b)
 
-		return self.cache.setdefault(key, result)
+		return self.cache.store(key, result)
 
 	def __call__(self, a, b):
-		self.cacheHit  = 0
-		self.cacheMiss = 0
 		result = self._apply(a, b)
-		#print "%d/%d" % (self.cacheHit, self.cacheHit+self.cacheMiss)
-		self.cache.clear() # HACK don't retain cache between computations?
+		self.cache.finish()
 		return result
 
 class TreeFunction(object):
-	def __init__(self, manager, func, multiout=False):
-		self.manager  = manager
-		self.func     = func
-		self.multiout = multiout
-		self.cache    = {}
+	def __init__(self, manager, func, multiout=False, cacheLimit=0):
+		self.manager   = manager
+		self.func      = func
+		self.multiout  = multiout
+		self.cache     = OpCache(cacheLimit)
+		self.cacheHit  = 0
+		self.cacheMiss = 0
 
 	def compute(self, args):
 		maxcond = max(arg.cond for arg in args)
@@ -339,22 +386,20 @@ class TreeFunction(object):
 	def _apply(self, args):
 		# See if we've alread computed this.
 		key = args
-		if key in self.cache:
+		result = self.cache.get(key)
+		if result is not None:
 			self.cacheHit += 1
-			return self.cache[key]
+			return result
 		else:
 			self.cacheMiss += 1
 
 		result = self.compute(args)
 
-		return self.cache.setdefault(key, result)
+		return self.cache.store(key, result)
 
 	def __call__(self, *args):
-		self.cacheHit  = 0
-		self.cacheMiss = 0
 		result = self._apply(args)
-		#print "%d/%d" % (self.cacheHit, self.cacheHit+self.cacheMiss)
-		self.cache.clear() # HACK don't retain cache between computations?
+		self.cache.finish()
 		return result
 
 
@@ -368,6 +413,14 @@ class CanonicalTreeManager(object):
 
 		self.cache      = {}
 
+	def cacheStats(self):
+		# Hits and misses of the tree functions belonging to this manager, by name.
+		stats = {}
+		for name, value in self.__dict__.iteritems():
+			if isinstance(value, (UnaryTreeFunction, UnaryTreeVisitor, BinaryTreeFunction, TreeFunction)):
+				stats[name] = (value.cacheHit, value.cacheMiss)
+		return stats
+
 	def leaf(self, value):
 		return self.leaves[LeafNode(self.coerce(value))]
 
@@ -515,14 +568,16 @@ def BoolManager(conditions):
 	manager.false = manager.leaf(False)
 
 	manager.and_ = BinaryTreeFunction(manager, lambda l, r: l & r,
-		symmetric=True, stationary=True, identity=manager.true, null=manager.false)
+		symmetric=True, stationary=True, identity=manager.true, null=manager.false,
+		cacheLimit=defaultCacheLimit)
 	manager.or_  = BinaryTreeFunction(manager, lambda l, r: l | r,
-		symmetric=True, stationary=True, identity=manager.false, null=manager.true)
+		symmetric=True, stationary=True, identity=manager.false, null=manager.true,
+		cacheLimit=defaultCacheLimit)
 
-	manager.maybeTrue = UnaryTreeFunction(manager, lambda s: True in s)
+	manager.maybeTrue = UnaryTreeFunction(manager, lambda s: True in s, cacheLimit=defaultCacheLimit)
 
 	# HACK use set operations, so we don't need to create a manager for individual objects?
-	manager.in_       = BinaryTreeFunction(manager, lambda o, s: o.issubset(s))
+	manager.in_       = BinaryTreeFunction(manager, lambda o, s: o.issubset(s), cacheLimit=defaultCacheLimit)
 
 	return manager
 
@@ -532,9 +587,11 @@ def SetManager():
 	manager.empty = manager.leaf(frozenset())
 
 	manager.intersect = BinaryTreeFunction(manager, lambda l, r: l & r,
-		symmetric=True, stationary=True, null=manager.empty)
+		symmetric=True, stationary=True, null=manager.empty,
+		cacheLimit=defaultCacheLimit)
 	manager.union = BinaryTreeFunction(manager, lambda l, r: l | r,
-		symmetric=True, stationary=True, identity=manager.empty)
+		symmetric=True, stationary=True, identity=manager.empty,
+		cacheLimit=defaultCacheLimit)
 
 	manager._flatten = UnaryTreeVisitor(manager, lambda context, s: context.update(s))
 
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os.path
+
+import config
+
 from analysis.cpa import simpleimagebuilder
 from . entrypointbuilder import buildEntryPoint
 from . dump import Dumper
@@ -20,6 +24,7 @@ from . ipanalysis import IPAnalysis
 
 from . memory.extractorpolicy import ExtractorPolicy
 from . memory.storegraphpolicy import DefaultStoreGraphPolicy
+from . summary.cache import SummaryCache
 
 def dumpAnalysisResults(analysis):
 	dumper = Dumper('summaries/ipa')
@@ -32,20 +37,28 @@ def dumpAnalysisResults(analysis):
 
 def evaluateWithImage(compiler, prgm):
 	with compiler.console.scope('ipa analysis'):
-		analysis = IPAnalysis(compiler, prgm.storeGraph.canonical, ExtractorPolicy(compiler.extractor), DefaultStoreGraphPolicy(prgm.storeGraph))
+		if config.useSummaryCache:
+			cache = SummaryCache(compiler.extractor, os.path.join(config.cacheDirectory, 'summaries'))
+		else:
+			cache = None
+
+		analysis = IPAnalysis(compiler, prgm.storeGraph.canonical, ExtractorPolicy(compiler.extractor), DefaultStoreGraphPolicy(prgm.storeGraph), cache)
 		analysis.trace = True
 
 		for ep, args in prgm.entryPoints:
 			buildEntryPoint(analysis, ep, args)
 
-		for i in range(5):
-			analysis.topDown()
-			analysis.bottomUp()
+		rounds = analysis.solve()
 
+		print "%5d rounds" % rounds
 		print "%5d code" % len(analysis.liveCode)
 		print "%5d contexts" % len(analysis.contexts)
 		print "%.2f ms decompile" % (analysis.decompileTime*1000.0)
 
+		if cache is not None:
+			cache.storeAll(analysis)
+			print "Summary cache: %s." % cache.status()
+
 	with compiler.console.scope('ipa dump'):
 		dumpAnalysisResults(analysis)
 
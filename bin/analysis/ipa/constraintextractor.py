@@ -230,9 +230,8 @@ class ConstraintExtractor(TypeDispatcher):
 			self.context.foldObj = self.existingObject(obj)
 
 	### Entry point ###
-	def process(self):
-		code =  self.code
-		self.codeParameters = code.codeParameters()
+	def processParameters(self):
+		self.codeParameters = self.code.codeParameters()
 
 		MarkParameters(self).process(self.codeParameters)
 
@@ -240,6 +239,10 @@ class ConstraintExtractor(TypeDispatcher):
 		if vparam and not vparam.isDoNotCare():
 			self.setupVParam(vparam)
 
+	def process(self):
+		code =  self.code
+		self.processParameters()
+
 		if code.isStandardCode():
 			self(code.ast)
 		else:
@@ -250,3 +253,9 @@ class ConstraintExtractor(TypeDispatcher):
 def evaluate(analysis, context, code):
 	ce = ConstraintExtractor(analysis, context, code)
 	ce.process()
+
+def evaluateParameters(analysis, context, code):
+	# Only the interface of the code, for contexts with a cached summary.
+	ce = ConstraintExtractor(analysis, context, code)
+	ce.processParameters()
+	ce.doFold()
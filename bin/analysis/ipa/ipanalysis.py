@@ -14,6 +14,8 @@
 
 import time
 
+from PADS.StrongConnectivity import StronglyConnectedComponents
+
 from optimization.callconverter import callConverter
 from . import constraintextractor
 
@@ -29,7 +31,7 @@ from . import summary
 from util.monkeypatch import xtypes
 
 class IPAnalysis(object):
-	def __init__(self, compiler, canonical, existingPolicy, externalPolicy):
+	def __init__(self, compiler, canonical, existingPolicy, externalPolicy, summaryCache=None):
 		self.compiler = compiler
 		self.extractor = compiler.extractor
 		self.canonical = canonical
@@ -40,16 +42,24 @@ class IPAnalysis(object):
 		self.objs = {}
 		self.contexts = {}
 
+		self.summaryCache = summaryCache
+
 		self.root = self.getContext(cpa.externalContext)
 		self.root.external = True
 
 		self.liveCode = set()
 
-		self.valuemanager    = setmanager.CachedSetManager()
-		self.criticalmanager = setmanager.CachedSetManager()
+		self.valuemanager    = setmanager.createSetManager()
+		self.criticalmanager = setmanager.createSetManager()
 
 		self.dirtySlots = []
 
+		# Contexts with unresolved calls.
+		self.dirtyCallContexts = []
+
+		# The call graph, in bottom up order.  Rebuilt when invocations are added.
+		self.order = None
+
 		self.decompileTime = 0.0
 
 		self.trace = False
@@ -81,7 +91,8 @@ class IPAnalysis(object):
 			self.contexts[sig] = context
 
 			if sig and sig.code:
-				constraintextractor.evaluate(self, context, sig.code)
+				if self.summaryCache is None or not self.summaryCache.restore(self, context):
+					constraintextractor.evaluate(self, context, sig.code)
 		else:
 			context = self.contexts[sig]
 		return context
@@ -113,12 +124,22 @@ class IPAnalysis(object):
 	def dirtyConstraints(self):
 		return bool(self.dirtySlots)
 
+	def dirtyCalls(self, context):
+		if not context.callsQueued:
+			context.callsQueued = True
+			self.dirtyCallContexts.append(context)
+
+	def invalidateOrder(self):
+		self.order = None
+
 	def updateCallGraph(self):
 		if self.trace: print "update"
 		changed = False
 
-		# HACK dictionary size may change...
-		for context in tuple(self.contexts.itervalues()):
+		# Only the contexts with new calls need to be resolved.
+		while self.dirtyCallContexts:
+			context = self.dirtyCallContexts.pop()
+			context.callsQueued = False
 			changed |= context.updateCallgraph()
 		if self.trace: print
 
@@ -126,58 +147,96 @@ class IPAnalysis(object):
 
 	def updateConstraints(self):
 		#if self.trace: print "resolve"
+		changed = False
 		while self.dirtySlots:
 			slot = self.dirtySlots.pop()
 			slot.propagate()
+			changed = True
 		#if self.trace: print
+		return changed
 
 	def topDown(self):
 		print "top down"
+		changed = False
 		dirty = True
 		while dirty:
-			self.updateConstraints()
-			self.updateCallGraph()
+			changed |= self.updateConstraints()
+			changed |= self.updateCallGraph()
 			dirty = self.dirtyConstraints()
+		return changed
 
 	def propagateCriticals(self, context):
 		while context.dirtycriticals:
 			node = context.dirtycriticals.pop()
 			node.critical.propagate(context, node)
 
-	def contextBottomUp(self, context):
-		if context not in self.processed:
-			self.processed.add(context)
-			self.path.append(context)
+	def callGraphOrder(self):
+		if self.order is None:
+			# Number the contexts reachable from the root, so the order is deterministic.
+			number = {self.root:0}
+			G = {}
+			pending = [self.root]
+			while pending:
+				context = pending.pop()
+				G[context] = []
+				for invoke in context.invokeOut.itervalues():
+					dst = invoke.dst
+					G[context].append(dst)
+					if dst not in number:
+						number[dst] = len(number)
+						pending.append(dst)
+
+			# Components are found in reverse topological order, so callees come first.
+			self.order = []
+			for component in StronglyConnectedComponents(G):
+				contexts = sorted(component, key=lambda context: number[context])
+				recursive = len(contexts) > 1 or contexts[0] in G[contexts[0]]
+				self.order.append((contexts, recursive))
+
+		return self.order
 
-			# Process children first
-			for invoke in context.invokeOut.itervalues():
-				dst = invoke.dst
-				self.contextBottomUp(dst)
-				invoke.apply()
+	def contextBottomUp(self, context):
+		# Apply the callee summaries that changed since they were last applied.
+		for invoke in context.invokeOut.values():
+			invoke.apply()
 
-			self.updateConstraints()
+		self.updateConstraints()
 
-			if context.summary.dirty:
-				self.propagateCriticals(context)
-				objectescape.process(context)
+		if context.summary.dirty:
+			self.propagateCriticals(context)
+			objectescape.process(context)
 
-				summary.update(context)
+			changed = summary.update(context)
 
-				self.updateConstraints() # TODO only once?
+			self.updateConstraints() # TODO only once?
+			return changed
+		else:
+			return False
 
+	def componentBottomUp(self, contexts, recursive):
+		# Recursive contexts are summarized together, until their summaries stop changing.
+		changed = True
+		while changed:
+			changed = False
+			for context in contexts:
+				changed |= self.contextBottomUp(context)
 
-			self.path.pop()
-		else:
-			assert context not in self.path, "Recursive cycle detected in call graph"
+			if not recursive: break
 
 	def bottomUp(self):
 		print "bottom up"
-		self.processed = set()
-		self.path = []
 
-		for context in self.contexts.itervalues():
-			context.summary.fresh = False
+		for contexts, recursive in self.callGraphOrder():
+			self.componentBottomUp(contexts, recursive)
 
-		self.contextBottomUp(self.root)
+		return self.updateCallGraph() or self.dirtyConstraints()
 
-		self.updateCallGraph()
+	def solve(self):
+		# Alternate until the call graph stops growing.
+		rounds = 0
+		changed = True
+		while changed:
+			self.topDown()
+			changed = self.bottomUp()
+			rounds += 1
+		return rounds
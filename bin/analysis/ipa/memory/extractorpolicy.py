@@ -30,10 +30,10 @@ class ExtractorPolicy(object):
 
 		# Extracted from memory
 		if isinstance(obj, program.Object):
-			d = obj.getDict(fieldtype)
+			value = self.extractor.getSlot(obj, fieldtype, fieldname)
 
-			if fieldname in d:
-				xtype = analysis.canonical.existingType(d[fieldname])
+			if value is not None:
+				xtype = analysis.canonical.existingType(value)
 				ao = analysis.objectName(xtype, qualifiers.GLBL)
 				return [ao], False
 
@@ -44,6 +44,9 @@ class Context(object):
 		self.dirtyccalls      = []
 		self.dirtyfcalls      = []
 
+		# Set while the context is queued for updateCallgraph.
+		self.callsQueued = False
+
 		self.invokeIn  = {}
 		self.invokeOut = {}
 
@@ -110,6 +113,7 @@ class Context(object):
 		inv = self.invokeOut.get(key)
 		if inv is None:
 			inv = invocation.Invocation(self, op, dst)
+			self.analysis.invalidateOrder()
 		return inv
 
 
@@ -118,12 +122,15 @@ class Context(object):
 
 	def dirtyCall(self, call):
 		self.dirtycalls.append(call)
+		self.analysis.dirtyCalls(self)
 
 	def dirtyCCall(self, call):
 		self.dirtyccalls.append(call)
+		self.analysis.dirtyCalls(self)
 
 	def dirtyFCall(self, call):
 		self.dirtyfcalls.append(call)
+		self.analysis.dirtyCalls(self)
 
 	def constraint(self, constraint):
 		self.constraints.append(constraint)
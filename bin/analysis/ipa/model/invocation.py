@@ -34,6 +34,9 @@ class Invocation(object):
 
 		self.slotReverse = collections.defaultdict(list)
 
+		# The version of the callee's summary last applied to the caller.
+		self.summaryVersion = 0
+
 	def copyDown(self, obj):
 		if obj not in self.objForward:
 			remapped = self.dst.analysis.objectName(obj.xtype, qualifiers.DN)
@@ -83,8 +86,12 @@ class Invocation(object):
 
 
 	def apply(self):
-		if self.dst.summary.fresh:
-			self.dst.summary.apply(self)
+		summary = self.dst.summary
+		if self.summaryVersion != summary.version:
+			self.summaryVersion = summary.version
+			summary.apply(self)
+			return True
+		return False
 
 	def upwardSlots(self, slot):
 		if slot not in self.slotReverse:
@@ -127,4 +134,6 @@ class Invocation(object):
 		slots = self.upwardSlots(slot)
 
 		for slot in slots:
-			slot.updateValues(objs)
+			if slot.updateValues(objs):
+				# The objects may flow further up, through the caller's summary.
+				self.src.summary.dirty = True
@@ -23,6 +23,9 @@ class SummaryCopy(object):
 	def apply(self, invoke):
 		invoke.applyCopy(self.src, self.dst)
 
+	def key(self):
+		return ('copy', self.src, self.dst)
+
 class SummaryLoad(object):
 	def __init__(self, obj, fieldtype, field, dst):
 		self.obj = obj
@@ -33,6 +36,9 @@ class SummaryLoad(object):
 	def apply(self, invoke):
 		invoke.applyLoad(self.obj, self.fieldtype, self.field, self.dst)
 
+	def key(self):
+		return ('load', self.obj, self.fieldtype, self.field, self.dst)
+
 class Summary(object):
 	def __init__(self):
 		self.slots = {}
@@ -40,13 +46,20 @@ class Summary(object):
 		self.slotObjs = collections.defaultdict(list)
 
 		self.dirty = False
-		self.fresh = False
+
+		# Incremented when the summary changes, so callers know to reapply it.
+		self.version = 0
 
 	def reset(self):
 		self.slots = {}
 		self.ops   = []
 		self.slotObjs = collections.defaultdict(list)
 
+	def signature(self):
+		ops  = frozenset([op.key() for op in self.ops])
+		objs = frozenset([(slot, frozenset(objs)) for slot, objs in self.slotObjs.iteritems()])
+		return ops, objs
+
 	def copy(self, src, dst):
 		self.ops.append(SummaryCopy(src, dst))
 
@@ -90,14 +103,22 @@ class Summary(object):
 def update(context):
 	summary = context.summary
 	if not summary.dirty:
-		return
+		return False
 
 	summary.dirty = False
-	summary.fresh = True
 
-	context.summary.reset() # HACK not incremental
+	old = summary.signature()
+
+	summary.reset() # HACK not incremental
 
 	for param in context.returns:
-		context.summary.handleSlot(context, param)
+		summary.handleSlot(context, param)
 
 	assert not context.criticalStores
+
+	# Rebuilding an unchanged summary should not disturb the callers.
+	if summary.signature() != old:
+		summary.version += 1
+		return True
+	else:
+		return False
@@ -0,0 +1,297 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A persistent cache of context summaries, shared between compiles.
+# A context is keyed on its code, the fingerprints of the functions or
+# files that code came from, and the types in its signature.  Each entry
+# also records the fingerprints of every code the context reached, and is
+# discarded if any of them changed.
+# When a context is restored from the cache, only its parameters are
+# extracted.  It makes no calls, and its summary is applied to its callers
+# as if it had been built by the bottom up pass.
+# Only summaries of objects that can be found again by name are cached.
+
+import os.path
+import cPickle
+
+from util.io import filesystem
+from language.python import ast, program
+from analysis.storegraph import extendedtypes
+from decompiler.codecache import isReferencable
+from application import incremental
+
+from .. calling import cpa
+from .. constraints import qualifiers
+from .. import constraintextractor
+
+# The source that decides what the summaries hold, and how they are cached.
+sources = ['analysis/ipa', 'analysis/storegraph', 'language/python']
+
+class Uncacheable(Exception):
+	pass
+
+def objectRef(obj):
+	if isinstance(obj, program.Object) and isReferencable(obj.pyobj):
+		return ('object', obj.pyobj)
+	elif isinstance(obj, program.AbstractObject) and obj.isAbstract() and isReferencable(obj.type.pyobj):
+		return ('instance', obj.type.pyobj)
+	else:
+		raise Uncacheable, obj
+
+def typeKey(xtype):
+	# Describes a type in a signature.  The key is never decoded, so
+	# allocated types are described by what was allocated, not where.
+	if xtype is None:
+		return None
+	elif xtype is cpa.anyType:
+		return 'any'
+	elif xtype.isExisting():
+		return ('existing', objectRef(xtype.obj))
+	elif xtype.isExternal():
+		return ('external', objectRef(xtype.obj))
+	elif isinstance(xtype, extendedtypes.MethodObjectType):
+		return ('method', typeKey(xtype.func), typeKey(xtype.inst))
+	else:
+		return ('allocated', objectRef(xtype.obj))
+
+def signatureKey(sig):
+	return (typeKey(sig.selfparam), tuple([typeKey(p) for p in sig.params]), tuple([typeKey(p) for p in sig.vparams]))
+
+class SummaryCache(object):
+	def __init__(self, extractor, directory):
+		self.extractor = extractor
+		self.directory = directory
+
+		self.functions = {}
+		self.indexed   = -1
+
+		# Dependencies of each code, and of each restored context's closure.
+		self.codeDependencies = {}
+		self.restored = {}
+
+		self.hits   = 0
+		self.misses = 0
+		self.stored = 0
+		self.uncacheable = 0
+
+	def dependencies(self, code):
+		if code not in self.codeDependencies:
+			callLUT = self.extractor.desc.callLUT
+			if len(callLUT) != self.indexed:
+				self.functions = incremental.functionIndex(self.extractor)
+				self.indexed   = len(callLUT)
+
+			self.codeDependencies[code] = incremental.codeDependencies(self.functions, code)
+		return self.codeDependencies[code]
+
+	def currentFingerprint(self, dependency):
+		return incremental.currentFingerprint(dependency)
+
+	def contextKey(self, context):
+		sig  = context.signature
+		code = sig.code
+		if code is None or context.external:
+			return None
+
+		dependencies = self.dependencies(code)
+		if not dependencies or None in dependencies.values():
+			return None
+
+		try:
+			data = cPickle.dumps((filesystem.compilerSourceHash(sources), code.codeName(), sorted(dependencies.iteritems()), signatureKey(sig)), 2)
+		except (Uncacheable, cPickle.PicklingError, TypeError):
+			return None
+
+		return filesystem.dataHash(data).encode('hex')
+
+	### Encoding ###
+
+	def slotNames(self, context):
+		names = {}
+		for i, slot in enumerate(context.params):
+			names[slot] = ('param', i)
+		for i, slot in enumerate(context.returns):
+			names[slot] = ('return', i)
+		for i, slot in enumerate(context.vparamField):
+			names[slot] = ('vparam', i)
+		return names
+
+	def encodeSlot(self, names, slot):
+		if slot not in names:
+			# Not bound by the callers, so any local will do.
+			names[slot] = ('temp', len(names))
+		return names[slot]
+
+	def encodeObject(self, context, obj):
+		xtype = obj.xtype
+
+		# Objects allocated by other contexts cannot be found again.
+		if type(xtype) is extendedtypes.ExistingObjectType and xtype.op is None:
+			kind = 'existing'
+		elif type(xtype) is extendedtypes.ContextObjectType and xtype.op is None and xtype.context is context.signature:
+			kind = 'context'
+		else:
+			raise Uncacheable, obj
+
+		return (obj.qualifier, kind, objectRef(xtype.obj))
+
+	def encodeSummary(self, context):
+		summary = context.summary
+		names = self.slotNames(context)
+
+		ops = []
+		for op in summary.ops:
+			key = op.key()
+			if key[0] == 'copy':
+				ops.append(('copy', self.encodeSlot(names, op.src), self.encodeSlot(names, op.dst)))
+			else:
+				ops.append(('load', self.encodeSlot(names, op.obj), op.fieldtype, self.encodeSlot(names, op.field), self.encodeSlot(names, op.dst)))
+
+		objs = []
+		for slot, values in summary.slotObjs.iteritems():
+			objs.append((self.encodeSlot(names, slot), [self.encodeObject(context, obj) for obj in values]))
+
+		return ops, objs
+
+	def decodeObject(self, analysis, context, data):
+		qualifier, kind, (refkind, pyobj) = data
+
+		if refkind == 'object':
+			obj = analysis.pyObj(pyobj)
+		else:
+			obj = analysis.pyObjInst(pyobj)
+
+		if kind == 'existing':
+			xtype = analysis.canonical.existingType(obj)
+		else:
+			xtype = analysis.canonical.contextType(context.signature, obj, None)
+
+		return analysis.objectName(xtype, qualifier)
+
+	def decodeSummary(self, analysis, context, data):
+		ops, objs = data
+
+		temps = {}
+		lists = {'param':context.params, 'return':context.returns, 'vparam':context.vparamField}
+
+		def slot(name):
+			kind, index = name
+			if kind == 'temp':
+				if index not in temps:
+					temps[index] = context.local(ast.Local('summaryTemp'))
+				return temps[index]
+			else:
+				return lists[kind][index]
+
+		summary = context.summary
+		summary.reset()
+
+		for op in ops:
+			if op[0] == 'copy':
+				summary.copy(slot(op[1]), slot(op[2]))
+			else:
+				summary.load(slot(op[1]), op[2], slot(op[3]), slot(op[4]))
+
+		for name, values in objs:
+			target = slot(name)
+			summary.slots[target] = target
+			for value in values:
+				summary.slotObjs[target].append(self.decodeObject(analysis, context, value))
+
+		summary.dirty = False
+		summary.version += 1
+
+	### Cache interface ###
+
+	def restore(self, analysis, context):
+		key = self.contextKey(context)
+		if key is None:
+			return False
+
+		if not os.path.exists(filesystem.join(self.directory, key, 'pickle')):
+			self.misses += 1
+			return False
+
+		try:
+			entry = cPickle.loads(filesystem.readData(self.directory, key, 'pickle', binary=True))
+		except (EnvironmentError, EOFError, cPickle.UnpicklingError, AttributeError, ImportError):
+			# Stale or corrupt entry, analyze it again.
+			self.misses += 1
+			return False
+
+		# The code this context reached may have changed.
+		for dependency, fingerprint in entry['dependencies'].iteritems():
+			if self.currentFingerprint(dependency) != fingerprint:
+				self.misses += 1
+				return False
+
+		constraintextractor.evaluateParameters(analysis, context, context.signature.code)
+		self.decodeSummary(analysis, context, entry['summary'])
+
+		self.restored[context] = entry['dependencies']
+		self.hits += 1
+		return True
+
+	def closureDependencies(self, context):
+		dependencies = {}
+
+		processed = set()
+		pending = [context]
+
+		while pending:
+			current = pending.pop()
+			if current in processed: continue
+			processed.add(current)
+
+			if current.external or current.signature.code is None or current.summary.dirty:
+				return None
+
+			if current in self.restored:
+				dependencies.update(self.restored[current])
+			else:
+				dependencies.update(self.dependencies(current.signature.code))
+				pending.extend([invoke.dst for invoke in current.invokeOut.itervalues()])
+
+		return dependencies
+
+	def store(self, analysis, context):
+		if context in self.restored:
+			return False
+
+		key = self.contextKey(context)
+		if key is None:
+			return False
+
+		dependencies = self.closureDependencies(context)
+		if dependencies is None or None in dependencies.values():
+			self.uncacheable += 1
+			return False
+
+		try:
+			entry = {'dependencies':dependencies, 'summary':self.encodeSummary(context)}
+			data = cPickle.dumps(entry, 2)
+		except (Uncacheable, cPickle.PicklingError, TypeError):
+			self.uncacheable += 1
+			return False
+
+		filesystem.writeBinaryData(self.directory, key, 'pickle', data)
+		self.stored += 1
+		return True
+
+	def storeAll(self, analysis):
+		for context in analysis.contexts.itervalues():
+			self.store(analysis, context)
+
+	def status(self):
+		return "%d hits, %d misses, %d stored, %d uncacheable" % (self.hits, self.misses, self.stored, self.uncacheable)
@@ -22,10 +22,13 @@ import language.python.annotations as annotations
 
 from PADS.StrongConnectivity import StronglyConnectedComponents
 
+import config
+
+from . database import base as databasebase
 from . database import structure
-from . database import tupleset
 from . database import mapping
 from . database import lattice
+from . database import relation
 
 from analysis.astcollector import getOps
 
@@ -48,30 +51,18 @@ def wrapCodeContext(schema):
 
 opDataflowSchema = wrapOpContext(lattice.setUnionSchema)
 
-invokesStruct = structure.StructureSchema(
-	('code',    codeSchema),
-	('context', contextSchema)
-	)
-invokesSchema = wrapOpContext(tupleset.TupleSetSchema(invokesStruct))
-
-invokeSourcesStruct = structure.StructureSchema(
-	('code',      codeSchema),
-	('operation', operationSchema),
-	('context',   contextSchema)
-	)
-invokeSourcesSchema = wrapCodeContext(tupleset.TupleSetSchema(invokeSourcesStruct))
-
-
-def invertInvokes(invokes):
-	invokeSources = invokeSourcesSchema.instance()
+# Edges is an interned relation of (code, op, context, dstCode, dstContext)
+# The invocations are only stored in the relation.  The analysis reads them
+# through indices, which map the key fields to a list of the other fields.
+def indexInvokes(edges, interner, *fields):
+	lut = {}
+	for key, rows in edges.index(*fields).iteritems():
+		lut[interner.lookup(key)] = [interner.lookup(row) for row in rows]
+	return lut
 
-	for code, ops in invokes:
-		assert code.isCode(), type(code)
-		for op, contexts in ops:
-			for context, invs in contexts:
-				for dstCode, dstContext in invs:
-					invokeSources[dstCode][dstContext].add(code, op, context)
-	return invokeSources
+def invertInvokes(edges, interner):
+	# (dstCode, dstContext) -> [(code, op, context)]
+	return indexInvokes(edges, interner, 3, 4)
 
 def filteredSCC(G):
 	o = []
@@ -188,7 +179,7 @@ class ReadModifyAnalysis(object):
 	def processContextReads(self, current):
 		currentF, currentC = current
 
-		for prev in self.invokeSources[currentF][currentC]:
+		for prev in self.invokeSources.get((currentF, currentC), ()):
 			prevF, prevO, prevC = prev
 
 			prevRead = self.opReadDB[prevF][prevO]
@@ -220,7 +211,7 @@ class ReadModifyAnalysis(object):
 	def processContextModifies(self, current):
 		currentF, currentC = current
 
-		for prev in self.invokeSources[currentF][currentC]:
+		for prev in self.invokeSources.get((currentF, currentC), ()):
 			prevF, prevO, prevC = prev
 
 			prevMod = self.opModifyDB[prevF][prevO]
@@ -390,7 +381,7 @@ class LifetimeAnalysis(object):
 		for (code, context), objs in self.rm.allocations.iteritems():
 			noescape = objs-self.escapes
 			self.live[(code, context)].update(noescape)
-			self.dirty.update(self.invokeSources[code][context])
+			self.dirty.update(self.invokeSources.get((code, context), ()))
 
 		while self.dirty:
 			current = self.dirty.pop()
@@ -402,20 +393,17 @@ class LifetimeAnalysis(object):
 	def convertKills(self):
 		# Convert kills on edges to kills on nodes.
 		self.contextKilled = collections.defaultdict(set)
-		for dstF, contexts in self.invokeSources:
-			for dstC, srcs in contexts:
-				if not srcs: continue
-
-				killedAll = None
-				for srcF, srcO, srcC in srcs:
-					newKilled = self.killed[(srcF, srcO, srcC)][(dstF, dstC)]
-					if killedAll is None:
-						killedAll = newKilled
-					else:
-						killedAll = killedAll.intersection(newKilled)
+		for (dstF, dstC), srcs in self.invokeSources.iteritems():
+			killedAll = None
+			for srcF, srcO, srcC in srcs:
+				newKilled = self.killed[(srcF, srcO, srcC)][(dstF, dstC)]
+				if killedAll is None:
+					killedAll = newKilled
+				else:
+					killedAll = killedAll.intersection(newKilled)
 
-				if killedAll:
-					self.contextKilled[(dstF, dstC)].update(killedAll)
+			if killedAll:
+				self.contextKilled[(dstF, dstC)].update(killedAll)
 
 		for code, context in self.entries:
 			self.contextKilled[(code, context)].update(self.live[(code, context)])
@@ -424,13 +412,13 @@ class LifetimeAnalysis(object):
 		currentF, currentO, currentC = current
 		assert currentF.isCode(), type(currentF)
 
-		operationSchema.validate(currentO)
+		if databasebase.checkAccess: operationSchema.validate(currentO)
 
 		newLive = set()
 
 		live = self.live
 
-		for dstF, dstC in self.invokes[currentF][currentO][currentC]:
+		for dstF, dstC in self.invokes.get((currentF, currentO, currentC), ()):
 			for dstLive in live[(dstF, dstC)]:
 				if dstLive in live[(currentF, currentC)]:
 					continue
@@ -454,11 +442,12 @@ class LifetimeAnalysis(object):
 		if newLive:
 			# Propigate dirty
 			live[(currentF, currentC)].update(newLive)
-			self.dirty.update(self.invokeSources[currentF][currentC])
+			self.dirty.update(self.invokeSources.get((currentF, currentC), ()))
 
 
 	def gatherInvokes(self, liveCode, entryContexts):
-		invokesDB = invokesSchema.instance()
+		interner = relation.Interner()
+		edges    = relation.Relation(5)
 
 		self.entries = set()
 
@@ -473,12 +462,14 @@ class LifetimeAnalysis(object):
 			for op in ops:
 				invokes = op.annotation.invokes
 				if invokes is not None:
+					codeOp = interner.internAll((code, op))
 					for cindex, context in enumerate(code.annotation.contexts):
 						opInvokes = invokes[1][cindex]
+						src = codeOp+(interner.intern(context),)
 
 						for dstF, dstC in opInvokes:
 							assert dstF.isCode(), type(dstF)
-							invokesDB[code][op][context].add(dstF, dstC)
+							edges.add(*(src+interner.internAll((dstF, dstC))))
 
 
 			for lcl in lcls:
@@ -493,8 +484,9 @@ class LifetimeAnalysis(object):
 
 						self.codeRefersToHeap[(code, context)].add(ref)
 
-		self.invokes       = invokesDB
-		self.invokeSources = invertInvokes(invokesDB)
+		# (code, op, context) -> [(dstCode, dstContext)]
+		self.invokes       = indexInvokes(edges, interner, 0, 1, 2)
+		self.invokeSources = invertInvokes(edges, interner)
 
 	def markVisible(self, lcl, cindex):
 		if lcl is not None:
@@ -620,5 +612,7 @@ class LifetimeAnalysis(object):
 		del self.annotationCount
 
 def evaluate(compiler, prgm):
+	databasebase.checkAccess = config.validateDatabase
+
 	with compiler.console.scope('lifetime analysis'):
 		la = LifetimeAnalysis().process(compiler, prgm)
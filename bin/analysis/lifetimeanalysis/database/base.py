@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# Check keys and values against the schema on every access?
+# This is a debugging aid, it costs more than the accesses themselves.
+checkAccess = False
+
 class SchemaError(Exception):
 	pass
 
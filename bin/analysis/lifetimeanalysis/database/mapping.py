@@ -47,7 +47,7 @@ class Mapping(object):
 		self.data = {}
 
 	def __getitem__(self, key):
-		self.schema.validateKey(key)
+		if base.checkAccess: self.schema.validateKey(key)
 
 		if not key in self.data:
 			result = self.schema.valueschema.missing()
@@ -0,0 +1,131 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Flat relations over interned objects.
+# Codes, operations, contexts and slots are interned to small integers, and
+# a relation stores its tuples as integer columns.  Once frozen, the rows are
+# sorted and unique, and the relation can be projected, joined, and indexed
+# without building a dictionary level per field.
+
+import array
+import itertools
+
+class Interner(object):
+	__slots__ = 'lut', 'objects'
+
+	def __init__(self):
+		self.lut     = {}
+		self.objects = []
+
+	def intern(self, obj):
+		index = self.lut.get(obj)
+		if index is None:
+			index = len(self.objects)
+			self.lut[obj] = index
+			self.objects.append(obj)
+		return index
+
+	def internAll(self, objs):
+		return tuple([self.intern(obj) for obj in objs])
+
+	def __getitem__(self, index):
+		return self.objects[index]
+
+	def lookup(self, indices):
+		return tuple([self.objects[index] for index in indices])
+
+	def __len__(self):
+		return len(self.objects)
+
+class Relation(object):
+	__slots__ = 'arity', 'columns', 'frozen'
+
+	def __init__(self, arity):
+		self.arity   = arity
+		self.columns = [array.array('l') for i in range(arity)]
+		self.frozen  = True
+
+	@classmethod
+	def fromRows(cls, arity, rows):
+		result = cls(arity)
+		for row in rows:
+			result.add(*row)
+		result.freeze()
+		return result
+
+	def add(self, *row):
+		assert len(row) == self.arity, row
+		for column, value in zip(self.columns, row):
+			column.append(value)
+		self.frozen = False
+
+	def freeze(self):
+		# Sort the rows and remove duplicates.
+		if not self.frozen:
+			rows = sorted(set(itertools.izip(*self.columns)))
+			self.columns = [array.array('l', column) for column in zip(*rows)] if rows else [array.array('l') for i in range(self.arity)]
+			self.frozen = True
+		return self
+
+	def __len__(self):
+		self.freeze()
+		return len(self.columns[0]) if self.arity else 0
+
+	def __iter__(self):
+		self.freeze()
+		return itertools.izip(*self.columns)
+
+	def column(self, index):
+		self.freeze()
+		return self.columns[index]
+
+	def project(self, *fields):
+		# Also reorders the fields, so project(1, 0) inverts a binary relation.
+		self.freeze()
+		result = Relation(len(fields))
+		result.columns = [array.array('l', self.columns[field]) for field in fields]
+		result.frozen  = False
+		return result.freeze()
+
+	def index(self, *fields):
+		# Group the rows by the given fields.
+		# Maps the key fields to a list of the remaining fields.
+		self.freeze()
+		rest  = [field for field in range(self.arity) if field not in fields]
+		keyColumns  = [self.columns[field] for field in fields]
+		restColumns = [self.columns[field] for field in rest]
+
+		lut = {}
+		for key, value in itertools.izip(itertools.izip(*keyColumns), itertools.izip(*restColumns)):
+			group = lut.get(key)
+			if group is None:
+				lut[key] = [value]
+			else:
+				group.append(value)
+		return lut
+
+	def join(self, other, fields, otherFields):
+		# The rows of self, extended by the remaining fields of the matching rows of other.
+		assert len(fields) == len(otherFields), (fields, otherFields)
+		lut = other.index(*otherFields)
+
+		self.freeze()
+		result = Relation(self.arity+other.arity-len(otherFields))
+		keyColumns = [self.columns[field] for field in fields]
+
+		for key, row in itertools.izip(itertools.izip(*keyColumns), itertools.izip(*self.columns)):
+			for extra in lut.get(key, ()):
+				result.add(*(row+extra))
+
+		return result.freeze()
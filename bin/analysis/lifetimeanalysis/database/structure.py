@@ -98,8 +98,9 @@ class StructureSchema(base.Schema):
 
 
 	def inplaceMerge(self, target, *args):
-		self.validate(target)
-		for arg in args: self.validate(arg)
+		if base.checkAccess:
+			self.validate(target)
+			for arg in args: self.validate(arg)
 
 		accum = []
 
@@ -113,7 +114,8 @@ class StructureSchema(base.Schema):
 		return output, changed
 
 	def merge(self, *args):
-		for arg in args: self.validate(arg)
+		if base.checkAccess:
+			for arg in args: self.validate(arg)
 
 		accum = []
 
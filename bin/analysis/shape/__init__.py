@@ -14,6 +14,8 @@
 
 from __future__ import absolute_import
 
+import config
+
 # The model for the analysis
 
 from . model import canonical
@@ -83,7 +85,10 @@ class RegionBasedShapeAnalysis(object):
 	def __init__(self, extractor, cpacanonical, info):
 		self.extractor   = extractor
 		self.canonical   = canonical.CanonicalObjects()
-		self.worklist    = dataflow.Worklist()
+		if config.shapeOrderedWorklist:
+			self.worklist = dataflow.OrderedWorklist(self)
+		else:
+			self.worklist = dataflow.Worklist()
 		self.environment = dataflow.DataflowEnvironment()
 
 		self.constraintbuilder = constraintbuilder.ShapeConstraintBuilder(self, self.processCode)
@@ -104,7 +109,7 @@ class RegionBasedShapeAnalysis(object):
 		if not success:
 			print
 			print "ITERATION LIMIT HIT"
-			self.worklist.worklist[:] = []
+			self.worklist.clear()
 		return success
 
 	def processCode(self, code):
@@ -237,8 +242,10 @@ class RegionBasedShapeAnalysis(object):
 	def dumpStatistics(self):
 		print "Entries:", len(self.environment._secondary)
 		print "Unique Config:", len(self.canonical.configurationCache)
-		print "Max Worklist:", self.worklist.maxLength
-		print "Steps:", "%d/%d" % (self.worklist.usefulSteps, self.worklist.steps)
+		stats = self.worklist.stats()
+		print "Max Worklist:", stats['maxLength']
+		print "Steps:", "%d/%d" % (stats['usefulSteps'], stats['steps'])
+		print "Reprocessed:", "%d (%d constraints, at most %d times)" % (stats['reprocessed'], stats['constraints'], stats['maxReprocessed'])
 
 import collections
 def evaluate(compiler):
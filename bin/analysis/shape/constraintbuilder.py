@@ -24,14 +24,19 @@ import util.python.calling
 
 class GetLocals(TypeDispatcher):
 	def __init__(self):
-		TypeDispatcher.__init__()
+		TypeDispatcher.__init__(self)
 		self.locals = set()
 
 	@defaultdispatch
 	def default(self, node):
 		node.visitChildren(self)
 
-	@dispatch(str, int, type(None))
+	@dispatch(list, tuple)
+	def visitContainer(self, node):
+		for child in node:
+			self(child)
+
+	@dispatch(str, int, type(None), ast.Existing)
 	def visitLeaf(self, node):
 		pass
 
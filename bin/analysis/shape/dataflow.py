@@ -14,6 +14,13 @@
 
 from __future__ import absolute_import
 
+import heapq
+import collections
+
+from PADS.StrongConnectivity import StronglyConnectedComponents
+
+from . import constraints
+
 class DataflowEnvironment(object):
 	__slots__ = '_secondary', 'observers'
 
@@ -61,6 +68,12 @@ class Worklist(object):
 		self.steps = 0
 		self.usefulSteps = 0
 
+		# How many times each constraint has been evaluated,
+		# and how many of those were for an index it had seen before.
+		self.evaluated   = set()
+		self.evaluations = collections.defaultdict(int)
+		self.reprocessed = collections.defaultdict(int)
+
 	def addDirty(self, constraint, index):
 		self.useful = True
 		key = (constraint, index)
@@ -85,7 +98,14 @@ class Worklist(object):
 		self.steps += 1
 
 		# Process a constraint/index pair
-		constraint, index = self.pop()
+		key = self.pop()
+		constraint, index = key
+
+		self.evaluations[constraint] += 1
+		if key in self.evaluated:
+			self.reprocessed[constraint] += 1
+		else:
+			self.evaluated.add(key)
 
 		self.useful = False
 
@@ -106,3 +126,119 @@ class Worklist(object):
 				return False
 
 		return True
+
+	def clear(self):
+		del self.worklist[:]
+		self.dirty.clear()
+
+	def stats(self):
+		reprocessed = self.reprocessed.values()
+		return {'steps':self.steps,
+			'usefulSteps':self.usefulSteps,
+			'maxLength':self.maxLength,
+			'constraints':len(self.evaluations),
+			'reprocessed':sum(reprocessed),
+			'maxReprocessed':max(reprocessed) if reprocessed else 0}
+
+	def hottest(self, count=10):
+		# The constraints reprocessed most often, and how often.
+		ranked = sorted(self.reprocessed.iteritems(), key=lambda (c, n): n, reverse=True)
+		return ranked[:count]
+
+def constraintFunction(c):
+	# Calls belong to the callee, returns to the caller.
+	return c.outputPoint[0]
+
+def constraintRanks(environment):
+	cs = set()
+	for observers in environment.observers.itervalues():
+		cs.update(observers)
+	cs = sorted(cs, key=lambda c: (c.inputPoint[1], c.outputPoint[1]))
+
+	# The call graph
+	G = {}
+	for c in cs:
+		callees = G.setdefault(c.inputPoint[0], set())
+		G.setdefault(c.outputPoint[0], set())
+		if isinstance(c, constraints.SplitConstraint):
+			callees.add(c.outputPoint[0])
+
+	# Components are found in reverse topological order, callers should go first.
+	components = list(StronglyConnectedComponents(G))
+	components.reverse()
+
+	componentIndex = {}
+	for i, component in enumerate(components):
+		for func in component:
+			componentIndex[func] = i
+
+	# Number the constraints in postorder.
+	# The search crosses calls, but it only matters within a function.
+	postorder = {}
+	visited   = set()
+	for root in cs:
+		if root in visited: continue
+		visited.add(root)
+
+		stack = [(root, iter(environment.observers.get(root.outputPoint, ())))]
+		while stack:
+			c, nexts = stack[-1]
+			for next in nexts:
+				if next not in visited:
+					visited.add(next)
+					stack.append((next, iter(environment.observers.get(next.outputPoint, ()))))
+					break
+			else:
+				stack.pop()
+				postorder[c] = len(postorder)
+
+	# Order by component, then by reverse postorder.
+	cs.sort(key=lambda c: (componentIndex[constraintFunction(c)], -postorder[c]))
+	return dict([(c, i) for i, c in enumerate(cs)])
+
+# Processes the queue in reverse postorder within each function,
+# and in topological order of the strongly connected components of the call graph.
+# Constraints built after the ranks were assigned cause the ranks to be recomputed.
+class OrderedWorklist(Worklist):
+	def __init__(self, sys):
+		Worklist.__init__(self)
+		self.sys  = sys
+		self.rank = {}
+		self.uid  = 0
+		self.stale = False
+		self.reorders = 0
+
+	def addDirty(self, constraint, index):
+		self.useful = True
+		key = (constraint, index)
+		if key not in self.dirty:
+			self.dirty.add(key)
+
+			rank = self.rank.get(constraint)
+			if rank is None:
+				rank = 0
+				self.stale = True
+
+			heapq.heappush(self.worklist, (rank, self.uid, key))
+			self.uid += 1
+
+	def pop(self):
+		if self.stale:
+			self.reorder()
+
+		rank, uid, key = heapq.heappop(self.worklist)
+		self.dirty.remove(key)
+		return key
+
+	def reorder(self):
+		self.rank = constraintRanks(self.sys.environment)
+		self.stale = False
+		self.reorders += 1
+
+		self.worklist[:] = [(self.rank[key[0]], uid, key) for rank, uid, key in self.worklist]
+		heapq.heapify(self.worklist)
+
+	def stats(self):
+		stats = Worklist.stats(self)
+		stats['reorders'] = self.reorders
+		return stats
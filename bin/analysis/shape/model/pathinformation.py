@@ -247,7 +247,8 @@ class EquivalenceClass(object):
 					newV, newChanged = v.inplaceIntersect(ov, lut)
 					eq.setAttr(k, newV)
 					changed |= newChanged
-				else:
+				elif not self.getAttr(k).isTrivial():
+					# Trivial classes carry no information.
 					changed = True
 
 		return eq, changed
@@ -399,11 +400,14 @@ class EquivalenceClass(object):
 			self.delAttr(slot)
 
 class PathInformation(object):
-	__slots__ = 'hits', 'root'
+	__slots__ = 'hits', 'root', 'shared'
 
 	def __init__(self, root=None):
 		self.hits   = None
 
+		# Is the root shared with a copy?
+		self.shared = False
+
 		if root is None:
 			self.root  = EquivalenceClass()
 		else:
@@ -425,13 +429,28 @@ class PathInformation(object):
 		return False
 
 	def copy(self, kill=None, keepHits=False, keepMisses=False):
+		if kill is None and not keepHits and not keepMisses:
+			# Copy on write, the classes are only duplicated
+			# when either the original or the copy is mutated.
+			self.shared = True
+			outp = PathInformation(self.root)
+			outp.shared = True
+			return outp
+
 		if kill is None:
 			kill = set()
 		lut = {}
 		root = self.root.copy(lut, kill, keepHits, keepMisses)
 		return PathInformation(root)
 
+	def own(self):
+		# Must be called before mutating the equivalence classes.
+		if self.shared:
+			self.root   = self.root.copy({}, set())
+			self.shared = False
+
 	def forgetRoots(self, kill):
+		self.own()
 		self.root.forgetRoots(kill)
 
 	def forget(self, kill):
@@ -491,6 +510,8 @@ class PathInformation(object):
 	def union(self, a, b, *paths):
 		# TODO Can create a prunable branch... eliminate?
 
+		self.own()
+
 		# Get the equivalence classes of all the paths
 		eqs = set()
 		eqs.add(self.equivalenceClass(a, True))
@@ -517,10 +538,12 @@ class PathInformation(object):
 			return eqs.pop()
 
 	def _markHit(self, path):
+		self.own()
 		cls = self.equivalenceClass(path, True)
 		cls.hit = TVLTrue
 
 	def _markMiss(self, path):
+		self.own()
 		cls = self.equivalenceClass(path, True)
 		cls.hit = TVLFalse
 
@@ -582,13 +605,16 @@ class PathInformation(object):
 		return self, changed
 
 	def ageExtended(self, canonical):
+		self.own()
 		self.root.ageExtended(canonical)
 
 	def unageExtended(self):
+		self.own()
 		self.root.unageExtended()
 
 
 	def extendParameters(self, canonical, parameterSlots):
+		self.own()
 		return self.root.extendParameters(canonical, parameterSlots)
 
 	def dump(self):
@@ -601,6 +627,7 @@ class PathInformation(object):
 		# parameters but that may be mutated will be seperated from those that cannot
 		# be mutated.
 		# Example {s.n, t.m} will be lost if only n is accessed.
+		self.own()
 		hidden = PathInformation(self.root.splitHidden(extendedParameters, accessedCallback))
 		self.root.killHiddenRoots()
 		assert not self.containsAged()
@@ -609,6 +636,8 @@ class PathInformation(object):
 	def join(self, other):
 		# HACK if would be more efficient to do the absorb on the fly?
 		a = self.copy()
+		a.own()
 		b = other.copy()
+		b.own()
 		a.root = a.root.absorb(b.root)
 		return a
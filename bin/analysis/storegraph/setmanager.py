@@ -13,8 +13,11 @@
 # limitations under the License.
 
 import sys
+import weakref
 from util.monkeypatch import xcollections
 
+import config
+
 class CachedSetManager(object):
 	def __init__(self):
 		self.cache = xcollections.weakcache()
@@ -60,3 +63,151 @@ class CachedSetManager(object):
 		for s in self.cache:
 			mem += sys.getsizeof(s)
 		return mem
+
+
+### Bitsets ###
+
+# The positions of the set bits in each byte.
+bytePositions = tuple([tuple([i for i in range(8) if byte & (1<<i)]) for byte in range(256)])
+
+class BitSet(object):
+	__slots__ = 'manager', 'bits', '__weakref__'
+
+	def __init__(self, manager, bits):
+		self.manager = manager
+		self.bits    = bits
+
+	def __contains__(self, value):
+		index = self.manager.index.get(value)
+		return index is not None and bool((self.bits >> index) & 1)
+
+	def __iter__(self):
+		return self.manager.elements(self.bits)
+
+	def __len__(self):
+		return bin(self.bits).count('1')
+
+	def __nonzero__(self):
+		return self.bits != 0
+
+	# Compares equal to frozensets with the same elements.
+	def __eq__(self, other):
+		if isinstance(other, BitSet) and other.manager is self.manager:
+			return self.bits == other.bits
+		elif isinstance(other, (BitSet, set, frozenset)):
+			return frozenset(self) == frozenset(other)
+		else:
+			return NotImplemented
+
+	def __ne__(self, other):
+		result = self.__eq__(other)
+		if result is NotImplemented:
+			return result
+		return not result
+
+	def __hash__(self):
+		return hash(frozenset(self))
+
+	def __repr__(self):
+		return "BitSet(%r)" % (list(self),)
+
+# Numbers the values densely, and represents sets of them as bit vectors.
+# Union, difference, and subset tests are linear in the number of words,
+# rather than in the number of elements.
+class BitsetManager(object):
+	def __init__(self):
+		self.index  = {}
+		self.values = []
+
+		self.cache = weakref.WeakValueDictionary()
+		self._emptyset = self.intern(0)
+
+	def intern(self, bits):
+		s = self.cache.get(bits)
+		if s is None:
+			s = BitSet(self, bits)
+			self.cache[bits] = s
+		return s
+
+	def number(self, value):
+		index = self.index.get(value)
+		if index is None:
+			index = len(self.values)
+			self.index[value] = index
+			self.values.append(value)
+		return index
+
+	def toBits(self, values):
+		if isinstance(values, BitSet) and values.manager is self:
+			return values.bits
+
+		bits = 0
+		for value in values:
+			bits |= 1 << self.number(value)
+		return bits
+
+	def elements(self, bits):
+		values = self.values
+		offset = 0
+		while bits:
+			byte = bits & 0xff
+			if byte:
+				for i in bytePositions[byte]:
+					yield values[offset+i]
+			bits >>= 8
+			offset += 8
+
+	def coerce(self, values):
+		return self.intern(self.toBits(values))
+
+	def empty(self):
+		return self._emptyset
+
+	def inplaceUnion(self, a, b):
+		if a is b:
+			return a
+		else:
+			return self.intern(self.toBits(a) | self.toBits(b))
+
+	def diff(self, a, b):
+		if a is b:
+			return self._emptyset
+		else:
+			return self.intern(self.toBits(a) & ~self.toBits(b))
+
+	def tempDiff(self, a, b):
+		if a is b:
+			return self._emptyset
+
+		bits = self.toBits(a) & ~self.toBits(b)
+		if not bits:
+			return self._emptyset
+		else:
+			# Not retained, so it does not need to be interned.
+			return BitSet(self, bits)
+
+	def issubset(self, a, b):
+		return not (self.toBits(a) & ~self.toBits(b))
+
+	def iter(self, s):
+		return iter(s)
+
+	def memory(self):
+		mem = sys.getsizeof(self.cache) + sys.getsizeof(self.index) + sys.getsizeof(self.values)
+		for s in self.cache.itervalues():
+			mem += sys.getsizeof(s) + sys.getsizeof(s.bits)
+		return mem
+
+	def frozensetMemory(self):
+		# How much memory the same sets would take as interned frozensets.
+		mem = 0
+		for s in self.cache.itervalues():
+			mem += sys.getsizeof(frozenset(s))
+		return mem
+
+
+def createSetManager():
+	if config.useBitsetSetManager:
+		return BitsetManager()
+	else:
+		return CachedSetManager()
@@ -59,7 +59,7 @@ class StoreGraph(MergableNode):
 		# Root slots, such as locals and references to "existing" objects
 		self.slots      = {}
 		self.regionHint = RegionNode(self)
-		self.setManager = setmanager.CachedSetManager()
+		self.setManager = setmanager.createSetManager()
 		self.extractor  = extractor
 		self.canonical  = canonical
 
@@ -80,23 +80,14 @@ class StoreGraph(MergableNode):
 		assert isinstance(key, program.AbstractObject), key
 
 		if isinstance(obj, program.Object):
-			if slottype == 'LowLevel':
-				subdict = obj.lowlevel
-			elif slottype == 'Attribute':
-				subdict = obj.slot
-			elif slottype == 'Array':
-				# HACK
-				if isinstance(obj.pyobj, list):
-					return set([self.canonical.existingType(t) for t in obj.array.itervalues()])
-
-				subdict = obj.array
-			elif slottype == 'Dictionary':
-				subdict = obj.dictionary
-			else:
-				assert False, slottype
-
-			if key in subdict:
-				return (self.canonical.existingType(subdict[key]),)
+			# HACK
+			if slottype == 'Array' and isinstance(obj.pyobj, list):
+				self.extractor.completeObject(obj)
+				return set([self.canonical.existingType(t) for t in obj.array.itervalues()])
+
+			value = self.extractor.getSlot(obj, slottype, key)
+			if value is not None:
+				return (self.canonical.existingType(value),)
 
 		# Not found
 		return None
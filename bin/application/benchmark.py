@@ -0,0 +1,304 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures how long the compiler takes on a set of makefiles.
+# Each makefile is compiled several times, each time in a fresh child
+# process so the runs do not share extracted code or peak memory.
+# The console scope tree of each run is flattened into phases, keyed by
+# their path ("makefile/cpa/solve"), and the median of each measurement
+# is kept.  Counters recorded with console.count, such as the number of
+# contexts and constraints, are summed over the whole tree.
+#
+# The persistent caches would make every run after the first faster, so
+# each run gets a cache directory of its own.  Cold runs start with an
+# empty cache directory.  Warm runs share one, filled by a compile that is
+# not measured.  The results record which was measured.
+#
+# Results are JSON, and can be compared against a previous result.  A
+# measurement regresses if it grows by more than its threshold, relative
+# to the baseline.  Phases shorter than minimumTime are too noisy to compare.
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import traceback
+import cPickle as pickle
+from cStringIO import StringIO
+
+from util.application.console import Console, peakMemory
+from util.application import profile
+
+from . import context
+from . makefile import Makefile
+
+import config
+
+defaultThresholds = {'time':0.10, 'memory':0.10, 'count':0.0}
+minimumTime = 0.05
+
+cacheModes = ('cold', 'warm')
+
+### Measurement ###
+
+def flattenScope(data, prefix, phases, counters):
+	path = prefix+(data['name'],)
+	key = "/".join(path)
+
+	if 'wall' in data:
+		phase = phases.setdefault(key, {'wall':0.0, 'cpu':0.0})
+		phase['wall'] += data['wall']
+		phase['cpu']  += data['cpu']
+
+	for name, amount in data.get('counters', {}).iteritems():
+		counters[name] = counters.get(name, 0)+amount
+
+	for child in data['children']:
+		flattenScope(child, path, phases, counters)
+
+def measureScopes(root):
+	# Phases with the same path, such as the repeated solves of the
+	# adaptive analysis, are added together.
+	phases   = {}
+	counters = dict(root.counters)
+	for child in root.children:
+		if profile.finished(child):
+			flattenScope(profile.scopeData(child), (), phases, counters)
+	return phases, counters
+
+def compileOnce(filename, cacheDirectory):
+	# Some makefiles name their module relative to their own directory.
+	directory = os.path.dirname(os.path.abspath(filename))
+	if directory not in sys.path:
+		sys.path.append(directory)
+
+	console = Console(out=StringIO(), trackObjects=config.profileObjects)
+	compiler = context.CompilerContext(console)
+
+	oldCacheDirectory = config.cacheDirectory
+	config.cacheDirectory = cacheDirectory
+
+	stdout = sys.stdout
+	sys.stdout = console.out
+	try:
+		try:
+			success = bool(Makefile(filename).pystreamCompile(compiler))
+		except Exception:
+			traceback.print_exc(file=console.out)
+			success = False
+	finally:
+		sys.stdout = stdout
+		config.cacheDirectory = oldCacheDirectory
+
+	phases, counters = measureScopes(console.root)
+	return {'success':success, 'phases':phases, 'counters':counters, 'peakRSS':peakMemory(),
+		'log':console.out.getvalue()}
+
+def compileIsolated(filename, cacheDirectory):
+	if not hasattr(os, 'fork'):
+		return compileOnce(filename, cacheDirectory)
+
+	read, write = os.pipe()
+	pid = os.fork()
+	if pid == 0:
+		# The child measures one compile, and never returns.
+		status = 0
+		try:
+			try:
+				os.close(read)
+				out = os.fdopen(write, 'wb')
+				pickle.dump(compileOnce(filename, cacheDirectory), out, pickle.HIGHEST_PROTOCOL)
+				out.close()
+			except Exception:
+				traceback.print_exc()
+				status = 1
+		finally:
+			os._exit(status)
+
+	os.close(write)
+	f = os.fdopen(read, 'rb')
+	try:
+		data = f.read()
+	finally:
+		f.close()
+	os.waitpid(pid, 0)
+
+	if not data:
+		return {'success':False, 'phases':{}, 'counters':{}, 'peakRSS':None, 'log':"Benchmark process failed.\n"}
+	return pickle.loads(data)
+
+### Aggregation ###
+
+def median(values):
+	values = sorted(values)
+	count = len(values)
+	if count == 0:
+		return None
+	elif count%2:
+		return values[count/2]
+	else:
+		return (values[count/2-1]+values[count/2])*0.5
+
+def aggregate(runs):
+	phases = {}
+	for run in runs:
+		for key, phase in run['phases'].iteritems():
+			for name, value in phase.iteritems():
+				phases.setdefault(key, {}).setdefault(name, []).append(value)
+
+	counters = {}
+	for run in runs:
+		for name, value in run['counters'].iteritems():
+			counters.setdefault(name, []).append(value)
+
+	peaks = [run['peakRSS'] for run in runs if run['peakRSS'] is not None]
+
+	return {
+		'runs':len(runs),
+		'success':all([run['success'] for run in runs]),
+		'phases':dict([(key, dict([(name, median(values)) for name, values in phase.iteritems()])) for key, phase in phases.iteritems()]),
+		'wallMin':dict([(key, min(phase['wall'])) for key, phase in phases.iteritems()]),
+		# Counts should not vary between runs, but take the largest if they do.
+		'counters':dict([(name, max(values)) for name, values in counters.iteritems()]),
+		'peakRSS':median(peaks),
+		}
+
+def programName(filename):
+	name = os.path.splitext(os.path.basename(filename))[0]
+	if name.startswith('make'):
+		name = name[len('make'):]
+	return name
+
+def run(filenames, runs, console=None, caches='cold'):
+	assert caches in cacheModes, caches
+
+	results = {}
+	for filename in filenames:
+		name = programName(filename)
+		measured = []
+
+		directory = tempfile.mkdtemp(prefix='pystream-benchmark-')
+		try:
+			if caches == 'warm':
+				# Fill the caches, without measuring it.
+				compileIsolated(filename, directory)
+
+			for i in range(runs):
+				if caches == 'cold':
+					cacheDirectory = os.path.join(directory, str(i))
+				else:
+					cacheDirectory = directory
+
+				result = compileIsolated(filename, cacheDirectory)
+				measured.append(result)
+
+				if console is not None:
+					total = sum([phase['wall'] for key, phase in result['phases'].iteritems() if '/' not in key])
+					status = "ok" if result['success'] else "FAILED"
+					console.output("%s %d/%d: %.2fs %s" % (name, i+1, runs, total, status))
+		finally:
+			shutil.rmtree(directory, True)
+
+		results[name] = aggregate(measured)
+
+		if not results[name]['success'] and console is not None:
+			console.output(measured[-1]['log'], 0)
+
+	return {'version':1, 'runs':runs, 'caches':caches, 'programs':results}
+
+### Comparison ###
+
+class Regression(object):
+	def __init__(self, program, metric, baseline, current):
+		self.program  = program
+		self.metric   = metric
+		self.baseline = baseline
+		self.current  = current
+
+	@property
+	def change(self):
+		if not self.baseline:
+			return None
+		return float(self.current-self.baseline)/self.baseline
+
+	def __repr__(self):
+		change = self.change
+		if change is None:
+			return "%s %s: %r -> %r" % (self.program, self.metric, self.baseline, self.current)
+		else:
+			return "%s %s: %r -> %r (%+.1f%%)" % (self.program, self.metric, self.baseline, self.current, change*100.0)
+
+def regressed(baseline, current, threshold):
+	if baseline is None or current is None:
+		return False
+	return current > baseline*(1.0+threshold)
+
+def compareProgram(name, old, new, thresholds):
+	regressions = []
+
+	if old['success'] and not new['success']:
+		regressions.append(Regression(name, 'success', True, False))
+
+	for key, phase in sorted(new['phases'].iteritems()):
+		oldPhase = old['phases'].get(key)
+		if oldPhase is None or max(oldPhase['wall'], phase['wall']) < minimumTime:
+			continue
+
+		for metric in ('wall', 'cpu'):
+			if regressed(oldPhase.get(metric), phase.get(metric), thresholds['time']):
+				regressions.append(Regression(name, "%s %s" % (key, metric), oldPhase[metric], phase[metric]))
+
+	if regressed(old.get('peakRSS'), new.get('peakRSS'), thresholds['memory']):
+		regressions.append(Regression(name, 'peakRSS', old['peakRSS'], new['peakRSS']))
+
+	for counter, value in sorted(new['counters'].iteritems()):
+		if regressed(old['counters'].get(counter), value, thresholds['count']):
+			regressions.append(Regression(name, counter, old['counters'][counter], value))
+
+	return regressions
+
+def compare(baseline, current, thresholds=None):
+	if thresholds is None:
+		thresholds = defaultThresholds
+	else:
+		thresholds = dict(defaultThresholds, **thresholds)
+
+	# Cold and warm compiles cannot be compared.  Older results do not record the mode.
+	old, new = baseline.get('caches'), current.get('caches')
+	if old is not None and new is not None and old != new:
+		raise ValueError, "Cannot compare %s cache results against a %s cache baseline." % (new, old)
+
+	regressions = []
+	for name, new in sorted(current['programs'].iteritems()):
+		old = baseline['programs'].get(name)
+		if old is not None:
+			regressions.extend(compareProgram(name, old, new, thresholds))
+	return regressions
+
+### Files ###
+
+def save(filename, results):
+	f = open(filename, 'w')
+	try:
+		json.dump(results, f, indent=1, sort_keys=True)
+	finally:
+		f.close()
+
+def load(filename):
+	f = open(filename)
+	try:
+		return json.load(f)
+	finally:
+		f.close()
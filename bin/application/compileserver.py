@@ -0,0 +1,195 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A compile server, for compiling many makefiles without paying for start up each time.
+# The server builds the stubs and extracts the shader library once, and
+# then forks a child for each request.  The child compiles the makefile
+# from the warm state, and replies with the generated GLSL, the stats, and
+# the console output.  Changes to the stubs or the shader library require
+# restarting the server.
+# Requests and replies are single lines of JSON, over a Unix socket.
+
+import sys
+import os
+import errno
+import types
+import signal
+import socket
+import json
+import traceback
+from cStringIO import StringIO
+
+from util.application.console import Console
+from decompiler.programextractor import Extractor
+from stubs import makeStubs
+
+from . import context
+from . makefile import Makefile
+
+# Modules whose code is extracted before the first request.
+warmModules = ['shader.vec', 'shader.sampler', 'shader.function']
+
+def warmModule(compiler, module):
+	extractor = compiler.extractor
+
+	for value in module.__dict__.itervalues():
+		if isinstance(value, types.FunctionType) and value.__module__ == module.__name__:
+			extractor.getObjectCall(value)
+		elif isinstance(value, type) and value.__module__ == module.__name__:
+			extractor.ensureLoaded(extractor.getObject(value))
+			for member in value.__dict__.itervalues():
+				if isinstance(member, types.FunctionType):
+					extractor.getObjectCall(member)
+
+def makeWarmCompiler():
+	compiler = context.CompilerContext(Console())
+
+	with compiler.console.scope('warm up'):
+		compiler.extractor = Extractor(compiler)
+
+		with compiler.console.scope('stubs'):
+			makeStubs(compiler)
+
+		with compiler.console.scope('shader library'):
+			for name in warmModules:
+				__import__(name)
+				warmModule(compiler, sys.modules[name])
+
+	return compiler
+
+def collectStats(compiler):
+	result = {}
+	for stage, lut in compiler.stats.iteritems():
+		result[stage] = dict([(name, dict(collect.opCount)) for name, collect in lut.iteritems()])
+	return result
+
+def compileRequest(compiler, request):
+	# Everything the compiler prints goes back to the client.
+	log = StringIO()
+	compiler.console.out = log
+
+	stdout = sys.stdout
+	sys.stdout = log
+
+	try:
+		try:
+			success = Makefile(str(request['makefile'])).pystreamCompile(compiler)
+		except Exception:
+			traceback.print_exc(file=log)
+			success = False
+	finally:
+		sys.stdout = stdout
+
+	generated = {}
+	for name, (vs, fs) in compiler.generated.iteritems():
+		generated[name] = {'vs':vs, 'fs':fs}
+
+	return {'success':bool(success), 'glsl':generated, 'stats':collectStats(compiler), 'log':log.getvalue()}
+
+def readLine(conn):
+	chunks = []
+	while True:
+		data = conn.recv(4096)
+		if not data: break
+		chunks.append(data)
+		if '\n' in data: break
+	return "".join(chunks).split('\n', 1)[0]
+
+def writeLine(conn, data):
+	conn.sendall(json.dumps(data)+'\n')
+
+def handleConnection(compiler, conn):
+	try:
+		request = json.loads(readLine(conn))
+		if request.get('command') == 'shutdown':
+			writeLine(conn, {'success':True})
+			return False
+
+		pid = os.fork()
+		if pid == 0:
+			# The child compiles from the warm state, and never returns.
+			# It reaps its own children, such as translation workers.
+			signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+			status = 0
+			try:
+				try:
+					reply = compileRequest(compiler, request)
+				except Exception:
+					reply = {'success':False, 'log':traceback.format_exc()}
+					status = 1
+				writeLine(conn, reply)
+			finally:
+				conn.close()
+				os._exit(status)
+	except ValueError, e:
+		writeLine(conn, {'success':False, 'log':"Bad request: %s\n" % e})
+
+	return True
+
+def reapChildren():
+	while True:
+		try:
+			pid, status = os.waitpid(-1, os.WNOHANG)
+		except OSError, e:
+			if e.errno == errno.ECHILD: return
+			raise
+		if pid == 0: return
+
+def childExited(signum, frame):
+	reapChildren()
+
+def serve(path):
+	compiler = makeWarmCompiler()
+
+	if os.path.exists(path):
+		os.remove(path)
+
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	server.bind(path)
+	server.listen(16)
+
+	compiler.console.output("Listening on %s" % path)
+
+	# Children are reaped as they exit, rather than after the next request.
+	previous = signal.signal(signal.SIGCHLD, childExited)
+	signal.siginterrupt(signal.SIGCHLD, False)
+
+	try:
+		running = True
+		while running:
+			conn, addr = server.accept()
+			try:
+				running = handleConnection(compiler, conn)
+			finally:
+				conn.close()
+	finally:
+		signal.signal(signal.SIGCHLD, previous)
+		server.close()
+		os.remove(path)
+
+def request(path, data):
+	conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	conn.connect(path)
+	try:
+		writeLine(conn, data)
+		return json.loads(readLine(conn))
+	finally:
+		conn.close()
+
+def compileMakefile(path, filename):
+	return request(path, {'command':'compile', 'makefile':os.path.abspath(filename)})
+
+def shutdown(path):
+	return request(path, {'command':'shutdown'})
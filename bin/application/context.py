@@ -32,10 +32,19 @@ class Slots(object):
 		return uniqueName
 
 class CompilerContext(object):
-	__slots__ = 'console', 'extractor', 'slots', 'stats'
+	__slots__ = 'console', 'extractor', 'slots', 'stats', 'incremental', 'generated', 'shaderCosts'
 
 	def __init__(self, console):
 		self.console    = console
 		self.extractor  = None
 		self.slots      = Slots()
 		self.stats      = collections.defaultdict(dict)
+
+		# Dependency tracking for incremental recompilation, if enabled.
+		self.incremental = None
+
+		# Shader name -> (vertex shader, fragment shader) GLSL source.
+		self.generated = {}
+
+		# Shader name -> (vertex shader, fragment shader) estimated cost.
+		self.shaderCosts = {}
@@ -0,0 +1,311 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Incremental recompilation.
+# After the first CPA pass, the code reachable from each shader program is
+# recorded as a set of dependencies.  Python functions are fingerprinted
+# by their bytecode, other code (such as stubs) by the file it came from.
+# The constants and classes a function refers to are covered by the source
+# of the module defining them, and the compiler itself by its own source.
+# On the next compile, only shader programs with a changed dependency are
+# compiled again.  The results of the others are restored from the manifest.
+
+import sys
+import os.path
+import types
+import collections
+import cPickle
+
+from util.io import filesystem
+from util.python import moduleForGlobalDict
+
+from language.python.shaderprogram import ShaderProgram
+
+import stats.shader
+
+import config
+
+# Bump this whenever the manifest format changes.
+version = 2
+
+def codeFingerprint(code):
+	# Line numbers are ignored, so editing one function does not dirty
+	# every function that follows it in the same file.
+	parts = [code.co_code, code.co_names, code.co_varnames,
+		code.co_freevars, code.co_cellvars,
+		code.co_argcount, code.co_flags]
+
+	for const in code.co_consts:
+		if isinstance(const, types.CodeType):
+			parts.append(codeFingerprint(const))
+		else:
+			parts.append((type(const).__name__, repr(const)))
+
+	return filesystem.dataHash(repr(parts)).encode('hex')
+
+def fileFingerprint(filename):
+	if not os.path.exists(filename):
+		return None
+	directory, name = os.path.split(filename)
+	return filesystem.fileHash(directory, name, binary=True).encode('hex')
+
+# The compiler's own source.
+compilerSources = ['analysis', 'application', 'decompiler', 'language',
+	'optimization', 'stats', 'stubs', 'translator', 'util', 'config.py']
+
+def compilerFingerprint():
+	return filesystem.compilerSourceHash(compilerSources).encode('hex')
+
+def sourceFile(filename):
+	# Depend on the source, not the compiled module.
+	base, ext = os.path.splitext(filename)
+	if ext in ('.pyc', '.pyo'):
+		return base + '.py'
+	return filename
+
+def qualifiedFunctionName(func):
+	# Returns (module name, qualified name), or None if the function
+	# cannot be found again by name.
+	try:
+		mname, module = moduleForGlobalDict(func.func_globals)
+	except AssertionError:
+		return None
+
+	name = func.__name__
+	d = module.__dict__
+
+	if d.get(name) is func:
+		return mname, name
+
+	for clsname, cls in d.iteritems():
+		if isinstance(cls, (type, types.ClassType)) and cls.__module__ == mname:
+			member = cls.__dict__.get(name)
+			member = getattr(member, '__func__', member)
+			if member is func:
+				return mname, "%s.%s" % (clsname, name)
+
+	return None
+
+def referencedNames(code, names):
+	names.update(code.co_names)
+	for const in code.co_consts:
+		if isinstance(const, types.CodeType):
+			referencedNames(const, names)
+	return names
+
+def globalSources(func):
+	# The bytecode only names the globals a function uses, so their values
+	# are covered by the source of the module that defines them.
+	# Functions are left out, as their code is a dependency of its own.
+	glbls = func.func_globals
+	filenames = set()
+
+	for name in referencedNames(func.func_code, set()):
+		if name not in glbls: continue
+		value = glbls[name]
+
+		if isinstance(value, types.FunctionType):
+			continue
+		elif isinstance(value, types.ModuleType):
+			module = value
+		elif isinstance(value, (type, types.ClassType)):
+			module = sys.modules.get(value.__module__)
+		else:
+			module = None
+
+		if module is not None:
+			filename = getattr(module, '__file__', None)
+		else:
+			filename = glbls.get('__file__')
+
+		if filename:
+			filenames.add(sourceFile(filename))
+
+	return filenames
+
+def lookupFunction(mname, qualname):
+	module = sys.modules.get(mname)
+	if module is None:
+		try:
+			__import__(mname)
+		except ImportError:
+			return None
+		module = sys.modules[mname]
+
+	obj = module
+	for part in qualname.split('.'):
+		if isinstance(obj, (type, types.ClassType)):
+			obj = obj.__dict__.get(part)
+		else:
+			obj = getattr(obj, part, None)
+		obj = getattr(obj, '__func__', obj)
+		if obj is None: return None
+
+	return obj if isinstance(obj, types.FunctionType) else None
+
+def currentFingerprint(dependency):
+	kind = dependency[0]
+
+	if kind == 'function':
+		func = lookupFunction(dependency[1], dependency[2])
+		if func is None: return None
+		return codeFingerprint(func.func_code)
+	elif kind == 'file':
+		return fileFingerprint(dependency[1])
+	elif kind == 'compiler':
+		return compilerFingerprint()
+	else:
+		assert False, dependency
+
+def functionIndex(extractor):
+	# Index the code by the Python functions it was decompiled from.
+	functions = collections.defaultdict(list)
+	for obj, code in extractor.desc.callLUT.iteritems():
+		pyobj = getattr(obj, 'pyobj', None)
+		if isinstance(pyobj, types.FunctionType):
+			functions[code].append(pyobj)
+	return functions
+
+def codeDependencies(functions, code):
+	dependencies = {}
+
+	for func in functions.get(code, ()):
+		qualname = qualifiedFunctionName(func)
+		if qualname is not None:
+			dependencies[('function',)+qualname] = codeFingerprint(func.func_code)
+			for filename in globalSources(func):
+				dependencies[('file', filename)] = fileFingerprint(filename)
+			return dependencies
+
+	# Fall back on the source file.
+	origin = code.annotation.origin
+	if origin is not None and origin.filename:
+		filename = sourceFile(origin.filename)
+		dependencies[('file', filename)] = fileFingerprint(filename)
+
+	return dependencies
+
+
+class ShaderRecord(object):
+	__slots__ = 'name', 'dependencies', 'stats'
+
+	def __init__(self, name):
+		self.name         = name
+		self.dependencies = {}
+		self.stats        = {}
+
+	def isDirty(self):
+		for dependency, fingerprint in self.dependencies.iteritems():
+			if currentFingerprint(dependency) != fingerprint:
+				return True
+		return False
+
+
+class IncrementalBuild(object):
+	def __init__(self, makefile):
+		self.directory = os.path.join(config.cacheDirectory, 'incremental')
+		self.name      = filesystem.dataHash(os.path.abspath(makefile)).encode('hex')
+		self.makefileFingerprint = fileFingerprint(makefile)
+
+		self.records  = {}
+		self.compiled = set()
+		self.reused   = set()
+
+		self.load()
+
+	def load(self):
+		if not os.path.exists(filesystem.join(self.directory, self.name, 'pickle')):
+			return
+
+		try:
+			data = cPickle.loads(filesystem.readData(self.directory, self.name, 'pickle', binary=True))
+		except (EnvironmentError, EOFError, cPickle.UnpicklingError):
+			return
+
+		# Changing the makefile changes the declarations, so rebuild everything.
+		if data.get('version') == version and data.get('makefile') == self.makefileFingerprint:
+			self.records = data['shaders']
+
+	def save(self):
+		data = {'version':version, 'makefile':self.makefileFingerprint, 'shaders':self.records}
+		filesystem.writeBinaryData(self.directory, self.name, 'pickle', cPickle.dumps(data, 2))
+
+	def selectShaders(self, compiler, glsl):
+		# Filter the shader declarations, leaving only those that need to be compiled.
+		shaders = []
+
+		for shader, args in glsl._shader:
+			name = shader.typeobj.__name__
+			record = self.records.get(name)
+
+			if record is None or record.isDirty():
+				shaders.append((shader, args))
+				self.compiled.add(name)
+			else:
+				self.reused.add(name)
+
+		compiler.console.output("Incremental: %d shader programs to compile, %d up to date." % (len(self.compiled), len(self.reused)))
+
+		glsl._shader = shaders
+
+	def restoreResults(self, compiler):
+		for name in self.reused:
+			record = self.records[name]
+			for stage, opCount in record.stats.iteritems():
+				collect = stats.shader.ShaderStatCollector()
+				collect.opCount.update(opCount)
+				compiler.stats[stage][stats.shader.remap.get(name, name)] = collect
+
+	def recordAnalysis(self, compiler, dataflow):
+		functions = functionIndex(compiler.extractor)
+
+		# The code-level call graph.
+		callees = collections.defaultdict(set)
+		for cop, dsts in dataflow.opInvokes.iteritems():
+			for dst in dsts:
+				callees[cop.code].add(dst.code)
+
+		for entryPoint, cop in dataflow.entryPointOp.iteritems():
+			if not isinstance(entryPoint.code, ShaderProgram): continue
+
+			name = entryPoint.code.codeName()
+			if name not in self.compiled: continue
+
+			record = ShaderRecord(name)
+			record.dependencies[('compiler',)] = compilerFingerprint()
+
+			processed = set()
+			pending = [dst.code for dst in dataflow.opInvokes[cop]]
+
+			while pending:
+				code = pending.pop()
+				if code in processed: continue
+				processed.add(code)
+
+				record.dependencies.update(codeDependencies(functions, code))
+				pending.extend(callees[code])
+
+			self.records[name] = record
+
+	def finish(self, compiler):
+		for name in self.compiled:
+			record = self.records.get(name)
+			if record is None: continue
+
+			statName = stats.shader.remap.get(name, name)
+			for stage, lut in compiler.stats.iteritems():
+				if statName in lut:
+					record.stats[stage] = dict(lut[statName].opCount)
+
+		self.save()
@@ -18,8 +18,13 @@ import os.path
 from decompiler.programextractor import extractProgram
 import application.pipeline
 from util.application.console import Console
+from util.application import profile
+from util import typedispatch
+
+import config
 
 from . import context
+from . import incremental
 from . program import Program
 
 from . import interface
@@ -95,8 +100,9 @@ class Makefile(object):
 		f = open(self.filename)
 		exec f in makeDSL
 
-	def pystreamCompile(self):
-		compiler = context.CompilerContext(Console())
+	def pystreamCompile(self, compiler=None):
+		if compiler is None:
+			compiler = context.CompilerContext(Console(trackObjects=config.profileObjects))
 		prgm = Program()
 
 		self.interface = prgm.interface
@@ -108,10 +114,37 @@ class Makefile(object):
 
 			if not self.interface:
 				compiler.console.output("No entry points, nothing to do.")
-				return
+				return True
 
 			assert self.outdir, "No output directory declared."
 
+			if config.incrementalRecompile:
+				compiler.incremental = incremental.IncrementalBuild(self.filename)
+				compiler.incremental.selectShaders(compiler, self.interface.glsl)
+
+				if not self.interface:
+					compiler.console.output("Everything is up to date, nothing to do.")
+					return True
+
+		if config.countDispatchVisits:
+			typedispatch.setInstrumented(True)
+
 		extractProgram(compiler, prgm)
 
-		application.pipeline.evaluate(compiler, prgm, self.moduleName)
+		if compiler.incremental is not None:
+			compiler.incremental.restoreResults(compiler)
+
+		success = application.pipeline.evaluate(compiler, prgm, self.moduleName)
+
+		if config.dumpProfile:
+			profile.dump(compiler.console, os.path.join(config.outputDirectory, 'profile'), self.moduleName)
+
+		if config.countDispatchVisits:
+			with compiler.console.scope('dispatch visits'):
+				typedispatch.dumpVisitCounts(compiler.console)
+			typedispatch.setInstrumented(False)
+
+		if success and compiler.incremental is not None:
+			compiler.incremental.finish(compiler)
+
+		return success
@@ -17,6 +17,7 @@ import util
 
 #import analysis.ipa
 import analysis.cpa
+import analysis.cpa.adaptive
 import analysis.lifetimeanalysis
 import analysis.dump.dumpreport
 import analysis.programculler
@@ -106,7 +107,14 @@ def depythonPass(compiler, prgm, opPathLength=0, firstPass=True):
 		#analysis.ipa.evaluate(compiler, prgm)
 		#assert False, "abort"
 
-		analysis.cpa.evaluate(compiler, prgm, opPathLength, firstPass=firstPass)
+		if opPathLength and config.cpaAdaptiveContexts:
+			# opPathLength becomes the maximum depth.
+			dataflow = analysis.cpa.adaptive.evaluate(compiler, prgm, opPathLength, config.cpaContextBudget, firstPass=firstPass)
+		else:
+			dataflow = analysis.cpa.evaluate(compiler, prgm, opPathLength, firstPass=firstPass)
+
+		if firstPass and compiler.incremental is not None:
+			compiler.incremental.recordAnalysis(compiler, dataflow)
 
 		if firstPass:
 			stats.contextStats(compiler, prgm, 'firstpass' if firstPass else 'secondpass', classOK=firstPass)
@@ -141,6 +149,8 @@ def evaluate(compiler, prgm, name):
 
 					if config.dumpStats:
 						stats.shader.digest(compiler)
+
+				return True
 			finally:
 				if config.doDump:
 					try:
@@ -163,3 +173,4 @@ def evaluate(compiler, prgm, name):
 	except errors.CompilerAbort, e:
 		print
 		print "ABORT", e
+		return False
@@ -0,0 +1,85 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#!/c/python25/python
+from __future__ import absolute_import
+
+# Benchmarks the compiler on the full test programs.
+#   benchmark.py [-n runs] [--caches cold|warm] [-o results.json] [-b baseline.json] [program ...]
+# Programs are named after their makefiles, "physics" for tests/full/makephysics.py.
+# With a baseline, exits with an error if any measurement regressed.
+
+import sys
+import os
+import glob
+import optparse
+
+import scriptsetup
+import config
+
+root = scriptsetup.scriptRoot(__file__)
+scriptsetup.libraryDirectory(root, '..', 'lib')
+
+from util.application.console import Console
+from application import benchmark
+
+def findMakefiles(names):
+	directory = os.path.join(root, 'tests', 'full')
+	if not names:
+		return sorted(glob.glob(os.path.join(directory, 'make*.py')))
+
+	filenames = []
+	for name in names:
+		filename = os.path.join(directory, 'make%s.py' % name)
+		if not os.path.exists(filename):
+			parser.error("No makefile for %r." % name)
+		filenames.append(filename)
+	return filenames
+
+parser = optparse.OptionParser(usage="%prog [options] [program ...]")
+parser.add_option('-n', '--runs', dest='runs', type='int', default=3, help="number of times to compile each program")
+parser.add_option('--caches', dest='caches', choices=benchmark.cacheModes, default='cold', help="compile with empty caches (cold), or caches filled by an earlier compile (warm)")
+parser.add_option('-o', '--output', dest='output', default=None, help="file to write the results to")
+parser.add_option('-b', '--baseline', dest='baseline', default=None, help="results to compare against")
+parser.add_option('--time-threshold', dest='time', type='float', default=benchmark.defaultThresholds['time'], help="allowed relative growth of phase times")
+parser.add_option('--memory-threshold', dest='memory', type='float', default=benchmark.defaultThresholds['memory'], help="allowed relative growth of peak memory")
+parser.add_option('--count-threshold', dest='count', type='float', default=benchmark.defaultThresholds['count'], help="allowed relative growth of counters, such as contexts")
+options, args = parser.parse_args()
+
+if options.runs < 1:
+	parser.error("At least one run is needed.")
+
+console = Console()
+with console.scope('benchmark'):
+	results = benchmark.run(findMakefiles(args), options.runs, console, options.caches)
+
+	if options.output is not None:
+		benchmark.save(options.output, results)
+
+	failed = not all([program['success'] for program in results['programs'].itervalues()])
+
+	if options.baseline is not None:
+		thresholds = {'time':options.time, 'memory':options.memory, 'count':options.count}
+		try:
+			regressions = benchmark.compare(benchmark.load(options.baseline), results, thresholds)
+		except ValueError, e:
+			parser.error(str(e))
+
+		for regression in regressions:
+			console.output(repr(regression))
+		console.output("%d regressions" % len(regressions))
+
+		failed |= bool(regressions)
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,36 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#!/c/python25/python
+from __future__ import absolute_import
+
+# Builds the precompiled stub library.
+# This is done automatically by the first compile after the stubs change,
+# running it ahead of time keeps that cost out of the first compile.
+
+import scriptsetup
+import config
+
+root = scriptsetup.scriptRoot(__file__)
+scriptsetup.libraryDirectory(root, '..', 'lib')
+
+from util.application.console import Console
+from application.context import CompilerContext
+from decompiler.programextractor import Extractor
+from stubs import stubcollector
+
+compiler = CompilerContext(Console())
+
+with compiler.console.scope('stubs'):
+	compiler.extractor = Extractor(compiler)
+	stubcollector.makeStubs(compiler, rebuild=True)
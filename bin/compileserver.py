@@ -0,0 +1,63 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#!/c/python25/python
+from __future__ import absolute_import
+
+# Runs the compile server, or sends it requests.
+#   compileserver.py serve
+#   compileserver.py compile makefile.py ...
+#   compileserver.py shutdown
+
+import sys
+import optparse
+
+import scriptsetup
+import config
+
+root = scriptsetup.scriptRoot(__file__)
+scriptsetup.libraryDirectory(root, '..', 'lib')
+
+from util.io import filesystem
+from application import compileserver
+
+parser = optparse.OptionParser(usage="%prog [options] serve|compile|shutdown [makefile ...]")
+parser.add_option('-s', '--socket', dest='socket', default=config.compileServerSocket, help="path of the server socket")
+parser.add_option('-o', '--output', dest='output', default=None, help="directory to write the generated GLSL to")
+options, args = parser.parse_args()
+
+if not args:
+	parser.error("No command given.")
+
+command = args[0]
+
+if command == 'serve':
+	filesystem.ensureDirectoryExists(config.cacheDirectory)
+	compileserver.serve(options.socket)
+elif command == 'compile':
+	failed = False
+	for filename in args[1:]:
+		result = compileserver.compileMakefile(options.socket, filename)
+		sys.stdout.write(result.get('log', ''))
+
+		if options.output is not None:
+			for name, shader in result.get('glsl', {}).iteritems():
+				filesystem.writeData(options.output, name, 'vert', shader['vs'])
+				filesystem.writeData(options.output, name, 'frag', shader['fs'])
+
+		failed |= not result['success']
+	sys.exit(1 if failed else 0)
+elif command == 'shutdown':
+	compileserver.shutdown(options.socket)
+else:
+	parser.error("Unknown command %r." % command)
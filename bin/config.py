@@ -22,8 +22,53 @@ import os.path
 base, junk = os.path.split(__file__)
 outputDirectory = os.path.normpath(os.path.join(base, '..', 'summaries'))
 
+# Persistent caches are kept between compiles, relative to this config file.
+cacheDirectory = os.path.normpath(os.path.join(base, '..', 'cache'))
+
+# Reuse decompiled code from previous compiles?
+useDecompilerCache = True
+
+# Reuse the interprocedural summaries of unchanged code from previous compiles?
+useSummaryCache = True
+
+# Load the runtime stubs from a precompiled library, instead of building them every compile?
+useStubLibrary = True
+
+# Extract the attributes and items of existing objects only when the analysis asks for them?
+demandDrivenExtraction = False
+
+# The Unix socket the compile server listens on.
+compileServerSocket = os.path.join(cacheDirectory, 'compileserver.sock')
+
+# Only recompile the shader programs whose code changed since the last compile?
+incrementalRecompile = False
+
+# Number of processes used to translate shader programs. (Requires fork.)
+translationProcesses = 1
+
+# Write a per-phase profile of the compiler (JSON and collapsed stacks) to the output directory?
+dumpProfile = False
+
+# Also track the number of live objects per phase? (Slow.)
+profileObjects = False
+
+# Count the nodes each TypeDispatcher pass visits, and print the busiest?
+countDispatchVisits = False
+
 doDump = False
 maskDumpErrors = False
+
+# Eliminate common subexpressions and simplify the arithmetic of the generated GLSL?
+simplifyGLSL = True
+
+# Pack the uniforms into one std140 buffer, uploaded with bind_uniform_block? (The runtime must implement it.)
+packUniformBlocks = False
+
+# Check the lifetime analysis database against its schemas on every access? (Slow.)
+validateDatabase = False
+
+# Number of processes used to render the dump report, and to run Graphviz. (Rendering in parallel requires fork.)
+dumpProcesses = 1
 doThreadCleanup = False
 
 dumpStats = False
@@ -31,6 +76,25 @@ dumpStats = False
 
 # Pointer analysis testing
 useXTypes = True
+
+# Represent points-to sets as interned bit vectors, rather than frozensets?
+useBitsetSetManager = False
+
+# CPA solver options.
+# Only propagate the values a constraint has not seen before?
+cpaDifferentialPropagation = False
+# Process constraints in topological order of the constraint graph?
+cpaOrderedWorklist = False
+# Collapse cycles of copies, when the worklist is ordered?
+cpaCollapseCycles = False
+# Only make the call sites that need it call-path sensitive, instead of all of them?
+cpaAdaptiveContexts = False
+# Stop distinguishing call paths after this many contexts. (0 is unlimited.)
+cpaContextBudget = 0
+
+# Shape analysis options.
+# Process constraints in reverse postorder, with callers before callees?
+shapeOrderedWorklist = False
 useControlSensitivity = True
 useCPA = True
 
@@ -54,11 +54,22 @@ def decompile(compiler, func, trace=False, ssa=True, descriptive=False):
 	except:
 		mname = 'unknown_module'
 
-	code = decompileCode(compiler, func.func_code, mname, trace=trace, ssa=ssa)
+	cache = compiler.extractor.codeCache if not trace else None
 
-	# Flow sensitive, works without a ssa or ssi transform.
-	code.rewriteAnnotation(descriptive=descriptive)
-	optimization.simplify.evaluateCode(compiler, None, code)
+	if cache is not None:
+		code = cache.load(func.func_code, mname, ssa, descriptive)
+	else:
+		code = None
+
+	if code is None:
+		code = decompileCode(compiler, func.func_code, mname, trace=trace, ssa=ssa)
+
+		# Flow sensitive, works without a ssa or ssi transform.
+		code.rewriteAnnotation(descriptive=descriptive)
+		optimization.simplify.evaluateCode(compiler, None, code)
+
+		if cache is not None:
+			cache.store(func.func_code, mname, ssa, descriptive, code)
 
 	if trace:
 		SimpleCodeGen(sys.stdout).process(code)
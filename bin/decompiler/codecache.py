@@ -0,0 +1,130 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A content-addressed, on-disk cache of decompiled code.
+# Decompiled ASTs are pickled, with references to program objects
+# replaced by references to the Python objects they wrap.
+# When the cache is loaded, the references are re-extracted.
+
+from __future__ import absolute_import
+
+import sys
+import os.path
+import marshal
+import cPickle
+from cStringIO import StringIO
+
+from util.io import filesystem
+
+from language.python import program
+from language.python import annotations
+
+# The source that decides what the decompiler outputs, and how it is cached.
+# Changing any of it invalidates the cache.
+sources = ['decompiler', 'language/python', 'optimization', 'util/python']
+
+class UncacheableObject(cPickle.PicklingError):
+	pass
+
+sharedAnnotations = {
+	'code':annotations.emptyCodeAnnotation,
+	'op':annotations.emptyOpAnnotation,
+	'slot':annotations.emptySlotAnnotation,
+	}
+
+sharedAnnotationNames = dict([(id(v), k) for k, v in sharedAnnotations.iteritems()])
+
+def isReferencable(pyobj):
+	if type(pyobj) in program.lexicalConstantTypes:
+		return True
+
+	# Types and functions are pickled by name.
+	# Make sure the name actually resolves to the object.
+	module = sys.modules.get(getattr(pyobj, '__module__', None))
+	name   = getattr(pyobj, '__name__', None)
+	return module is not None and isinstance(name, str) and getattr(module, name, None) is pyobj
+
+def codeKey(code, mname, ssa, descriptive):
+	# marshal covers co_code, the constants, the names, and any nested code.
+	data = marshal.dumps((filesystem.compilerSourceHash(sources), sys.version_info[:2], mname, ssa, descriptive, marshal.dumps(code)))
+	return filesystem.dataHash(data).encode('hex')
+
+class CodeCache(object):
+	def __init__(self, extractor, directory):
+		self.extractor = extractor
+		self.directory = directory
+
+		self.hits   = 0
+		self.misses = 0
+		self.uncacheable = 0
+
+	def persistentID(self, obj):
+		if isinstance(obj, program.AbstractObject):
+			if isinstance(obj, program.Object) and isReferencable(obj.pyobj):
+				return ('object', obj.pyobj)
+			else:
+				raise UncacheableObject, obj
+		elif id(obj) in sharedAnnotationNames:
+			return ('annotation', sharedAnnotationNames[id(obj)])
+		else:
+			return None
+
+	def persistentLoad(self, pid):
+		kind, value = pid
+		if kind == 'object':
+			return self.extractor.getObject(value)
+		elif kind == 'annotation':
+			return sharedAnnotations[value]
+		else:
+			raise cPickle.UnpicklingError, "Unknown persistent reference %r" % (pid,)
+
+	def load(self, code, mname, ssa, descriptive):
+		key = codeKey(code, mname, ssa, descriptive)
+
+		if not os.path.exists(filesystem.join(self.directory, key, 'pickle')):
+			self.misses += 1
+			return None
+
+		try:
+			data = filesystem.readData(self.directory, key, 'pickle', binary=True)
+			unpickler = cPickle.Unpickler(StringIO(data))
+			unpickler.persistent_load = self.persistentLoad
+			result = unpickler.load()
+		except (EnvironmentError, EOFError, cPickle.UnpicklingError, AttributeError, ImportError):
+			# Stale or corrupt entry, decompile it again.
+			self.misses += 1
+			return None
+
+		self.hits += 1
+		return result
+
+	def store(self, code, mname, ssa, descriptive, tree):
+		key = codeKey(code, mname, ssa, descriptive)
+
+		sio = StringIO()
+		pickler = cPickle.Pickler(sio, 2)
+		pickler.persistent_id = self.persistentID
+
+		try:
+			pickler.dump(tree)
+		except (cPickle.PicklingError, TypeError):
+			# The tree references objects that cannot be found again by name.
+			self.uncacheable += 1
+			return False
+
+		filesystem.writeBinaryData(self.directory, key, 'pickle', sio.getvalue())
+		return True
+
+	def status(self):
+		return "%d hits, %d misses, %d uncacheable" % (self.hits, self.misses, self.uncacheable)
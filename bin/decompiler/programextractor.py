@@ -26,11 +26,16 @@ from . errors import IrreducibleGraphException
 import inspect
 
 from . import errors
+from . codecache import CodeCache
 
 import sys
+import os.path
 import dis
+import time
 import util
 
+import config
+
 from application.errors import TemporaryLimitation, InternalError
 
 from util.monkeypatch import xtypes
@@ -97,6 +102,12 @@ class Extractor(object):
 
 		self.lazy = True
 
+		# Only extract the attributes and items of an object when they are asked for?
+		# Requires lazy extraction.
+		self.demand = self.lazy and config.demandDrivenExtraction
+
+		# Objects that may have attributes or items that have not been extracted, yet.
+		self.partial = set()
 
 		# Status
 		self.errors = 0
@@ -105,6 +116,14 @@ class Extractor(object):
 		self.builtin = 0
 		self.badopcodes = collections.defaultdict(lambda: 0)
 
+		# Time spent decompiling, including decompiler cache lookups.
+		self.decompileTime = 0.0
+
+		if config.useDecompilerCache:
+			self.codeCache = CodeCache(self, os.path.join(config.cacheDirectory, 'decompiled'))
+		else:
+			self.codeCache = None
+
 		# Used for debugging, prevents new object from being extracted when set to true.
 		self.finalized = False
 
@@ -176,7 +195,8 @@ class Extractor(object):
 
 	def replaceCode(self, obj, code):
 		assert not isinstance(obj, program.AbstractObject), obj
-		assert not id(obj) in self.objcache, obj
+		# The object may already be extracted, as long as it has not been processed.
+		assert not id(obj) in self.objcache or not self.complete[self.objcache[id(obj)]], obj
 		self.codeLUT[id(obj)] = code
 
 	def initalizeObjects(self):
@@ -320,6 +340,9 @@ class Extractor(object):
 		print "%d errors." % self.errors
 		print "%d failiures." % self.failiures
 
+		if self.codeCache is not None:
+			print "Decompiler cache: %s." % self.codeCache.status()
+
 		self.printBadOpcodes()
 
 	def printBadOpcodes(self):
@@ -356,8 +379,9 @@ class Extractor(object):
 			mangledDictName = self.dictSlotForObj(pyobj)
 			if mangledDictName:
 				mangledDictNameObj = self.__getObject(mangledDictName)
-				if mangledDictNameObj in obj.slot:
-					obj.addLowLevel(self.desc.dictionaryName, obj.slot[mangledDictNameObj])
+				dictObj = self.lookupSlot(obj, 'Attribute', mangledDictNameObj)
+				if dictObj is not None:
+					obj.addLowLevel(self.desc.dictionaryName, dictObj)
 
 		# No function pointers, so C function pointers are transformed into a hidden function object.
 		if isinstance(pyobj, xtypes.TypeNeedsHiddenStub):
@@ -417,6 +441,7 @@ class Extractor(object):
 		self.ensureLoaded(obj)
 		dictobj = obj.lowlevel[self.desc.dictionaryName]
 		self.ensureLoaded(dictobj)
+		self.completeObject(dictobj)
 		return dictobj.dictionary
 
 	def handleLowLevel(self, obj):
@@ -436,14 +461,7 @@ class Extractor(object):
 			assert not isinstance(name, program.AbstractObject), name
 			assert not isinstance(member, program.AbstractObject), member
 
-			# TODO Directly test for slot wrapper?
-			# TODO slot wrapper for methods?
-			isMember = inspect.ismemberdescriptor(member)
-
-			# HACK some getsets may as well be members
-			isMember |= inspect.isgetsetdescriptor(member) and member in self.getsetMember
-
-			if isMember:
+			if self.isMember(member):
 				try:
 					value = member.__get__(pyobj, type(pyobj))
 				except:
@@ -472,14 +490,7 @@ class Extractor(object):
 
 	def handleContainer(self, obj):
 		if isinstance(obj.pyobj, (dict, xtypes.DictProxyType)):
-			lut = {}
-
-			# If this is a type dict, some attributes may be replaced.
-			if obj in self.typeDictType:
-				cls = self.typeDictType[obj]
-				clsid = id(cls.pyobj)
-				if clsid in self.attrLUT:
-					lut = self.attrLUT[clsid]
+			lut = self.replacedAttrs(obj)
 
 			keys = set(obj.pyobj.iterkeys())
 			keys.update(lut.iterkeys())
@@ -502,10 +513,124 @@ class Extractor(object):
 		pyobj = obj.pyobj
 
 		self.handleLowLevel(obj)
+
+		if self.demand:
+			self.partial.add(obj)
+		else:
+			self.handleContents(obj)
+
+	def handleContents(self, obj):
 		self.handleSlots(obj)
 		self.handleObjectDict(obj)
 		self.handleContainer(obj)
 
+	def isMember(self, member):
+		# TODO Directly test for slot wrapper?
+		# TODO slot wrapper for methods?
+		isMember = inspect.ismemberdescriptor(member)
+
+		# HACK some getsets may as well be members
+		isMember |= inspect.isgetsetdescriptor(member) and member in self.getsetMember
+
+		return isMember
+
+	def replacedAttrs(self, obj):
+		# If this is a type dict, some attributes may be replaced.
+		if obj in self.typeDictType:
+			cls = self.typeDictType[obj]
+			clsid = id(cls.pyobj)
+			if clsid in self.attrLUT:
+				return self.attrLUT[clsid]
+		return {}
+
+	###########################
+	### Demand driven slots ###
+	###########################
+
+	# Extracts all the attributes and items of an object.
+	def completeObject(self, obj):
+		if obj in self.partial:
+			self.partial.remove(obj)
+			self.handleContents(obj)
+
+	# Returns the value of a slot in an existing object, or None if the slot does not exist.
+	# When extraction is demand driven, only the requested slot is extracted.
+	def getSlot(self, obj, slottype, key):
+		self.ensureLoaded(obj)
+		return self.lookupSlot(obj, slottype, key)
+
+	def lookupSlot(self, obj, slottype, key):
+		d = obj.getDict(slottype)
+		if key not in d and obj in self.partial:
+			if slottype == 'Attribute':
+				self.extractAttribute(obj, key)
+			elif slottype == 'Dictionary':
+				self.extractDictionaryItem(obj, key)
+			elif slottype == 'Array':
+				self.extractArrayItem(obj, key)
+
+		return d.get(key)
+
+	def extractAttribute(self, obj, key):
+		pyobj = obj.pyobj
+		name  = key.pyobj
+
+		if not isinstance(name, str):
+			return
+
+		member = self.compiler.slots.reverse.get(name)
+		if member is not None:
+			# A mangled slot name, see handleSlots.
+			if self.isMember(member) and type_lookup(type(pyobj), member.__name__) is member:
+				value = member.__get__(pyobj, type(pyobj))
+				obj.addSlot(key, self.__getObject(value))
+		else:
+			# Promoted from the object dictionary, see handleObjectDict.
+			d = getattr(pyobj, '__dict__', None)
+			if d is not None and name in d:
+				obj.addSlot(key, self.__getObject(d[name]))
+
+	def hasKey(self, container, k):
+		try:
+			if k not in container:
+				return False
+		except TypeError:
+			# Unhashable.
+			return False
+
+		# Numbers that compare equal are different keys, as far as extraction is concerned.
+		if type(k) in (int, long, float, bool):
+			for other in container:
+				if type(other) is type(k) and other == k:
+					return True
+			return False
+
+		return True
+
+	def extractDictionaryItem(self, obj, key):
+		pyobj = obj.pyobj
+		k     = key.pyobj
+
+		if isinstance(pyobj, (dict, xtypes.DictProxyType)):
+			lut = self.replacedAttrs(obj)
+			if k in lut:
+				value = lut[k]
+			elif self.hasKey(pyobj, k):
+				value = pyobj.get(k)
+			else:
+				return
+			obj.addDictionaryItem(key, self.__getObject(value))
+		elif isinstance(pyobj, (set, frozenset)):
+			if self.hasKey(pyobj, k):
+				obj.addDictionaryItem(key, key)
+
+	def extractArrayItem(self, obj, key):
+		pyobj = obj.pyobj
+		index = key.pyobj
+
+		if isinstance(pyobj, (tuple, list)) and type(index) is int and 0 <= index < len(pyobj):
+			obj.addArrayItem(key, self.__getObject(pyobj[index]))
+
 
 	def handleType(self, obj):
 		# Flatten the type dictionary and add a low-level pointer.
@@ -569,6 +694,7 @@ class Extractor(object):
 	def decompileFunction(self, func, trace=False, ssa=True, descriptive=False):
 		function = None
 
+		start = time.clock()
 		try:
 			function = decompile(self.compiler, func, trace=trace, ssa=ssa, descriptive=descriptive)
 		except IrreducibleGraphException:
@@ -591,6 +717,10 @@ class Extractor(object):
 			raise
 		else:
 			self.functions += 1
+			if self.compiler.console is not None:
+				self.compiler.console.count('functions decompiled')
+		finally:
+			self.decompileTime += time.clock()-start
 
 		return function
 
@@ -598,9 +728,12 @@ class Extractor(object):
 from stubs import makeStubs
 
 def extractProgram(compiler, prgm):
-	compiler.extractor = Extractor(compiler)
+	# The extractor may already exist, warmed up by the compile server.
+	if compiler.extractor is None:
+		compiler.extractor = Extractor(compiler)
 
-	# Create stub functions
-	makeStubs(compiler)
+		# Create stub functions
+		with compiler.console.scope('stubs'):
+			makeStubs(compiler)
 
 	prgm.interface.translate(compiler.extractor)
@@ -0,0 +1,356 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A static cost model for generated GLSL.
+# Counts the operations a shader performs, by category, along with the
+# component width of each operation, so a vec4 add counts as one op of
+# four components.  Widths are inferred from the declared types of
+# locals, constants, constructors, and I/O, which is only an estimate:
+# the hardware may split, merge, or schedule the operations differently.
+# Register pressure is the largest number of temporaries live at once,
+# in program order.  A temporary used inside a loop is live for the
+# whole loop.
+#
+# The report is plain "key value" lines in a fixed order, so reports
+# from two versions of the compiler can be diffed.
+
+import re
+
+from util.typedispatch import *
+from . import ast as glsl
+from . import codecollapser
+
+categories = ['add', 'mul', 'div', 'compare', 'logic', 'transcendental', 'geometric', 'common', 'move']
+
+binaryCategory = {'+':'add', '-':'add', '*':'mul', '/':'div', '%':'div',
+	'<':'compare', '>':'compare', '<=':'compare', '>=':'compare', '==':'compare', '!=':'compare',
+	'&&':'logic', '||':'logic', '^^':'logic',
+	'&':'logic', '|':'logic', '^':'logic', '<<':'logic', '>>':'logic'}
+
+unaryCategory = {'-':'add', '+':'move', '!':'logic', '~':'logic'}
+
+intrinsicCategory = {}
+for name in ('exp', 'log', 'exp2', 'log2', 'pow', 'sqrt', 'inversesqrt',
+		'sin', 'cos', 'tan', 'asin', 'acos', 'atan'):
+	intrinsicCategory[name] = 'transcendental'
+for name in ('dot', 'cross', 'length', 'distance', 'normalize', 'reflect', 'refract', 'faceforward'):
+	intrinsicCategory[name] = 'geometric'
+
+# Intrinsics that reduce their arguments to a scalar.
+scalarIntrinsics = frozenset(['dot', 'length', 'distance'])
+
+swizzle = re.compile('^([xyzw]{1,4}|[rgba]{1,4}|[stpq]{1,4})$')
+vectorType = re.compile('^[biu]?vec([234])$')
+matrixType = re.compile('^mat([234])(?:x([234]))?$')
+
+def typeWidth(t):
+	# The number of scalar components of a type.
+	if isinstance(t, glsl.ArrayType):
+		return typeWidth(t.type)*t.count
+	elif isinstance(t, glsl.BuiltinType):
+		match = vectorType.match(t.name)
+		if match:
+			return int(match.group(1))
+
+		match = matrixType.match(t.name)
+		if match:
+			columns = int(match.group(1))
+			rows = int(match.group(2) or columns)
+			return columns*rows
+
+	return 1
+
+def isMatrix(t):
+	return isinstance(t, glsl.BuiltinType) and matrixType.match(t.name) is not None
+
+def isTexture(name):
+	return name.startswith('texture')
+
+class ShaderCost(object):
+	def __init__(self):
+		self.ops        = dict([(category, 0) for category in categories])
+		self.components = dict([(category, 0) for category in categories])
+
+		self.textures = 0
+		self.branches = 0
+		self.loops    = 0
+
+		self.uniforms = set()
+		self.inputs   = set()
+		self.outputs  = set()
+
+		self.temporaries = 0
+		self.pressure    = 0
+		self.pressureComponents = 0
+
+	def op(self, category, width):
+		self.ops[category] += 1
+		self.components[category] += width
+
+	@property
+	def aluOps(self):
+		return sum(self.ops.itervalues())
+
+	@property
+	def aluComponents(self):
+		return sum(self.components.itervalues())
+
+	def lines(self):
+		lines = []
+		for category in categories:
+			lines.append(("alu.%s" % category, "%d %d" % (self.ops[category], self.components[category])))
+		lines.append(("alu.total", "%d %d" % (self.aluOps, self.aluComponents)))
+		lines.append(("texture", "%d" % self.textures))
+		lines.append(("branches", "%d" % self.branches))
+		lines.append(("loops", "%d" % self.loops))
+
+		for name, decls in (('uniforms', self.uniforms), ('inputs', self.inputs), ('outputs', self.outputs)):
+			# Builtins such as gl_Position are not interpolated or bound.
+			user = [decl for decl in decls if not decl.builtin]
+			lines.append((name, "%d %d" % (len(user), sum([typeWidth(decl.type) for decl in user]))))
+
+		lines.append(("temporaries", "%d" % self.temporaries))
+		lines.append(("pressure", "%d %d" % (self.pressure, self.pressureComponents)))
+		return lines
+
+class CostModel(TypeDispatcher):
+	# Returns the inferred type of each expression, or None if it is unknown.
+	def __init__(self, cost):
+		self.cost = cost
+
+	def width(self, t):
+		return typeWidth(t) if t is not None else 1
+
+	def widest(self, types):
+		best = None
+		for t in types:
+			if t is not None and (best is None or typeWidth(t) > typeWidth(best)):
+				best = t
+		return best
+
+	@dispatch(str, int, float, type(None))
+	def visitLeaf(self, node):
+		return None
+
+	@dispatch(list, tuple)
+	def visitContainer(self, node):
+		for child in node:
+			self(child)
+
+	@dispatch(glsl.Constant, glsl.Local)
+	def visitTyped(self, node):
+		return node.type
+
+	@dispatch(glsl.Uniform)
+	def visitUniform(self, node):
+		self.cost.uniforms.add(node.decl)
+		return node.decl.type
+
+	@dispatch(glsl.Input)
+	def visitInput(self, node):
+		self.cost.inputs.add(node.decl)
+		return node.decl.type
+
+	@dispatch(glsl.Output)
+	def visitOutput(self, node):
+		self.cost.outputs.add(node.decl)
+		return node.decl.type
+
+	@dispatch(glsl.Constructor)
+	def visitConstructor(self, node):
+		for arg in node.args:
+			self(arg)
+		self.cost.op('move', self.width(node.type))
+		return node.type
+
+	@dispatch(glsl.BinaryOp)
+	def visitBinaryOp(self, node):
+		left  = self(node.left)
+		right = self(node.right)
+		category = binaryCategory[node.op]
+
+		if node.op == '*' and (isMatrix(left) or isMatrix(right)):
+			# A matrix product is a multiply-add per matrix component.
+			self.cost.op(category, max(self.width(left), self.width(right)))
+			if isMatrix(left) and isMatrix(right):
+				return left
+			return right if isMatrix(left) else left
+
+		result = self.widest((left, right))
+		self.cost.op(category, self.width(result))
+
+		if category == 'compare' or node.op in ('&&', '||', '^^'):
+			return None
+		return result
+
+	@dispatch(glsl.UnaryPrefixOp, glsl.UnaryPostfixOp)
+	def visitUnaryOp(self, node):
+		t = self(node.expr)
+		self.cost.op(unaryCategory.get(node.op, 'add'), self.width(t))
+		return t
+
+	@dispatch(glsl.ShortCircutAnd, glsl.ShortCircutOr)
+	def visitShortCircut(self, node):
+		for expr in node.exprs:
+			self(expr)
+		for expr in node.exprs[1:]:
+			self.cost.op('logic', 1)
+		self.cost.branches += 1
+		return None
+
+	@dispatch(glsl.IntrinsicOp)
+	def visitIntrinsicOp(self, node):
+		types = [self(arg) for arg in node.args]
+
+		if isTexture(node.name):
+			self.cost.textures += 1
+			return glsl.BuiltinType('vec4')
+
+		t = self.widest(types)
+		self.cost.op(intrinsicCategory.get(node.name, 'common'), self.width(t))
+
+		if node.name in scalarIntrinsics:
+			return glsl.BuiltinType('float')
+		return t
+
+	@dispatch(glsl.Load, glsl.GetAttr)
+	def visitLoad(self, node):
+		self(node.expr)
+		match = swizzle.match(node.name)
+		if match:
+			width = len(node.name)
+			return glsl.BuiltinType('vec%d' % width if width > 1 else 'float')
+		return None
+
+	@dispatch(glsl.GetSubscript)
+	def visitGetSubscript(self, node):
+		t = self(node.expr)
+		self(node.subscript)
+		if isinstance(t, glsl.ArrayType):
+			return t.type
+		return None
+
+	@dispatch(glsl.Assign, glsl.Discard, glsl.Return, glsl.Store, glsl.SetAttr, glsl.SetSubscript)
+	def visitStatement(self, node):
+		node.visitChildren(self)
+
+	@dispatch(glsl.Switch)
+	def visitSwitch(self, node):
+		self.cost.branches += 1
+		node.visitChildren(self)
+
+	@dispatch(glsl.While)
+	def visitWhile(self, node):
+		self.cost.loops += 1
+		node.visitChildren(self)
+
+	@dispatch(glsl.Suite)
+	def visitSuite(self, node):
+		for stmt in node.statements:
+			self(stmt)
+
+class FindReferences(TypeDispatcher):
+	@defaultdispatch
+	def visitOK(self, node):
+		node.visitChildren(self)
+
+	@dispatch(list, tuple)
+	def visitContainer(self, node):
+		for child in node:
+			self(child)
+
+	@dispatch(str, int, float, type(None), glsl.Constant, glsl.Uniform, glsl.Input, glsl.Output)
+	def visitLeaf(self, node):
+		pass
+
+	@dispatch(glsl.Local)
+	def visitLocal(self, node):
+		self.locals.add(node)
+
+	def process(self, node):
+		self.locals = set()
+		self(node)
+		return self.locals
+
+class LiveRanges(TypeDispatcher):
+	# Numbers the statements in program order, and finds the first and
+	# last statement that references each temporary.
+	def __init__(self):
+		self.index  = 0
+		self.ranges = {}
+		self.refs   = FindReferences()
+
+	def reference(self, lcls, start, end):
+		for lcl in lcls:
+			first, last = self.ranges.get(lcl, (start, end))
+			self.ranges[lcl] = (min(first, start), max(last, end))
+
+	def statement(self, node):
+		self.reference(self.refs.process(node), self.index, self.index)
+		self.index += 1
+
+	@defaultdispatch
+	def visitStatement(self, node):
+		self.statement(node)
+
+	@dispatch(glsl.Suite)
+	def visitSuite(self, node):
+		for stmt in node.statements:
+			self(stmt)
+
+	@dispatch(glsl.Switch)
+	def visitSwitch(self, node):
+		self.statement(node.condition)
+		self(node.t)
+		self(node.f)
+
+	@dispatch(glsl.While)
+	def visitWhile(self, node):
+		start = self.index
+		self.statement(node.condition)
+		self(node.body)
+		end = self.index
+
+		# Values live around the back edge.
+		self.reference(self.refs.process(node), start, end)
+
+def registerPressure(body):
+	ranges = LiveRanges()
+	ranges(body)
+
+	live = [0]*(ranges.index+1)
+	liveComponents = [0]*(ranges.index+1)
+	for lcl, (first, last) in ranges.ranges.iteritems():
+		for i in range(first, last+1):
+			live[i] += 1
+			liveComponents[i] += typeWidth(lcl.type)
+
+	return len(ranges.ranges), max(live), max(liveComponents)
+
+def evaluateCode(compiler, code):
+	# Measures the code as the code generator will emit it.
+	code = codecollapser.evaluateCode(compiler, code)
+
+	cost = ShaderCost()
+	CostModel(cost)(code.body)
+	cost.temporaries, cost.pressure, cost.pressureComponents = registerPressure(code.body)
+	return cost
+
+def formatReport(name, stages):
+	# stages is a list of (stage name, ShaderCost) pairs.
+	lines = ["# %s" % name]
+	for stage, cost in stages:
+		for key, value in cost.lines():
+			lines.append("%s.%s %s" % (stage, key, value))
+	return "\n".join(lines)+"\n"
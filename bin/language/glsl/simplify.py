@@ -0,0 +1,578 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Simplification of generated GLSL, before code generation.
+# Expressions are value numbered: a pure expression that was already
+# computed into a temporary is replaced by that temporary, and copies of
+# temporaries and constants are propagated.  Only temporaries with a
+# single definition, which is not preceded by a use, are numbered, so a
+# temporary always holds the same value.  Values computed inside a
+# branch or a loop are only available inside it.
+#
+# Algebraic simplifications are applied as the expressions are rebuilt:
+#   x*1.0, x/1.0, x+0.0 and x-0.0 become x
+#   pow(x, 2.0) becomes x*x, pow(x, 1.0) becomes x, pow(x, 0.5) becomes sqrt(x)
+#   length(v)*length(v) becomes dot(v, v)
+#   v+vec3(s) becomes v+s, undoing the expansion of scalar operands
+#   operations on constant scalars and vector constructors are folded
+# Duplicating an operand, as in x*x, is only done for simple operands.
+# Temporaries left without uses are removed afterwards.
+
+import re
+
+from util.typedispatch import *
+from . import ast as glsl
+from . import cost
+
+componentwise = frozenset(['+', '-', '*', '/'])
+
+vectorType = re.compile('^([bi]?)vec([234])$')
+
+def baseTypeName(t):
+	match = vectorType.match(t.name)
+	if match:
+		return {'':'float', 'i':'int', 'b':'bool'}[match.group(1)]
+	return None
+
+def sameType(a, b):
+	return isinstance(a, glsl.BuiltinType) and isinstance(b, glsl.BuiltinType) and a.name == b.name
+
+def isVector(t):
+	return isinstance(t, glsl.BuiltinType) and vectorType.match(t.name) is not None
+
+def exprType(node):
+	# The type of an expression, or None if it is not obvious.
+	if isinstance(node, (glsl.Constant, glsl.Local, glsl.Constructor)):
+		return node.type
+	elif isinstance(node, (glsl.Uniform, glsl.Input, glsl.Output)):
+		return node.decl.type
+	elif isinstance(node, glsl.BinaryOp):
+		if node.op not in componentwise: return None
+		left  = exprType(node.left)
+		right = exprType(node.right)
+		if left is None or right is None or cost.isMatrix(left) or cost.isMatrix(right):
+			return None
+		return left if cost.typeWidth(left) >= cost.typeWidth(right) else right
+	elif isinstance(node, glsl.UnaryPrefixOp) and node.op in ('-', '+'):
+		return exprType(node.expr)
+	elif isinstance(node, glsl.IntrinsicOp):
+		if node.name in cost.scalarIntrinsics:
+			return glsl.BuiltinType('float')
+		elif node.name in ('normalize', 'sqrt', 'inversesqrt', 'abs', 'exp', 'log', 'pow') and node.args:
+			return exprType(node.args[0])
+	elif isinstance(node, (glsl.Load, glsl.GetAttr)) and cost.swizzle.match(node.name):
+		base = exprType(node.expr)
+		if isVector(base) and baseTypeName(base) == 'float':
+			width = len(node.name)
+			return glsl.BuiltinType('vec%d' % width if width > 1 else 'float')
+	return None
+
+def isSimple(node):
+	# Cheap enough to reference twice.
+	if isinstance(node, (glsl.Constant, glsl.Local, glsl.Uniform, glsl.Input)):
+		return True
+	elif isinstance(node, (glsl.Load, glsl.GetAttr)):
+		return isSimple(node.expr)
+	return False
+
+def constantComponents(node):
+	# The float components of a constant scalar or vector, or None.
+	if isinstance(node, glsl.Constant):
+		if type(node.object) is float:
+			return [node.object]
+	elif isinstance(node, glsl.Constructor) and isVector(node.type) and baseTypeName(node.type) == 'float':
+		values = [constantComponents(arg) for arg in node.args]
+		if values and None not in values and len(values[0]) == 1:
+			values = [value[0] for value in values]
+			width = cost.typeWidth(node.type)
+			if len(values) == 1:
+				return values*width
+			elif len(values) == width:
+				return values
+	return None
+
+def isConstant(node, value):
+	values = constantComponents(node)
+	return values is not None and all([v == value for v in values])
+
+def makeConstant(t, values):
+	# A scalar constant, or a vector constructor of constants.
+	if isVector(t):
+		if all([v == values[0] for v in values]):
+			values = values[:1]
+		return glsl.Constructor(t, [glsl.Constant(glsl.BuiltinType('float'), v) for v in values])
+	else:
+		return glsl.Constant(t, values[0])
+
+folders = {
+	'+':lambda a, b: a+b,
+	'-':lambda a, b: a-b,
+	'*':lambda a, b: a*b,
+	'/':lambda a, b: a/b,
+	}
+
+class DefinitionCounter(TypeDispatcher):
+	# Numbers the statements in program order, and counts the definitions
+	# of each temporary.  A temporary may be numbered if it has a single
+	# definition, and is not used before it.
+	def __init__(self):
+		self.index = 0
+		self.defs  = {}
+		self.defIndex = {}
+		self.firstUse = {}
+
+	def define(self, lcl):
+		self.defs[lcl] = self.defs.get(lcl, 0)+1
+		self.defIndex.setdefault(lcl, self.index)
+
+	def defineBase(self, node):
+		# Stores modify the temporary they store into.
+		while isinstance(node, (glsl.Load, glsl.GetAttr, glsl.GetSubscript)):
+			node = node.expr
+		if isinstance(node, glsl.Local):
+			self.define(node)
+
+	@dispatch(str, int, float, type(None), glsl.BuiltinType, glsl.Constant, glsl.Uniform, glsl.Input, glsl.Output)
+	def visitLeaf(self, node):
+		pass
+
+	@dispatch(list, tuple)
+	def visitContainer(self, node):
+		for child in node:
+			self(child)
+
+	@dispatch(glsl.Local)
+	def visitLocal(self, node):
+		self.firstUse.setdefault(node, self.index)
+
+	@dispatch(glsl.UnaryPrefixOp, glsl.UnaryPostfixOp)
+	def visitUnaryOp(self, node):
+		self(node.expr)
+		if node.op in ('++', '--'):
+			self.defineBase(node.expr)
+
+	@dispatch(glsl.Assign)
+	def visitAssign(self, node):
+		self(node.expr)
+		if isinstance(node.lcl, glsl.Local):
+			self.define(node.lcl)
+		else:
+			self(node.lcl)
+		self.index += 1
+
+	@dispatch(glsl.Store, glsl.SetAttr, glsl.SetSubscript)
+	def visitStore(self, node):
+		node.visitChildren(self)
+		self.defineBase(node.expr)
+		self.index += 1
+
+	@dispatch(glsl.Discard, glsl.Return)
+	def visitStatement(self, node):
+		node.visitChildren(self)
+		self.index += 1
+
+	@dispatch(glsl.Switch, glsl.While)
+	def visitControl(self, node):
+		self(node.condition)
+		self.index += 1
+		node.visitChildren(self)
+
+	@dispatch(glsl.Suite, glsl.Constructor, glsl.BinaryOp, glsl.IntrinsicOp,
+		glsl.Load, glsl.GetAttr, glsl.GetSubscript,
+		glsl.ShortCircutAnd, glsl.ShortCircutOr)
+	def visitOK(self, node):
+		node.visitChildren(self)
+
+	def process(self, code):
+		# Parameters are defined before the body.
+		for param in code.params:
+			self.defs[param.lcl] = 1
+			self.defIndex[param.lcl] = -1
+		self(code.body)
+
+		numbered = set()
+		for lcl, count in self.defs.iteritems():
+			if count == 1 and (lcl not in self.firstUse or self.firstUse[lcl] > self.defIndex[lcl]):
+				numbered.add(lcl)
+		return numbered
+
+class Simplifier(TypeDispatcher):
+	def __init__(self, numbered):
+		self.numbered = numbered
+
+		# Temporaries replaced by other temporaries or constants.
+		self.lut = {}
+
+		# The defining expression of each numbered temporary.
+		self.defs = {}
+
+		# Value numbers to temporaries, one scope per block.
+		self.scopes = [{}]
+
+		self.eliminated = 0
+		self.simplified = 0
+
+	### Value numbering ###
+
+	def key(self, node):
+		if isinstance(node, glsl.Constant):
+			return ('constant', node.type.name, type(node.object).__name__, node.object)
+		elif isinstance(node, glsl.Local):
+			return ('local', node) if node in self.numbered else None
+		elif isinstance(node, glsl.Uniform):
+			return ('uniform', node.decl)
+		elif isinstance(node, glsl.Input):
+			return ('input', node.decl)
+		elif isinstance(node, glsl.Constructor):
+			return self.compound(('constructor', node.type.name), node.args)
+		elif isinstance(node, glsl.BinaryOp):
+			return self.compound(('binary', node.op), (node.left, node.right))
+		elif isinstance(node, glsl.UnaryPrefixOp) and node.op not in ('++', '--'):
+			return self.compound(('unary', node.op), (node.expr,))
+		elif isinstance(node, glsl.IntrinsicOp):
+			return self.compound(('intrinsic', node.name), node.args)
+		elif isinstance(node, (glsl.Load, glsl.GetAttr)):
+			return self.compound(('load', node.name), (node.expr,))
+		elif isinstance(node, glsl.GetSubscript):
+			return self.compound(('subscript',), (node.expr, node.subscript))
+		else:
+			return None
+
+	def compound(self, head, children):
+		keys = [self.key(child) for child in children]
+		if None in keys:
+			return None
+		return head+tuple(keys)
+
+	def lookup(self, key):
+		for scope in reversed(self.scopes):
+			if key in scope:
+				return scope[key]
+		return None
+
+	def number(self, node):
+		# Replace an expression already held by a temporary.
+		if isinstance(node, (glsl.Constant, glsl.Local, glsl.Uniform, glsl.Input, glsl.Output)):
+			return node
+
+		key = self.key(node)
+		if key is not None:
+			lcl = self.lookup(key)
+			if lcl is not None:
+				self.eliminated += 1
+				return lcl
+		return node
+
+	def resolve(self, node):
+		# Look through numbered temporaries, to match patterns.
+		while isinstance(node, glsl.Local) and node in self.defs:
+			node = self.defs[node]
+		return node
+
+	def same(self, a, b):
+		# Only value numbers are compared.  A local that is assigned more
+		# than once has no key, as the same node may hold different values.
+		key = self.key(a)
+		return key is not None and key == self.key(b)
+
+	### Algebraic simplification ###
+
+	def simplifyBinary(self, node):
+		left, op, right = node.left, node.op, node.right
+
+		if op in componentwise:
+			ltype = exprType(left)
+			rtype = exprType(right)
+
+			# Fold constants.
+			lvalues = constantComponents(left)
+			rvalues = constantComponents(right)
+			if lvalues is not None and rvalues is not None and not (op == '/' and 0.0 in rvalues):
+				t = ltype if len(lvalues) >= len(rvalues) else rtype
+				if len(lvalues) == 1: lvalues = lvalues*len(rvalues)
+				if len(rvalues) == 1: rvalues = rvalues*len(lvalues)
+				if len(lvalues) == len(rvalues):
+					return makeConstant(t, [folders[op](a, b) for a, b in zip(lvalues, rvalues)])
+
+			# Identities, where the other operand is at least as wide as the constant.
+			if op in ('*', '/') and self.identity(right, left, 1.0):
+				return left
+			if op == '*' and self.identity(left, right, 1.0):
+				return right
+			if op in ('+', '-') and self.identity(right, left, 0.0):
+				return left
+			if op == '+' and self.identity(left, right, 0.0):
+				return right
+
+			# Vectors can be combined with scalars directly.
+			scalar = self.expandedScalar(right, ltype)
+			if scalar is not None:
+				return glsl.BinaryOp(left, op, scalar)
+			scalar = self.expandedScalar(left, rtype)
+			if scalar is not None:
+				return glsl.BinaryOp(scalar, op, right)
+
+		if op == '*':
+			a = self.resolve(left)
+			b = self.resolve(right)
+			if self.isLength(a) and self.isLength(b) and self.same(a.args[0], b.args[0]) and isSimple(a.args[0]):
+				arg = a.args[0]
+				return glsl.IntrinsicOp('dot', [arg, arg])
+
+		return node
+
+	def identity(self, constant, other, value):
+		if not isConstant(constant, value):
+			return False
+		if isinstance(constant, glsl.Constant):
+			return True
+		return sameType(constant.type, exprType(other))
+
+	def expandedScalar(self, node, other):
+		if isinstance(node, glsl.Constructor) and len(node.args) == 1 and isVector(node.type) and sameType(node.type, other):
+			arg = node.args[0]
+			if sameType(exprType(arg), glsl.BuiltinType(baseTypeName(node.type))):
+				return arg
+		return None
+
+	def isLength(self, node):
+		return isinstance(node, glsl.IntrinsicOp) and node.name == 'length' and len(node.args) == 1
+
+	def simplifyIntrinsic(self, node):
+		if node.name == 'pow' and len(node.args) == 2:
+			x, exponent = node.args
+			if isConstant(exponent, 1.0):
+				return x
+			elif isConstant(exponent, 2.0) and isSimple(x):
+				return glsl.BinaryOp(x, '*', x)
+			elif isConstant(exponent, 0.5):
+				return glsl.IntrinsicOp('sqrt', [x])
+		return node
+
+	def simplifyConstructor(self, node):
+		if len(node.args) == 1:
+			# Constructing a value of the same type.
+			arg = node.args[0]
+			if sameType(node.type, exprType(arg)):
+				return arg
+		elif isVector(node.type):
+			# vec3(1.0, 1.0, 1.0) is vec3(1.0)
+			values = constantComponents(node)
+			if values is not None and all([v == values[0] for v in values]):
+				return makeConstant(node.type, values)
+		return node
+
+	def simplify(self, node, result):
+		if result is not node:
+			self.simplified += 1
+		return result
+
+	### Expressions ###
+
+	@dispatch(str, int, float, type(None), glsl.BuiltinType, glsl.Constant, glsl.Uniform, glsl.Input, glsl.Output)
+	def visitLeaf(self, node):
+		return node
+
+	@dispatch(glsl.Local)
+	def visitLocal(self, node):
+		return self.lut.get(node, node)
+
+	@dispatch(glsl.BinaryOp)
+	def visitBinaryOp(self, node):
+		node = node.rewriteChildren(self)
+		return self.number(self.simplify(node, self.simplifyBinary(node)))
+
+	@dispatch(glsl.IntrinsicOp)
+	def visitIntrinsicOp(self, node):
+		node = node.rewriteChildren(self)
+		return self.number(self.simplify(node, self.simplifyIntrinsic(node)))
+
+	@dispatch(glsl.Constructor)
+	def visitConstructor(self, node):
+		node = node.rewriteChildren(self)
+		return self.number(self.simplify(node, self.simplifyConstructor(node)))
+
+	@dispatch(glsl.UnaryPrefixOp)
+	def visitUnaryPrefixOp(self, node):
+		node = node.rewriteChildren(self)
+		if node.op == '-':
+			values = constantComponents(node.expr)
+			if values is not None:
+				return self.simplify(node, makeConstant(exprType(node.expr), [-v for v in values]))
+		return self.number(node)
+
+	@dispatch(glsl.Load, glsl.GetAttr, glsl.GetSubscript,
+		glsl.ShortCircutAnd, glsl.ShortCircutOr)
+	def visitExpression(self, node):
+		return self.number(node.rewriteChildren(self))
+
+	@dispatch(glsl.UnaryPostfixOp)
+	def visitUnaryPostfixOp(self, node):
+		return node.rewriteChildren(self)
+
+	### Statements ###
+
+	@dispatch(glsl.Assign)
+	def visitAssign(self, node):
+		expr = self(node.expr)
+		lcl  = node.lcl
+
+		if isinstance(lcl, glsl.Local):
+			if lcl in self.numbered:
+				if isinstance(expr, glsl.Constant) or (isinstance(expr, glsl.Local) and expr in self.numbered):
+					# Propagate the copy.
+					self.lut[lcl] = expr
+					self.eliminated += 1
+					return []
+
+				key = self.key(expr)
+				if key is not None and self.lookup(key) is None:
+					self.scopes[-1][key] = lcl
+				self.defs[lcl] = expr
+		else:
+			lcl = self(lcl)
+
+		return glsl.Assign(expr, lcl)
+
+	@dispatch(glsl.Discard, glsl.Return, glsl.Store, glsl.SetAttr, glsl.SetSubscript)
+	def visitStatement(self, node):
+		return node.rewriteChildren(self)
+
+	def block(self, node):
+		self.scopes.append({})
+		result = self(node)
+		self.scopes.pop()
+		return result
+
+	@dispatch(glsl.Switch)
+	def visitSwitch(self, node):
+		return glsl.Switch(self(node.condition), self.block(node.t), self.block(node.f))
+
+	@dispatch(glsl.While)
+	def visitWhile(self, node):
+		return glsl.While(self(node.condition), self.block(node.body))
+
+	@dispatch(glsl.Suite)
+	def visitSuite(self, node):
+		statements = []
+		for stmt in node.statements:
+			result = self(stmt)
+			if isinstance(result, list):
+				statements.extend(result)
+			else:
+				statements.append(result)
+		return glsl.Suite(statements)
+
+	def process(self, code):
+		return glsl.Code(code.name, code.params, code.returnType, self(code.body))
+
+class CountUses(TypeDispatcher):
+	@dispatch(str, int, float, type(None), glsl.BuiltinType, glsl.Constant, glsl.Uniform, glsl.Input, glsl.Output)
+	def visitLeaf(self, node):
+		pass
+
+	@dispatch(list, tuple)
+	def visitContainer(self, node):
+		for child in node:
+			self(child)
+
+	@dispatch(glsl.Local)
+	def visitLocal(self, node):
+		self.uses[node] = self.uses.get(node, 0)+1
+
+	@dispatch(glsl.Assign)
+	def visitAssign(self, node):
+		self(node.expr)
+		if not isinstance(node.lcl, glsl.Local):
+			self(node.lcl)
+
+	@defaultdispatch
+	def visitOK(self, node):
+		node.visitChildren(self)
+
+	def process(self, code):
+		self.uses = {}
+		for param in code.params:
+			self.uses[param.lcl] = 1
+		self(code.body)
+		return self.uses
+
+class HasSideEffects(TypeDispatcher):
+	@dispatch(str, int, float, type(None), glsl.BuiltinType, glsl.Constant, glsl.Uniform, glsl.Input, glsl.Output, glsl.Local)
+	def visitLeaf(self, node):
+		return False
+
+	@dispatch(list, tuple)
+	def visitContainer(self, node):
+		for child in node:
+			if self(child): return True
+		return False
+
+	@dispatch(glsl.UnaryPrefixOp, glsl.UnaryPostfixOp)
+	def visitUnaryOp(self, node):
+		return node.op in ('++', '--') or self(node.expr)
+
+	@defaultdispatch
+	def visitOK(self, node):
+		return self(node.children())
+
+class DeadCodeElimination(TypeDispatcher):
+	# Removes assignments to temporaries that are never used.
+	def __init__(self, uses):
+		self.uses    = uses
+		self.effects = HasSideEffects()
+		self.removed = 0
+
+	@dispatch(glsl.Assign)
+	def visitAssign(self, node):
+		if isinstance(node.lcl, glsl.Local) and not self.uses.get(node.lcl) and not self.effects(node.expr):
+			self.removed += 1
+			return []
+		return node
+
+	@dispatch(glsl.Discard, glsl.Return, glsl.Store, glsl.SetAttr, glsl.SetSubscript)
+	def visitStatement(self, node):
+		return node
+
+	@dispatch(glsl.Switch)
+	def visitSwitch(self, node):
+		return glsl.Switch(node.condition, self(node.t), self(node.f))
+
+	@dispatch(glsl.While)
+	def visitWhile(self, node):
+		return glsl.While(node.condition, self(node.body))
+
+	@dispatch(glsl.Suite)
+	def visitSuite(self, node):
+		statements = []
+		for stmt in node.statements:
+			result = self(stmt)
+			if isinstance(result, list):
+				statements.extend(result)
+			else:
+				statements.append(result)
+		return glsl.Suite(statements)
+
+def eliminateDeadCode(code):
+	# Removing an assignment may leave other temporaries unused.
+	while True:
+		dce = DeadCodeElimination(CountUses().process(code))
+		code = glsl.Code(code.name, code.params, code.returnType, dce(code.body))
+		if not dce.removed:
+			return code
+
+def evaluateCode(compiler, code):
+	numbered = DefinitionCounter().process(code)
+	code = Simplifier(numbered).process(code)
+	return eliminateDeadCode(code)
@@ -0,0 +1,114 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Interleaves vertex streams into a single buffer, so a mesh can be uploaded
+# in one go.  A stream is anything with the buffer protocol holding 32 bit
+# floats: NumPy arrays, array.array('f'), or memoryviews of either.  NumPy
+# arrays of other float types are converted.
+# The data is moved with slice assignments, never one element at a time.
+# When there is only one stream it is used as is, without copying.
+
+import array
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class StreamLayout(object):
+	__slots__ = 'attributes', 'stride'
+
+	def __init__(self, *attributes):
+		# attributes are [name, components] pairs, in the order they are packed.
+		self.attributes = []
+
+		offset = 0
+		for name, components in attributes:
+			self.attributes.append((name, components, offset*4))
+			offset += components
+
+		# In bytes
+		self.stride = offset*4
+
+	def count(self, streams):
+		assert len(streams) == len(self.attributes), "Expected %d streams, got %d" % (len(self.attributes), len(streams))
+
+		count = None
+		for (name, components, offset), stream in zip(self.attributes, streams):
+			size = len(stream)
+			if size%components:
+				raise ValueError, "Stream %r has %d floats, which is not a multiple of %d" % (name, size, components)
+
+			if count is None:
+				count = size/components
+			elif count != size/components:
+				raise ValueError, "Stream %r has %d vertices, expected %d" % (name, size/components, count)
+		return count
+
+	def interleave(self, streams):
+		if numpy is not None:
+			streams = [numpyFloats(stream) for stream in streams]
+		else:
+			streams = [arrayFloats(stream) for stream in streams]
+
+		count = self.count(streams)
+
+		if len(streams) == 1:
+			# Nothing to interleave.
+			return streams[0]
+
+		width = self.stride/4
+
+		if numpy is not None:
+			data = numpy.empty((count, width), dtype=numpy.float32)
+			for (name, components, offset), stream in zip(self.attributes, streams):
+				data[:, offset/4:offset/4+components] = stream.reshape(count, components)
+			return data.reshape(-1)
+		else:
+			data = array.array('f', [0.0])*(count*width)
+			for (name, components, offset), stream in zip(self.attributes, streams):
+				for i in range(components):
+					data[offset/4+i::width] = stream[i::components]
+			return data
+
+def numpyFloats(stream):
+	if isinstance(stream, numpy.ndarray):
+		data = stream
+	elif isinstance(stream, array.array):
+		if stream.typecode != 'f':
+			raise TypeError, "Expected an array of 'f', got %r" % stream.typecode
+		data = numpy.frombuffer(stream, dtype=numpy.float32)
+	else:
+		data = numpy.asarray(stream)
+		if data.dtype.itemsize == 1:
+			# Untyped buffers, such as memoryviews of bytearrays.
+			data = data.view(numpy.float32)
+
+	if data.dtype != numpy.float32:
+		data = data.astype(numpy.float32)
+	return data.reshape(-1)
+
+def arrayFloats(stream):
+	if isinstance(stream, array.array) and stream.typecode == 'f':
+		return stream
+
+	if isinstance(stream, array.array):
+		raise TypeError, "Expected an array of 'f', got %r" % stream.typecode
+
+	if isinstance(stream, memoryview):
+		stream = stream.tobytes()
+
+	data = array.array('f')
+	data.fromstring(stream)
+	return data
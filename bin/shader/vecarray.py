@@ -0,0 +1,367 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Structure-of-arrays versions of the shader vector types, backed by NumPy.
+# Each component holds a whole buffer of values, so running shader code
+# on a vec3array does the work of running it once per vertex or fragment.
+# Components broadcast, so uniforms can be plain floats, or vectors whose
+# components have a single value.
+#
+# Shader code names the scalar types directly, so to run it over arrays,
+# the modules that define it are temporarily rebound with batching(...).
+# Control flow that depends on per-element values cannot be batched,
+# use select(...) instead.
+
+import itertools
+
+import numpy
+
+from . import vec
+from . import function
+
+scalarTypes = (float, int, long, numpy.number, numpy.ndarray)
+vectorTypes = (vec.vec2, vec.vec3, vec.vec4)
+matrixTypes = {2:vec.mat2, 3:vec.mat3, 4:vec.mat4}
+
+def isScalar(value):
+	if isinstance(value, numpy.ndarray) and value.dtype == object:
+		# NumPy applied a scalar vector to each element of an array.
+		raise TypeError, "Scalar vectors cannot be combined with arrays, wrap them with uniform(...)"
+	return isinstance(value, scalarTypes)
+
+def components(value):
+	if isinstance(value, (vecarray,)+vectorTypes):
+		return [getattr(value, name) for name in value.__slots__]
+	else:
+		return None
+
+class vecarray(object):
+	__slots__ = ()
+
+	# Makes NumPy defer arithmetic with arrays to the methods below.
+	__array_ufunc__ = None
+
+	def __init__(self, *args):
+		values = []
+		for arg in args:
+			fields = components(arg)
+			if fields is not None:
+				values.extend(fields)
+			elif isScalar(arg):
+				values.append(arg)
+			else:
+				raise TypeError, "Cannot construct %s from %r" % (type(self).__name__, type(arg))
+
+		size = len(self.__slots__)
+		if not values:
+			values = [0.0]*size
+		elif len(values) == 1:
+			values = values*size
+		elif len(values) < size:
+			raise TypeError, "%s needs %d components, got %d" % (type(self).__name__, size, len(values))
+
+		for name, value in zip(self.__slots__, values):
+			setattr(self, name, numpy.asarray(value, dtype=numpy.float64))
+
+	@classmethod
+	def fromvecs(cls, vecs):
+		return cls(*[numpy.array([getattr(v, name) for v in vecs], dtype=numpy.float64) for name in cls.__slots__])
+
+	def fields(self):
+		return [getattr(self, name) for name in self.__slots__]
+
+	@property
+	def shape(self):
+		return numpy.broadcast(*self.fields()).shape
+
+	def __len__(self):
+		shape = self.shape
+		return shape[0] if shape else 1
+
+	def element(self, i):
+		fields = [numpy.broadcast_to(field, self.shape) if self.shape else field for field in self.fields()]
+		return scalarVecTypes[len(fields)](*[float(field[i] if self.shape else field) for field in fields])
+
+	def tolist(self):
+		return [self.element(i) for i in range(len(self))]
+
+	def __repr__(self):
+		return "%s(%s)" % (type(self).__name__, ", ".join([repr(field) for field in self.fields()]))
+
+	def operand(self, other):
+		fields = components(other)
+		if fields is not None:
+			if len(fields) == len(self.__slots__):
+				return fields
+		elif isScalar(other):
+			return [other]*len(self.__slots__)
+		return None
+
+	def binary(self, other, op):
+		fields = self.operand(other)
+		if fields is None:
+			return NotImplemented
+		return type(self)(*[op(a, b) for a, b in zip(self.fields(), fields)])
+
+	def rbinary(self, other, op):
+		fields = self.operand(other)
+		if fields is None:
+			return NotImplemented
+		return type(self)(*[op(b, a) for a, b in zip(self.fields(), fields)])
+
+	def dot(self, other):
+		fields = self.operand(other)
+		result = 0.0
+		for a, b in zip(self.fields(), fields):
+			result = result+a*b
+		return result
+
+	def length(self):
+		return self.dot(self)**0.5
+
+	def distance(self, other):
+		return (self-other).length()
+
+	def normalize(self):
+		return self/self.length()
+
+	def mix(self, other, amt):
+		return self*(1.0-amt)+other*amt
+
+	def reflect(self, normal):
+		return self-normal*(2*self.dot(normal))
+
+	def refract(self, normal, eta):
+		ndi = self.dot(normal)
+		k = 1.0-eta*eta*(1.0-ndi*ndi)
+		# Where k < 0 the scalar version returns zero, sqrt would be NaN there.
+		refracted = self*eta-normal*(eta*ndi+numpy.sqrt(numpy.maximum(k, 0.0)))
+		return select(k < 0, type(self)(0.0), refracted)
+
+	def exp(self):
+		return type(self)(*[numpy.exp(field) for field in self.fields()])
+
+	def log(self):
+		return type(self)(*[numpy.log(field) for field in self.fields()])
+
+	def __pos__(self):
+		return type(self)(*[+field for field in self.fields()])
+
+	def __neg__(self):
+		return type(self)(*[-field for field in self.fields()])
+
+	def __abs__(self):
+		return type(self)(*[abs(field) for field in self.fields()])
+
+	def __add__(self, other):
+		return self.binary(other, numpy.add)
+
+	def __radd__(self, other):
+		return self.rbinary(other, numpy.add)
+
+	def __sub__(self, other):
+		return self.binary(other, numpy.subtract)
+
+	def __rsub__(self, other):
+		return self.rbinary(other, numpy.subtract)
+
+	def __mul__(self, other):
+		return self.binary(other, numpy.multiply)
+
+	def __rmul__(self, other):
+		size = len(self.__slots__)
+		if isinstance(other, matrixTypes[size]):
+			fields = self.fields()
+			rows = []
+			for i in range(size):
+				row = 0.0
+				for j in range(size):
+					row = row+getattr(other, 'm%d%d' % (i, j))*fields[j]
+				rows.append(row)
+			return type(self)(*rows)
+
+		return self.rbinary(other, numpy.multiply)
+
+	def __div__(self, other):
+		return self.binary(other, numpy.divide)
+
+	def __rdiv__(self, other):
+		return self.rbinary(other, numpy.divide)
+
+	__truediv__  = __div__
+	__rtruediv__ = __rdiv__
+
+	def __pow__(self, other):
+		return self.binary(other, numpy.power)
+
+	def __rpow__(self, other):
+		return self.rbinary(other, numpy.power)
+
+	def min(self, other):
+		return self.binary(other, numpy.minimum)
+
+	def rmin(self, other):
+		return self.rbinary(other, numpy.minimum)
+
+	def max(self, other):
+		return self.binary(other, numpy.maximum)
+
+	def rmax(self, other):
+		return self.rbinary(other, numpy.maximum)
+
+class vec2array(vecarray):
+	__slots__ = 'x', 'y'
+
+class vec3array(vecarray):
+	__slots__ = 'x', 'y', 'z'
+
+	def cross(self, other):
+		other = vec3array(other)
+		return vec3array(self.y*other.z-self.z*other.y, self.z*other.x-self.x*other.z, self.x*other.y-self.y*other.x)
+
+class vec4array(vecarray):
+	__slots__ = 'x', 'y', 'z', 'w'
+
+arrayTypes     = {2:vec2array, 3:vec3array, 4:vec4array}
+scalarVecTypes = {2:vec.vec2, 3:vec.vec3, 4:vec.vec4}
+
+### Swizzles ###
+
+def makeSwizzle(names):
+	if len(names) == 1:
+		name = names[0]
+
+		def getter(self):
+			return getattr(self, name)
+
+		def setter(self, other):
+			fields = components(other)
+			setattr(self, name, numpy.asarray(other if fields is None else fields[0], dtype=numpy.float64))
+	else:
+		cls = arrayTypes[len(names)]
+
+		def getter(self):
+			return cls(*[getattr(self, name) for name in names])
+
+		def setter(self, other):
+			fields = cls(other).fields()
+			for name, field in zip(names, fields):
+				setattr(self, name, field)
+
+	if len(set(names)) == len(names):
+		return property(getter, setter)
+	else:
+		return property(getter)
+
+def addSwizzles(cls):
+	xyzw = cls.__slots__
+	rgba = 'rgba'[:len(xyzw)]
+
+	for count in range(1, 5):
+		for indices in itertools.product(range(len(xyzw)), repeat=count):
+			names = [xyzw[i] for i in indices]
+			prop  = makeSwizzle(names)
+			alias = "".join([rgba[i] for i in indices])
+
+			# Single xyzw components are the slots themselves.
+			if count > 1:
+				setattr(cls, "".join(names), prop)
+			setattr(cls, alias, prop)
+
+for cls in arrayTypes.itervalues():
+	addSwizzles(cls)
+
+### Functions ###
+
+def select(condition, a, b):
+	# Elementwise a if condition else b, for batched control flow.
+	fields = components(a) or components(b)
+	if fields is None:
+		return numpy.where(condition, a, b)
+
+	cls = arrayTypes[len(fields)]
+	return cls(*[numpy.where(condition, x, y) for x, y in zip(cls(a).fields(), cls(b).fields())])
+
+def minimum(a, b):
+	if isinstance(a, vecarray):
+		return a.min(b)
+	elif isinstance(b, vecarray):
+		return b.rmin(a)
+	else:
+		return numpy.minimum(a, b)
+
+def maximum(a, b):
+	if isinstance(a, vecarray):
+		return a.max(b)
+	elif isinstance(b, vecarray):
+		return b.rmax(a)
+	else:
+		return numpy.maximum(a, b)
+
+def clamp(x, minVal, maxVal):
+	return minimum(maximum(x, minVal), maxVal)
+
+def smoothstep(edge0, edge1, x):
+	t = clamp((x-edge0)/(edge1-edge0), 0.0, 1.0)
+	return t*t*(3-2*t)
+
+### Batching ###
+
+replacements = {
+	id(vec.vec2):vec2array,
+	id(vec.vec3):vec3array,
+	id(vec.vec4):vec4array,
+	id(function.clamp):clamp,
+	id(function.smoothstep):smoothstep,
+	}
+
+class batching(object):
+	# Rebinds the shader types and functions imported into the given modules
+	# to their array versions, for the duration of a with block.
+	def __init__(self, *modules):
+		self.modules  = modules
+		self.restore  = []
+
+	def __enter__(self):
+		for module in self.modules:
+			glbls = module.__dict__
+			for name, value in glbls.items():
+				replacement = replacements.get(id(value))
+				if replacement is not None:
+					self.restore.append((glbls, name, value))
+					glbls[name] = replacement
+		return self
+
+	def __exit__(self, type, value, tb):
+		for glbls, name, original in reversed(self.restore):
+			glbls[name] = original
+		self.restore = []
+
+def uniform(value):
+	# A scalar vector, broadcast over the whole buffer.
+	if isinstance(value, vectorTypes):
+		return arrayTypes[len(value.__slots__)](value)
+	else:
+		return value
+
+def run(modules, func, *args, **kargs):
+	# Calls a shader entry point, such as shadeVertex, over whole buffers.
+	# Arithmetic on the scalar vector types does not know about arrays, so
+	# vector arguments become uniforms.  Vectors stored in the fields of
+	# arguments must be wrapped by the caller.
+	args  = [uniform(arg) for arg in args]
+	kargs = dict([(name, uniform(arg)) for name, arg in kargs.iteritems()])
+
+	with batching(*modules):
+		return func(*args, **kargs)
@@ -34,7 +34,7 @@ shaderNames = ['material', 'skybox', 'ssao', 'bilateral', 'ambient', 'light', 'b
 
 class ShaderStatCollector(object):
 	def __init__(self):
-		self.opCount = collections.defaultdict(lambda: 0)
+		self.opCount = collections.defaultdict(int)
 
 	def op(self, op):
 		opT = type(op)
@@ -14,12 +14,17 @@
 
 from __future__ import absolute_import
 
+import os.path
+
 from _pystream import cfuncptr
 from util.monkeypatch import xtypes
 
 from util.python import replaceGlobals
 
 from . import lltranslator
+from . import stublibrary
+
+import config
 
 class StubCollector(object):
 	def __init__(self, compiler):
@@ -35,6 +40,10 @@ class StubCollector(object):
 
 		self.codeToFunction = {}
 
+		# How the stubs were bound into the extractor, in order.
+		# Replayed when the stubs are loaded from the stub library.
+		self.journal = []
+
 	#####################
 	### Stub building ###
 	#####################
@@ -53,6 +62,7 @@ class StubCollector(object):
 		extractor = self.compiler.extractor
 		extractor.desc.functions.append(code)
 		extractor.nameLUT[code.name] = func
+		self.journal.append(('register', func, code))
 
 		if func:
 			extractor.replaceCode(func, code)
@@ -63,6 +73,7 @@ class StubCollector(object):
 		assert code.isCode(), type(code)
 		self.registerFunction(None, code)
 		self.compiler.extractor.desc.functions.append(code)
+		self.journal.append(('function', code))
 		return code
 
 	def llfunc(self, func=None, descriptive=False, primitive=False):
@@ -106,6 +117,7 @@ class StubCollector(object):
 		def callback(code):
 			assert code.isCode(), type(code)
 			self.compiler.extractor.attachStubToPtr(code, ptr)
+			self.journal.append(('ptr', code, meth))
 			return code
 		return callback
 
@@ -124,6 +136,7 @@ class StubCollector(object):
 			extractor = self.compiler.extractor
 
 			extractor.attachStubToPtr(code, ptr)
+			self.journal.append(('ptr', code, pyobj))
 
 			# Check the binding.
 			obj  = extractor.getObject(pyobj)
@@ -172,6 +185,7 @@ class StubCollector(object):
 				f = obj
 				#assert self.highLevelLUT[f.func_name] == f, "Must declare as high level stub before replacing."
 			self.compiler.extractor.replaceAttr(o, attr, f)
+			self.journal.append(('attr', o, attr, f))
 			return obj
 		return callback
 
@@ -179,9 +193,31 @@ stubgenerators = []
 def stubgenerator(f):
 	stubgenerators.append(f)
 
-def makeStubs(compiler):
-	collector = StubCollector(compiler)
-	compiler.extractor.stubs = collector
+def buildStubs(compiler, collector):
 	for gen in stubgenerators:
 		gen(collector)
+
+def makeStubs(compiler, rebuild=False):
+	collector = StubCollector(compiler)
+	compiler.extractor.stubs = collector
+
+	if not config.useStubLibrary:
+		buildStubs(compiler, collector)
+		return collector
+
+	library = stublibrary.StubLibrary(compiler, os.path.join(config.cacheDirectory, 'stubs'))
+
+	if rebuild or not library.load(collector):
+		if library.extracted:
+			# The failed load left objects in the extractor, so build the stubs with a fresh one.
+			from decompiler.programextractor import Extractor
+			compiler.extractor = Extractor(compiler, compiler.extractor.verbose)
+			collector = StubCollector(compiler)
+			compiler.extractor.stubs = collector
+
+		buildStubs(compiler, collector)
+
+		if not library.store(collector) and compiler.console is not None:
+			compiler.console.output("Stub library: the stubs cannot be saved, they will be rebuilt on every compile.")
+
 	return collector
@@ -0,0 +1,244 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# A precompiled library of the runtime stubs.
+# Building the stubs decompiles and translates every stub function, every
+# time the compiler starts.  Instead, the stub ASTs are saved along with a
+# journal of how the stub collector bound them into the extractor.
+# Loading the library replays the journal.
+# The library is keyed on the source of the stubs package and of the code
+# that translates them, so editing either causes the stubs to be built again.
+
+from __future__ import absolute_import
+
+import sys
+import os
+import types
+import marshal
+import cPickle
+from cStringIO import StringIO
+
+from util.io import filesystem
+from util.monkeypatch import xtypes
+
+from language.python import program
+from decompiler.codecache import UncacheableObject, sharedAnnotations, sharedAnnotationNames, isReferencable
+
+# The source that decides what the stubs are built into, and how they are saved.
+sources = ['stubs', 'decompiler', 'language/python', 'optimization', 'util/python', 'util/monkeypatch']
+
+# Python objects that may need to be found again by something other than their name.
+referenceTypes = (types.FunctionType, types.BuiltinFunctionType, types.ModuleType,
+	type, types.ClassType,
+	xtypes.MethodDescriptorType, xtypes.WrapperDescriptorType,
+	xtypes.MemberDescriptorType, xtypes.GetSetDescriptorType)
+
+xtypesNames = dict([(id(v), k) for k, v in xtypes.__dict__.iteritems() if isinstance(v, type)])
+
+def sourceKey():
+	# Any change to the stubs, the code that translates them, or Python itself invalidates the library.
+	data = repr((sys.version_info[:2], filesystem.compilerSourceHash(sources)))
+	return filesystem.dataHash(data).encode('hex')
+
+def makeCell():
+	value = None
+	return (lambda: value).func_closure[0]
+
+class StubLibrary(object):
+	def __init__(self, compiler, directory):
+		self.compiler  = compiler
+		self.directory = directory
+		self.key       = sourceKey()
+
+		# Did a load extract anything, before it failed?
+		self.extracted = False
+
+	### Saving ###
+
+	def reference(self, pyobj):
+		if isinstance(pyobj, str) and pyobj in self.compiler.slots.reverse:
+			# Slot names contain the address of the type, so they must be regenerated.
+			return ('slot', self.reference(self.compiler.slots.reverse[pyobj]))
+		elif isReferencable(pyobj):
+			return ('value', pyobj)
+		elif isinstance(pyobj, types.FunctionType):
+			return self.functionReference(pyobj)
+		elif isinstance(pyobj, types.ModuleType) and sys.modules.get(pyobj.__name__) is pyobj:
+			return ('module', pyobj.__name__)
+		elif id(pyobj) in xtypesNames:
+			return ('xtypes', xtypesNames[id(pyobj)])
+
+		# Descriptors can be found in the dictionary of their type.
+		objclass = getattr(pyobj, '__objclass__', None)
+		name     = getattr(pyobj, '__name__', None)
+		if isinstance(objclass, type) and isinstance(name, str) and objclass.__dict__.get(name) is pyobj:
+			return ('member', self.reference(objclass), name)
+
+		raise UncacheableObject, pyobj
+
+	def functionReference(self, func):
+		# Stub functions are defined inside the stub generators, so they
+		# cannot be found by name.  They are rebuilt from their bytecode.
+		index = self.functionIndex.get(id(func))
+		if index is not None:
+			return ('function', index, None)
+
+		# Rebuilt functions have empty closures.  That is only acceptable
+		# if the function body is replaced by a stub, and never executed.
+		if func.func_closure and id(func) not in self.stubFunctions:
+			raise UncacheableObject, func
+
+		index = len(self.functionIndex)
+		self.functionIndex[id(func)] = index
+		self.functionKeepAlive.append(func)
+
+		recipe = (func.__module__, func.func_name, marshal.dumps(func.func_code), func.func_defaults)
+		return ('function', index, recipe)
+
+	def persistentID(self, obj):
+		if isinstance(obj, program.AbstractObject):
+			if isinstance(obj, program.Object):
+				return ('object', self.reference(obj.pyobj))
+			else:
+				raise UncacheableObject, obj
+		elif id(obj) in sharedAnnotationNames:
+			return ('annotation', sharedAnnotationNames[id(obj)])
+		elif isinstance(obj, referenceTypes) and not isReferencable(obj):
+			return ('ref', self.reference(obj))
+		else:
+			return None
+
+	def store(self, collector):
+		self.functionIndex     = {}
+		self.functionKeepAlive = []
+		self.stubFunctions     = set([id(func) for func in collector.codeToFunction.itervalues()])
+
+		sio = StringIO()
+		pickler = cPickle.Pickler(sio, 2)
+		pickler.persistent_id = self.persistentID
+
+		try:
+			pickler.dump(self.key)
+			pickler.dump((collector.journal, collector.exports))
+		except (cPickle.PicklingError, TypeError, ValueError):
+			return False
+		finally:
+			del self.functionIndex
+			del self.functionKeepAlive
+			del self.stubFunctions
+
+		filesystem.writeBinaryData(self.directory, 'library', 'pickle', sio.getvalue())
+		return True
+
+	### Loading ###
+
+	def resolve(self, ref):
+		kind = ref[0]
+		if kind == 'value':
+			return ref[1]
+		elif kind == 'slot':
+			return self.compiler.slots.uniqueSlotName(self.resolve(ref[1]))
+		elif kind == 'function':
+			return self.resolveFunction(ref[1], ref[2])
+		elif kind == 'module':
+			__import__(ref[1])
+			return sys.modules[ref[1]]
+		elif kind == 'xtypes':
+			return getattr(xtypes, ref[1])
+		elif kind == 'member':
+			return self.resolve(ref[1]).__dict__[ref[2]]
+		else:
+			raise cPickle.UnpicklingError, "Unknown reference %r" % (ref,)
+
+	def resolveFunction(self, index, recipe):
+		if recipe is None:
+			return self.functions[index]
+
+		assert index == len(self.functions), index
+		mname, name, code, defaults = recipe
+
+		__import__(mname)
+		code    = marshal.loads(code)
+		closure = tuple([makeCell() for freevar in code.co_freevars]) or None
+		func    = types.FunctionType(code, sys.modules[mname].__dict__, name, defaults, closure)
+
+		self.functions.append(func)
+		return func
+
+	def persistentLoad(self, pid):
+		kind, value = pid
+		if kind == 'object':
+			return self.compiler.extractor.getObject(self.resolve(value))
+		elif kind == 'annotation':
+			return sharedAnnotations[value]
+		elif kind == 'ref':
+			return self.resolve(value)
+		else:
+			raise cPickle.UnpicklingError, "Unknown persistent reference %r" % (pid,)
+
+	def load(self, collector):
+		if not os.path.exists(filesystem.join(self.directory, 'library', 'pickle')):
+			return False
+
+		self.functions = []
+
+		try:
+			data = filesystem.readData(self.directory, 'library', 'pickle', binary=True)
+			unpickler = cPickle.Unpickler(StringIO(data))
+			unpickler.persistent_load = self.persistentLoad
+
+			if unpickler.load() != self.key:
+				# The stubs have changed since the library was built.
+				return False
+
+			# Loading the stubs extracts the objects they refer to.
+			self.extracted = True
+
+			journal, exports = unpickler.load()
+			self.replay(collector, journal)
+		except (EnvironmentError, EOFError, ValueError, cPickle.UnpicklingError, AttributeError, ImportError, KeyError):
+			return False
+		finally:
+			del self.functions
+
+		collector.exports.update(exports)
+		return True
+
+	def replay(self, collector, journal):
+		extractor = self.compiler.extractor
+
+		for entry in journal:
+			kind = entry[0]
+
+			if kind == 'register':
+				func, code = entry[1:]
+				# The rebuilt function objects may have been extracted
+				# while loading, but they have not been processed.
+				extractor.desc.functions.append(code)
+				extractor.nameLUT[code.name] = func
+				if func:
+					extractor.replaceCode(func, code)
+					collector.codeToFunction[code] = func
+			elif kind == 'function':
+				extractor.desc.functions.append(entry[1])
+			elif kind == 'ptr':
+				code, pyobj = entry[1:]
+				extractor.attachStubToPtr(code, collector.cfuncptr(pyobj))
+			elif kind == 'attr':
+				obj, attr, replacement = entry[1:]
+				extractor.replaceAttr(obj, attr, replacement)
+			else:
+				assert False, entry
+
+		collector.journal.extend(journal)
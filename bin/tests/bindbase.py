@@ -0,0 +1,48 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import cStringIO
+
+# Loaded first, to avoid an import cycle in the optimization package.
+import optimization.simplify
+
+from language.python import ast
+from language.python.simplecodegen import SimpleCodeGen
+from decompiler.programextractor import Extractor
+from application.context import CompilerContext
+
+from translator import intrinsics
+from translator.dataflowtransform.bind import existingtransform
+
+class TestBindBase(unittest.TestCase):
+	def setUp(self):
+		self.compiler = CompilerContext(None)
+		self.compiler.extractor = Extractor(self.compiler)
+		intrinsics.init(self.compiler)
+
+	def existing(self, value):
+		return ast.Existing(self.compiler.extractor.getObject(value))
+
+	def execute(self, node, glbls):
+		# Generate the source for the bindings, and run it in glbls.
+		node = existingtransform.evaluateAST(self.compiler, node)
+
+		buffer = cStringIO.StringIO()
+		SimpleCodeGen(buffer).process(node)
+
+		exec buffer.getvalue() in glbls
+		return glbls
@@ -0,0 +1,80 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+import unittest
+import collections
+
+from analysis.cpa.adaptive import CallPathPolicy, impreciseCall
+
+class MockAnnotation(object):
+	def __init__(self, descriptive):
+		self.descriptive = descriptive
+
+class MockCode(object):
+	def __init__(self, name, descriptive=False):
+		self.name = name
+		self.annotation = MockAnnotation(descriptive)
+
+class MockSystem(object):
+	def __init__(self):
+		self.liveContexts = set()
+
+class TestCallPathPolicy(unittest.TestCase):
+	def setUp(self):
+		self.main   = MockCode('main')
+		self.helper = MockCode('helper')
+		self.leaf   = MockCode('leaf')
+
+		self.callers = collections.defaultdict(set)
+		self.callers[self.helper].add(self.main)
+		self.callers[self.leaf].add(self.helper)
+
+	def testInsensitive(self):
+		policy = CallPathPolicy(3)
+		self.assertEqual(policy.advance(MockSystem(), None, 'op', self.leaf), None)
+
+	def testDeepen(self):
+		policy = CallPathPolicy(3)
+		self.assert_(policy.deepen(self.leaf, 2, self.callers))
+
+		# The caller must remember one less call site.
+		self.assertEqual(policy.codeDepth(self.leaf), 2)
+		self.assertEqual(policy.codeDepth(self.helper), 1)
+		self.assertEqual(policy.codeDepth(self.main), 0)
+
+		self.assertFalse(policy.deepen(self.leaf, 1, self.callers))
+
+		sys = MockSystem()
+		path = policy.advance(sys, None, 'a', self.helper)
+		self.assertEqual(path, ('a',))
+		self.assertEqual(policy.advance(sys, path, 'b', self.leaf), ('a', 'b'))
+		self.assertEqual(policy.advance(sys, ('a', 'b'), 'c', self.leaf), ('b', 'c'))
+
+	def testBudget(self):
+		policy = CallPathPolicy(3, budget=2)
+		policy.deepen(self.leaf, 1, self.callers)
+
+		sys = MockSystem()
+		sys.liveContexts.update(['x', 'y'])
+		self.assertEqual(policy.advance(sys, None, 'a', self.leaf), None)
+		self.assert_(policy.exhausted)
+
+	def testImprecise(self):
+		intrinsic = MockCode('intrinsic', descriptive=True)
+
+		self.assertFalse(impreciseCall({self.leaf:set(['s0'])}))
+		self.assertFalse(impreciseCall({self.leaf:set(['s0', 's1'])}))
+		self.assert_(impreciseCall({self.leaf:set(['s0']), self.helper:set(['s1'])}))
+		self.assert_(impreciseCall({intrinsic:set(['s0', 's1'])}))
@@ -0,0 +1,173 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+import unittest
+from cStringIO import StringIO
+
+# Loaded first, to avoid an import cycle in the optimization package.
+import optimization.simplify
+
+import config
+from util.application.console import Console
+from application.context import CompilerContext
+from decompiler.programextractor import Extractor
+from analysis.storegraph import storegraph, canonicalobjects
+from analysis.cpa import InterproceduralDataflow, worklist
+from language.python import ast
+from util.python.calling import CallerArgs
+
+class Holder(object):
+	pass
+
+class MockEntryPoint(object):
+	def __init__(self, code):
+		self.code = code
+
+	def name(self):
+		return self.code.name
+
+# (cpaDifferentialPropagation, cpaOrderedWorklist, cpaCollapseCycles)
+configurations = [(False, False, False), (True, False, False), (False, True, False),
+	(False, True, True), (True, True, True)]
+
+def contextKey(context):
+	return tuple([repr(param) for param in context.signature.params])
+
+def slotKey(name):
+	if name.isLocal():
+		return ('local', name.code.name, name.local.name, contextKey(name.context))
+	else:
+		return ('existing', name.code.name, repr(name.object), contextKey(name.context))
+
+def slotValues(slot):
+	return tuple(sorted([repr(obj.xtype) for obj in slot]))
+
+# Each solver option must find exactly the same solution.
+class TestSolverOptions(unittest.TestCase):
+	def setUp(self):
+		self.flags = (config.cpaDifferentialPropagation, config.cpaOrderedWorklist, config.cpaCollapseCycles)
+		self.minimumRanked = worklist.minimumRanked
+
+		# Rank the constraints from the start, so small programs are reordered.
+		worklist.minimumRanked = 0
+
+	def tearDown(self):
+		config.cpaDifferentialPropagation, config.cpaOrderedWorklist, config.cpaCollapseCycles = self.flags
+		worklist.minimumRanked = self.minimumRanked
+
+	def makeCode(self, name, params, body, result):
+		p = ast.CodeParameters(None, params, [param.name for param in params], [], None, None, [ast.Local('internal_return')])
+		return ast.Code(name, p, ast.Suite(body+[ast.Return([result])]))
+
+	def existing(self, pyobj):
+		return ast.Existing(self.extractor.getObject(pyobj))
+
+	def solve(self, build, args, flags):
+		config.cpaDifferentialPropagation, config.cpaOrderedWorklist, config.cpaCollapseCycles = flags
+
+		compiler = CompilerContext(Console(out=StringIO()))
+		compiler.extractor = Extractor(compiler)
+		self.extractor = compiler.extractor
+
+		canonical = canonicalobjects.CanonicalObjects()
+		graph = storegraph.StoreGraph(compiler.extractor, canonical)
+		dataflow = InterproceduralDataflow(compiler, graph, 0, False)
+
+		def xtypes(values):
+			return [canonical.existingType(compiler.extractor.getObject(value)) for value in values]
+
+		code = build()
+		dataflow.addEntryPoint(MockEntryPoint(code), CallerArgs(None, [xtypes(arg) for arg in args], [], None, None, None))
+		dataflow.solve()
+
+		result = []
+		for slot in graph:
+			key = slotKey(slot.slotName)
+			result.append((key, slotValues(slot)))
+
+			for obj in slot:
+				for fieldName, field in obj.slots.iteritems():
+					result.append((key+(repr(obj.xtype), repr(fieldName)), slotValues(field)))
+		result.sort()
+
+		return dataflow, result
+
+	def checkOptions(self, build, args):
+		dataflow, expected = self.solve(build, args, configurations[0])
+		self.assert_(expected)
+
+		solutions = {}
+		for flags in configurations[1:]:
+			dataflow, result = self.solve(build, args, flags)
+			self.assertEqual(result, expected, flags)
+			solutions[flags] = dataflow
+		return solutions
+
+	def buildCycle(self):
+		a, b, x, y, z = [ast.Local(name) for name in 'abxyz']
+
+		# x and y copy each other, and each is fed from outside the cycle.
+		return self.makeCode('cycle', [a, b], [
+			ast.Assign(a, [x]),
+			ast.Assign(x, [y]),
+			ast.Assign(y, [x]),
+			ast.Assign(b, [z]),
+			ast.Assign(z, [y]),
+			], x)
+
+	def testCopyCycle(self):
+		solutions = self.checkOptions(self.buildCycle, [[1], [2.0, 'c']])
+
+		self.assert_(solutions[(False, True, True)].dirty.collapsed > 0)
+		self.assertEqual(solutions[(False, True, False)].dirty.collapsed, 0)
+
+	def buildHeap(self):
+		a, b, o, p, v, w, t = [ast.Local(name) for name in 'abopvwt']
+		field = self.existing('value')
+
+		# The field is stored to after it is loaded from, and the loaded
+		# values are compared, so the cached constraints see their
+		# inputs grow.
+		return self.makeCode('heap', [a, b], [
+			ast.Assign(ast.Allocate(self.existing(Holder)), [o]),
+			ast.Assign(o, [p]),
+			ast.Assign(ast.Load(p, 'Attribute', field), [v]),
+			ast.Store(o, 'Attribute', field, a),
+			ast.Assign(v, [w]),
+			ast.Assign(b, [w]),
+			ast.Store(p, 'Attribute', field, w),
+			ast.Assign(ast.Is(v, b), [t]),
+			], v)
+
+	def testHeap(self):
+		self.checkOptions(self.buildHeap, [[1, 2.0], ['c', None]])
+
+	def buildCalls(self):
+		x = ast.Local('x')
+		helper = self.makeCode('helper', [x], [], x)
+
+		a, b, c, d, e = [ast.Local(name) for name in 'abcde']
+
+		# The helper is called in two contexts, and its results flow around a cycle.
+		return self.makeCode('calls', [a, b], [
+			ast.Assign(ast.DirectCall(helper, None, [a], [], None, None), [c]),
+			ast.Assign(ast.DirectCall(helper, None, [b], [], None, None), [d]),
+			ast.Assign(c, [e]),
+			ast.Assign(e, [d]),
+			ast.Assign(d, [e]),
+			], e)
+
+	def testCalls(self):
+		self.checkOptions(self.buildCalls, [[1], [2.0, 'c']])
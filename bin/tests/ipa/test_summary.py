@@ -0,0 +1,73 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . base import TestIPABase
+
+from analysis.ipa.constraints import qualifiers
+
+class TestBottomUp(TestIPABase):
+	def makeFunction(self, name):
+		context = self.makeContext()
+
+		t = self.local(context, 'temp')
+		r = self.local(context, 'return')
+		context.returns.append(r)
+
+		obj = self.const(name, qualifiers.HZ)
+		t.updateSingleValue(obj)
+		context.assign(t, r)
+
+		return context, r, obj
+
+	def call(self, src, srcReturn, dst, dstReturn, op):
+		invoke = src.getInvoke(op, dst)
+		invoke.up(dstReturn, srcReturn)
+		return invoke
+
+	def testChain(self):
+		a, ra, oa = self.makeFunction('a')
+		b, rb, ob = self.makeFunction('b')
+
+		self.call(self.analysis.root, self.local(self.analysis.root, 'result'), a, ra, 'root')
+		invoke = self.call(a, ra, b, rb, 'ab')
+
+		self.analysis.topDown()
+		self.assertFalse(self.analysis.bottomUp())
+
+		self.assertEqual(set(ra.values), set([oa, ob]))
+		self.assertEqual(invoke.summaryVersion, b.summary.version)
+
+		# Nothing changed, so nothing is reapplied.
+		version = a.summary.version
+		self.analysis.topDown()
+		self.analysis.bottomUp()
+		self.assertEqual(a.summary.version, version)
+
+	def testRecursive(self):
+		a, ra, oa = self.makeFunction('a')
+		b, rb, ob = self.makeFunction('b')
+
+		self.call(self.analysis.root, self.local(self.analysis.root, 'result'), a, ra, 'root')
+		self.call(a, ra, b, rb, 'ab')
+		self.call(b, rb, a, ra, 'ba')
+
+		order = self.analysis.callGraphOrder()
+		self.assertEqual(order[0], ([a, b], True))
+		self.assertEqual(order[-1], ([self.analysis.root], False))
+
+		self.assertEqual(self.analysis.solve(), 1)
+
+		# The objects flow around the cycle, in both directions.
+		self.assertEqual(set(ra.values), set([oa, ob]))
+		self.assertEqual(set(rb.values), set([oa, ob]))
@@ -0,0 +1,125 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import shutil
+
+from . base import TestIPABase
+
+from analysis.ipa.ipanalysis import IPAnalysis
+from analysis.ipa.calling import cpa
+from analysis.ipa.constraints import qualifiers
+from analysis.ipa.summary.cache import SummaryCache
+from language.python import ast
+
+# Fingerprints code by name, rather than by the function it came from.
+class MockSummaryCache(SummaryCache):
+	def __init__(self, extractor, directory, fingerprints):
+		SummaryCache.__init__(self, extractor, directory)
+		self.fingerprints = fingerprints
+
+	def dependencies(self, code):
+		return {('function', 'tests', code.name):self.fingerprints.get(code.name)}
+
+	def currentFingerprint(self, dependency):
+		return self.fingerprints.get(dependency[2])
+
+class TestSummaryCache(TestIPABase):
+	def setUp(self):
+		TestIPABase.setUp(self)
+		self.directory = tempfile.mkdtemp()
+		self.fingerprints = {'identity':'1', 'constant':'1'}
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def makeAnalysis(self):
+		cache = MockSummaryCache(self.extractor, self.directory, self.fingerprints)
+		self.analysis = IPAnalysis(self.compiler, self.canonical, None, None, cache)
+		return cache
+
+	def makeCode(self, name, expr):
+		a   = ast.Local('a')
+		ret = ast.Local('ret')
+		p = ast.CodeParameters(None, [a], ['a'], [], None, None, [ret])
+		if expr is None: expr = a
+		return ast.Code(name, p, ast.Suite([ast.Return([expr])]))
+
+	def callFrom(self, code, arg):
+		# A context for the code, called from the root.
+		root = self.analysis.root
+		xtype = self.canonical.existingType(self.extractor.getObject(1))
+		context = self.analysis.getContext(cpa.CPAContextSignature(code, None, (xtype,), ()))
+
+		src = self.local(root, 'arg', arg)
+		dst = self.local(root, 'result')
+
+		invoke = root.getInvoke(code.name, context)
+		invoke.down(src, context.params[0])
+		invoke.up(context.returns[0], dst)
+
+		self.analysis.solve()
+		return context, dst
+
+	def testIdentity(self):
+		code = self.makeCode('identity', None)
+		arg  = self.const(1, qualifiers.GLBL)
+
+		cache = self.makeAnalysis()
+		context, result = self.callFrom(code, arg)
+		self.assert_(context.constraints)
+		self.assert_(cache.store(self.analysis, context))
+		self.assertEqual(set(result.values), set([arg]))
+
+		# The next compile restores the summary, rather than extracting constraints.
+		cache = self.makeAnalysis()
+		context, result = self.callFrom(code, arg)
+		self.assertEqual(cache.hits, 1)
+		self.assertFalse(context.constraints)
+		self.assertEqual(set(result.values), set([arg]))
+
+		# Restored contexts are not stored again.
+		self.assertFalse(cache.store(self.analysis, context))
+
+	def testConstant(self):
+		obj  = self.extractor.getObject('constant')
+		code = self.makeCode('constant', ast.Existing(obj))
+		arg  = self.const(1, qualifiers.GLBL)
+
+		self.makeAnalysis()
+		context, result = self.callFrom(code, arg)
+		expected = set([(obj.xtype, obj.qualifier) for obj in result.values])
+		self.assertEqual(len(expected), 1)
+		self.assert_(self.analysis.summaryCache.store(self.analysis, context))
+
+		cache = self.makeAnalysis()
+		context, result = self.callFrom(code, arg)
+		self.assertEqual(cache.hits, 1)
+		self.assertEqual(set([(obj.xtype, obj.qualifier) for obj in result.values]), expected)
+
+	def testChanged(self):
+		code = self.makeCode('identity', None)
+		arg  = self.const(1, qualifiers.GLBL)
+
+		self.makeAnalysis()
+		context, result = self.callFrom(code, arg)
+		self.assert_(self.analysis.summaryCache.store(self.analysis, context))
+
+		self.fingerprints['identity'] = '2'
+
+		cache = self.makeAnalysis()
+		context, result = self.callFrom(code, arg)
+		self.assertEqual(cache.hits, 0)
+		self.assertEqual(cache.misses, 1)
+		self.assert_(context.constraints)
@@ -0,0 +1,121 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+from tests.shape.shape_base import *
+from tests.shape import test_shape_compound
+
+import sys
+import cStringIO
+
+from analysis.shape import dataflow
+
+class OrderedWorklistMixin(object):
+	def setUp(self):
+		TestConstraintBase.setUp(self)
+		self.sys.worklist = dataflow.OrderedWorklist(self.sys)
+
+# The compound cases should give the same results, whatever the order.
+class TestOrderedSimpleCase(OrderedWorklistMixin, test_shape_compound.TestSimpleCase):
+	pass
+
+class TestOrderedRecursiveCase(OrderedWorklistMixin, test_shape_compound.TestRecursiveCase):
+	pass
+
+class TestConstraintOrder(test_shape_compound.TestSimpleCase):
+	def constraints(self):
+		cs = set()
+		for observers in self.sys.environment.observers.itervalues():
+			cs.update(observers)
+		return cs
+
+	def testCallersFirst(self):
+		rank = dataflow.constraintRanks(self.sys.environment)
+
+		callerRanks = [rank[c] for c in self.constraints() if dataflow.constraintFunction(c) is self.caller]
+		calleeRanks = [rank[c] for c in self.constraints() if dataflow.constraintFunction(c) is self.code]
+
+		self.assert_(callerRanks and calleeRanks)
+		self.assert_(max(callerRanks) < min(calleeRanks))
+
+	def testReversePostorder(self):
+		rank = dataflow.constraintRanks(self.sys.environment)
+
+		# The caller does not loop, so each constraint is ranked before its successors.
+		for c in self.constraints():
+			if dataflow.constraintFunction(c) is not self.caller: continue
+			for next in self.sys.environment.observers.get(c.outputPoint, ()):
+				if dataflow.constraintFunction(next) is self.caller:
+					self.assert_(rank[c] < rank[next], (c, next))
+
+	def testStats(self):
+		self.sys.worklist = dataflow.OrderedWorklist(self.sys)
+		self.testCall1()
+
+		stats = self.sys.worklist.stats()
+		self.assert_(stats['steps'] > 0)
+		self.assert_(stats['usefulSteps'] <= stats['steps'])
+		self.assertEqual(stats['reorders'], 1)
+		self.assertEqual(sum(self.sys.worklist.evaluations.itervalues()), stats['steps'])
+		self.assertEqual(sum([n for c, n in self.sys.worklist.hottest(len(self.constraints()))]), stats['reprocessed'])
+
+	def testDumpStatistics(self):
+		self.testCall1()
+
+		buffer = cStringIO.StringIO()
+		old = sys.stdout
+		sys.stdout = buffer
+		try:
+			self.dumpStatistics()
+		finally:
+			sys.stdout = old
+
+		stats = self.sys.worklist.stats()
+		self.assert_("at most %d times" % stats['maxReprocessed'] in buffer.getvalue(), buffer.getvalue())
+
+class TestCopyOnWrite(unittest.TestCase):
+	def setUp(self):
+		self.canonical = analysis.shape.model.canonical.CanonicalObjects()
+
+		self.x = self.canonical.localExpr(self.canonical.localSlot(ast.Local('x')))
+		self.y = self.canonical.localExpr(self.canonical.localSlot(ast.Local('y')))
+
+	def testCopy(self):
+		paths = self.canonical.paths((self.x,), ())
+		copy  = paths.copy()
+		self.assert_(copy.root is paths.root)
+
+		# Mutating the copy leaves the original alone.
+		copy.inplaceUnionHitMiss((), (self.y,))
+		self.assert_(copy.root is not paths.root)
+		self.assertEqual(copy.hit(self.y), TVLFalse)
+		self.assertEqual(paths.hit(self.y), TVLMaybe)
+		self.assertEqual(copy.hit(self.x), TVLTrue)
+
+		# And the other way around.
+		copy = paths.copy()
+		paths.inplaceUnionHitMiss((self.y,), ())
+		self.assertEqual(paths.hit(self.y), TVLTrue)
+		self.assertEqual(copy.hit(self.y), TVLMaybe)
+
+	def testMerge(self):
+		paths = self.canonical.paths((self.x, self.y), ())
+		copy  = paths.copy()
+
+		other = self.canonical.paths((self.x,), ())
+		merged, changed = copy.inplaceMerge(other)
+		self.assert_(changed)
+		self.assertEqual(merged.hit(self.y), TVLMaybe)
+		self.assertEqual(paths.hit(self.y), TVLTrue)
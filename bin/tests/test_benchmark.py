@@ -0,0 +1,131 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import os
+from cStringIO import StringIO
+
+from util.application.console import Console
+from application import benchmark
+
+def makeRun(wall, contexts, peak, success=True):
+	return {'success':success, 'peakRSS':peak, 'counters':{'contexts':contexts},
+		'phases':{'makefile':{'wall':wall, 'cpu':wall}, 'makefile/cpa':{'wall':wall*0.5, 'cpu':wall*0.5}}}
+
+class TestBenchmark(unittest.TestCase):
+	def testMeasureScopes(self):
+		console = Console(out=StringIO())
+		with console.scope('makefile'):
+			for i in range(2):
+				with console.scope('cpa'):
+					console.count('contexts', 3)
+			console.count('contexts', 1)
+
+		phases, counters = benchmark.measureScopes(console.root)
+		self.assertEqual(sorted(phases), ['makefile', 'makefile/cpa'])
+		self.assertEqual(counters, {'contexts':7})
+
+		# Repeated phases are added together.
+		cpa = sum([scope.wallElapsed for scope in console.root.children[0].children])
+		self.assertAlmostEqual(phases['makefile/cpa']['wall'], cpa)
+
+	def testAggregate(self):
+		result = benchmark.aggregate([makeRun(3.0, 10, 100), makeRun(1.0, 10, 300), makeRun(2.0, 10, 200)])
+		self.assertEqual(result['runs'], 3)
+		self.assertEqual(result['phases']['makefile']['wall'], 2.0)
+		self.assertEqual(result['wallMin']['makefile'], 1.0)
+		self.assertEqual(result['counters'], {'contexts':10})
+		self.assertEqual(result['peakRSS'], 200)
+		self.assert_(result['success'])
+
+		self.assertFalse(benchmark.aggregate([makeRun(1.0, 10, 100), makeRun(1.0, 10, 100, False)])['success'])
+
+	def results(self, *runs):
+		return {'programs':{'physics':benchmark.aggregate(runs)}}
+
+	def testCompare(self):
+		baseline = self.results(makeRun(2.0, 10, 100))
+
+		self.assertEqual(benchmark.compare(baseline, self.results(makeRun(2.1, 10, 105))), [])
+
+		regressions = benchmark.compare(baseline, self.results(makeRun(3.0, 11, 100)))
+		metrics = [regression.metric for regression in regressions]
+		self.assertEqual(metrics, ['makefile wall', 'makefile cpu', 'makefile/cpa wall', 'makefile/cpa cpu', 'contexts'])
+		self.assertAlmostEqual(regressions[0].change, 0.5)
+
+		# Thresholds are configurable.
+		self.assertEqual(benchmark.compare(baseline, self.results(makeRun(3.0, 11, 100)), {'time':1.0, 'count':0.2}), [])
+
+		# Failing to compile is always a regression.
+		regressions = benchmark.compare(baseline, self.results(makeRun(2.0, 10, 100, False)))
+		self.assertEqual([regression.metric for regression in regressions], ['success'])
+
+	def testNoise(self):
+		baseline = self.results(makeRun(0.01, 10, 100))
+		self.assertEqual(benchmark.compare(baseline, self.results(makeRun(0.02, 10, 100))), [])
+
+	def testProgramName(self):
+		self.assertEqual(benchmark.programName('tests/full/makephysics.py'), 'physics')
+
+	def testCacheModes(self):
+		baseline = self.results(makeRun(2.0, 10, 100))
+		baseline['caches'] = 'cold'
+		current = self.results(makeRun(2.0, 10, 100))
+		current['caches'] = 'warm'
+		self.assertRaises(ValueError, benchmark.compare, baseline, current)
+
+		# Results that do not record the mode are still compared.
+		del baseline['caches']
+		self.assertEqual(benchmark.compare(baseline, current), [])
+
+class TestBenchmarkCaches(unittest.TestCase):
+	def setUp(self):
+		self.compileIsolated = benchmark.compileIsolated
+		benchmark.compileIsolated = self.fakeCompile
+		self.compiles = []
+
+	def tearDown(self):
+		benchmark.compileIsolated = self.compileIsolated
+
+	def fakeCompile(self, filename, cacheDirectory):
+		# Record whether the caches were already filled, then fill them.
+		filled = os.path.exists(os.path.join(cacheDirectory, 'filled'))
+		self.compiles.append((cacheDirectory, filled))
+
+		if not os.path.exists(cacheDirectory):
+			os.makedirs(cacheDirectory)
+		open(os.path.join(cacheDirectory, 'filled'), 'w').close()
+		return makeRun(1.0, 10, 100)
+
+	def testCold(self):
+		results = benchmark.run(['makephysics.py'], 3)
+		self.assertEqual(results['caches'], 'cold')
+		self.assertEqual(len(self.compiles), 3)
+		self.assertEqual(len(set([directory for directory, filled in self.compiles])), 3)
+		self.assertEqual([filled for directory, filled in self.compiles], [False, False, False])
+
+		# The cache directories are removed.
+		for directory, filled in self.compiles:
+			self.assertFalse(os.path.exists(directory))
+
+	def testWarm(self):
+		results = benchmark.run(['makephysics.py'], 3, caches='warm')
+		self.assertEqual(results['caches'], 'warm')
+		self.assertEqual(results['programs']['physics']['runs'], 3)
+
+		# One compile fills the caches, and is not measured.
+		self.assertEqual([filled for directory, filled in self.compiles], [False, True, True, True])
+		self.assertEqual(len(set([directory for directory, filled in self.compiles])), 1)
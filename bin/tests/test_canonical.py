@@ -218,6 +218,55 @@ class TestCanonicalTree(unittest.TestCase):
 		self.assert_(result, c)
 
 
+class TestTreeFunctionCache(unittest.TestCase):
+	def setUp(self):
+		self.conditions = canonicaltree.ConditionManager()
+		self.manager    = canonicaltree.BoolManager(self.conditions)
+
+		self.c0 = self.conditions.condition(0, [0, 1])
+		self.c1 = self.conditions.condition(1, [0, 1])
+
+		self.t  = self.manager.true
+		self.f  = self.manager.false
+
+	def testPersistent(self):
+		t, f = self.t, self.f
+		a = self.manager.tree(self.c0, (t, f))
+		b = self.manager.tree(self.c1, (t, f))
+
+		c = self.manager.and_(a, b)
+		hit, miss = self.manager.cacheStats()['and_']
+
+		# The second call is answered by the table.
+		self.assert_(self.manager.and_(a, b) is c)
+		self.assertEqual(self.manager.cacheStats()['and_'], (hit+1, miss))
+
+		# As is the symmetric call.
+		self.assert_(self.manager.and_(b, a) is c)
+		self.assertEqual(self.manager.cacheStats()['and_'], (hit+2, miss))
+
+	def testPerCall(self):
+		t, f = self.t, self.f
+		a = self.manager.tree(self.c0, (t, f))
+
+		negate = canonicaltree.UnaryTreeFunction(self.manager, lambda v: not v)
+		self.assert_(negate(a) is self.manager.tree(self.c0, (f, t)))
+		self.assertEqual(len(negate.cache), 0)
+
+	def testEviction(self):
+		cache = canonicaltree.OpCache(2)
+		cache.store('a', 1)
+		cache.store('b', 2)
+		cache.store('c', 3)
+
+		# The oldest generation is dropped once the current one fills again.
+		self.assertEqual(cache.get('a'), 1)
+		cache.store('d', 4)
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.get('a'), 1)
+		self.assert_(len(cache) <= 4)
+
+
 class TestCanonicalSetTree(unittest.TestCase):
 	def setUp(self):
 		self.conditions  = canonicaltree.ConditionManager()
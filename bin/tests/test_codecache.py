@@ -0,0 +1,89 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import tempfile
+import shutil
+
+from decompiler.codecache import CodeCache
+from language.python import ast
+from language.python import program
+from language.python import annotations
+
+# Just enough of the extractor for the cache to resolve references.
+class ObjectPool(object):
+	def __init__(self):
+		self.objects = {}
+
+	def getObject(self, pyobj):
+		key = (type(pyobj), pyobj)
+		if key not in self.objects:
+			self.objects[key] = program.Object(pyobj)
+		return self.objects[key]
+
+def f(a):
+	return a+1
+
+class TestCodeCache(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.pool = ObjectPool()
+		self.cache = CodeCache(self.pool, self.directory)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def makeCode(self, value):
+		a   = ast.Local('a')
+		ret = ast.Local('ret')
+		p = ast.CodeParameters(None, [a], ['a'], [], None, None, [ret])
+		s = ast.Suite([ast.Assign(ast.Existing(self.pool.getObject(value)), [a]), ast.Return([a])])
+		return ast.Code('f', p, s)
+
+	def testRoundTrip(self):
+		code = f.func_code
+
+		self.assertEqual(self.cache.load(code, 'test', True, False), None)
+		self.assertEqual(self.cache.misses, 1)
+
+		original = self.makeCode(len)
+		self.assert_(self.cache.store(code, 'test', True, False, original))
+
+		loaded = self.cache.load(code, 'test', True, False)
+		self.assertEqual(self.cache.hits, 1)
+
+		self.assert_(loaded is not original)
+		self.assertEqual(loaded.name, 'f')
+		self.assert_(loaded.annotation is annotations.emptyCodeAnnotation)
+
+		# References to program objects are re-extracted, not copied.
+		assign, ret = loaded.ast.blocks
+		self.assert_(assign.expr.object is self.pool.getObject(len))
+
+		# Shared nodes remain shared.
+		self.assert_(assign.lcls[0] is ret.exprs[0])
+		self.assert_(assign.lcls[0] is not original.ast.blocks[0].lcls[0])
+
+		# Different options, different entries.
+		self.assertEqual(self.cache.load(code, 'test', True, True), None)
+
+	def testUncacheable(self):
+		code = f.func_code
+
+		# A tuple cannot be found again by name.
+		self.assertFalse(self.cache.store(code, 'test', True, False, self.makeCode((1, 2))))
+		self.assertEqual(self.cache.uncacheable, 1)
+		self.assertEqual(self.cache.load(code, 'test', True, False), None)
@@ -0,0 +1,104 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import os
+import socket
+import tempfile
+import threading
+from cStringIO import StringIO
+
+from util.application.console import Console
+from application import context
+from application import compileserver
+
+class TestCompileServer(unittest.TestCase):
+	def setUp(self):
+		self.compiler = context.CompilerContext(Console(out=StringIO()))
+		self.missing = os.path.join(tempfile.gettempdir(), 'pystream-missing-makefile.py')
+
+	def handle(self, data):
+		server, client = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			compileserver.writeLine(client, data)
+			running = compileserver.handleConnection(self.compiler, server)
+			server.close()
+			reply = compileserver.readLine(client)
+		finally:
+			server.close()
+			client.close()
+		compileserver.reapChildren()
+		return running, reply
+
+	def testCompileFailed(self):
+		running, reply = self.handle({'command':'compile', 'makefile':self.missing})
+		self.assert_(running)
+
+		reply = compileserver.json.loads(reply)
+		self.assertEqual(reply['success'], False)
+		self.assertEqual(reply['glsl'], {})
+		self.assert_('Traceback' in reply['log'], reply['log'])
+
+	def testChildFailed(self):
+		# The child breaks outside the compile, and must still reply.
+		self.compiler.stats = None
+
+		running, reply = self.handle({'command':'compile', 'makefile':self.missing})
+		self.assert_(running)
+
+		reply = compileserver.json.loads(reply)
+		self.assertEqual(reply['success'], False)
+		self.assert_('AttributeError' in reply['log'], reply['log'])
+
+	def testBadRequest(self):
+		server, client = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			client.sendall('not json\n')
+			running = compileserver.handleConnection(self.compiler, server)
+			reply = compileserver.json.loads(compileserver.readLine(client))
+		finally:
+			server.close()
+			client.close()
+
+		self.assert_(running)
+		self.assertEqual(reply['success'], False)
+		self.assert_(reply['log'].startswith('Bad request'))
+
+	def testRequest(self):
+		path = tempfile.mktemp('.sock')
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		server.bind(path)
+		server.listen(1)
+
+		results = []
+		def serveOnce():
+			conn, addr = server.accept()
+			try:
+				results.append(compileserver.handleConnection(self.compiler, conn))
+			finally:
+				conn.close()
+
+		thread = threading.Thread(target=serveOnce)
+		thread.start()
+		try:
+			reply = compileserver.shutdown(path)
+		finally:
+			thread.join()
+			server.close()
+			os.remove(path)
+
+		self.assertEqual(reply, {'success':True})
+		self.assertEqual(results, [False])
@@ -250,3 +250,69 @@ class TestMapMapForget(unittest.TestCase):
 
 		f = m.forget().forget()
 		self.assertEqual(f, set((1, 2, 3, 4, 5)))
+
+
+import analysis.lifetimeanalysis.database.base as base
+import analysis.lifetimeanalysis.database.relation as relation
+
+class TestCheckAccess(unittest.TestCase):
+	def setUp(self):
+		self.schema = mapping.MappingSchema(structure.TypeSchema(int), lattice.setUnionSchema)
+
+	def tearDown(self):
+		base.checkAccess = False
+
+	def testUnchecked(self):
+		m = self.schema.instance()
+		self.assertEqual(m['a'], None)
+
+	def testChecked(self):
+		base.checkAccess = True
+		m = self.schema.instance()
+		self.assertRaises(base.SchemaError, lambda: m['a'])
+
+
+class TestRelation(unittest.TestCase):
+	def setUp(self):
+		self.interner = relation.Interner()
+		i = self.interner.intern
+
+		self.r = relation.Relation(2)
+		for a, b in (('x', 'y'), ('y', 'z'), ('x', 'z'), ('x', 'y')):
+			self.r.add(i(a), i(b))
+
+	def decode(self, rel):
+		return set([self.interner.lookup(row) for row in rel])
+
+	def testFreeze(self):
+		self.assertEqual(len(self.r), 3)
+		self.assertEqual(list(self.r), sorted(self.r))
+		self.assertEqual(self.decode(self.r), set([('x', 'y'), ('y', 'z'), ('x', 'z')]))
+
+	def testProject(self):
+		self.assertEqual(self.decode(self.r.project(1, 0)), set([('y', 'x'), ('z', 'y'), ('z', 'x')]))
+		self.assertEqual(self.decode(self.r.project(0)), set([('x',), ('y',)]))
+
+	def testIndex(self):
+		i = self.interner.intern
+		lut = self.r.index(0)
+		self.assertEqual(sorted(lut[(i('x'),)]), sorted([(i('y'),), (i('z'),)]))
+
+	def testJoin(self):
+		# Paths of length two.
+		paths = self.r.join(self.r, (1,), (0,))
+		self.assertEqual(self.decode(paths), set([('x', 'y', 'z')]))
+
+	def testInvertInvokes(self):
+		from analysis.lifetimeanalysis import invertInvokes
+
+		interner = relation.Interner()
+		edges = relation.Relation(5)
+		edges.add(*interner.internAll(('f', 'op1', 'c0', 'g', 'c1')))
+		edges.add(*interner.internAll(('f', 'op2', 'c0', 'g', 'c1')))
+		edges.add(*interner.internAll(('h', 'op3', 'c2', 'g', 'c3')))
+
+		sources = invertInvokes(edges, interner)
+		self.assertEqual(set(sources[('g', 'c1')]), set([('f', 'op1', 'c0'), ('f', 'op2', 'c0')]))
+		self.assertEqual(set(sources[('g', 'c3')]), set([('h', 'op3', 'c2')]))
+		self.assertEqual(len(sources), 2)
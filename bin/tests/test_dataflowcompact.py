@@ -0,0 +1,130 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import random
+
+from language.python import ast
+from analysis.dataflowIR import graph
+from analysis.dataflowIR import compact
+from analysis.dataflowIR import ordering
+from analysis.dataflowIR import predicate
+from analysis.dataflowIR.transform import dce
+
+def makeOp(hb, predicate, op, reads, count):
+	g = graph.GenericOp(hb, op)
+	g.setPredicate(predicate)
+	for i, slot in enumerate(reads):
+		g.addLocalRead(ast.Local('r%d' % i), slot)
+
+	results = []
+	for i in range(count):
+		lcl = graph.LocalNode(hb)
+		g.addLocalModify(None, lcl)
+		results.append(g.localModifies[-1])
+	return g, results
+
+def makeGraph(size, seed):
+	# A straight line of ops, each reading random earlier values.
+	rng = random.Random(seed)
+	hb = graph.Hyperblock(0)
+
+	dataflow = graph.DataflowGraph(hb)
+	dataflow.initPredicate()
+
+	values = []
+	for i in range(3):
+		lcl = graph.LocalNode(hb)
+		dataflow.entry.addEntry(ast.Local('p%d' % i), lcl)
+		values.append(lcl)
+
+	# A field that only bridges the entry to the exit.
+	field = graph.FieldNode(hb, 'f')
+	dataflow.entry.addEntry('f', field)
+
+	existing = graph.ExistingNode(1, None)
+	dataflow.existing[1] = existing
+
+	loads = []
+	for i in range(size):
+		reads = rng.sample(values, min(len(values), rng.randint(1, 3)))
+		if rng.random() < 0.2:
+			reads.append(existing)
+
+		isLoad = rng.random() < 0.3
+		op = ast.Load(ast.Local('e'), 'Attribute', ast.Local('n')) if isLoad else ast.Local('op%d' % i)
+
+		g, results = makeOp(hb, dataflow.entryPredicate, op, reads, rng.randint(0, 2))
+		if isLoad: loads.append(g)
+		values.extend(results)
+
+	dataflow.exit = graph.Exit(hb)
+	dataflow.exit.setPredicate(dataflow.entryPredicate)
+	dataflow.exit.addExit('f', field)
+	for i, value in enumerate(rng.sample(values, 3)):
+		dataflow.exit.addExit(ast.Local('out%d' % i), value)
+
+	return dataflow, loads
+
+class TestCompactGraph(unittest.TestCase):
+	def testEdges(self):
+		dataflow, loads = makeGraph(20, 1)
+		cg = compact.freeze(dataflow)
+
+		for i, node in enumerate(cg.nodes):
+			self.assertEqual(cg.index[node], i)
+			self.assertEqual(cg.thaw(cg.successors(i)), [child for child in node.forward() if child is not None])
+
+			# The transposed edges match what the nodes report.
+			reverse = [prev for prev in node.reverse() if prev is not None]
+			self.assertEqual(sorted(cg.thaw(cg.predecessors(i))), sorted(reverse))
+
+		self.assertEqual(set(cg.loads()), set(loads))
+
+	def testOrder(self):
+		for seed in range(5):
+			dataflow, loads = makeGraph(50, seed)
+			self.assertEqual(compact.freeze(dataflow).order(), ordering.OrderSearcher().process(dataflow))
+
+	def testLive(self):
+		for seed in range(5):
+			dataflow, loads = makeGraph(50, seed)
+			live = compact.freeze(dataflow).live()
+			self.assertEqual(live, dce.LivenessSearcher().process(dataflow))
+
+			# The bridging field is not live.
+			self.assertFalse(dataflow.exit.reads['f'] in live)
+
+	def testDCE(self):
+		def shape(dataflow):
+			return [(type(node).__name__, len(list(node.forward()))) for node in ordering.evaluateDataflow(dataflow)]
+
+		for seed in range(3):
+			original, loads = makeGraph(50, seed)
+			dce.evaluateDataflow(original)
+
+			dataflow, loads = makeGraph(50, seed)
+			dce.LivenessKiller(compact.freeze(dataflow).live()).process(dataflow)
+
+			self.assertEqual(shape(dataflow), shape(original))
+
+	def testPredicateGraph(self):
+		dataflow, loads = makeGraph(50, 2)
+		pg = predicate.buildPredicateGraph(dataflow)
+		frozen = predicate.buildPredicateGraph(dataflow, compact.freeze(dataflow))
+
+		self.assertEqual(frozen.exit, pg.exit)
+		self.assertEqual(frozen.idom, pg.idom)
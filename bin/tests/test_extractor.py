@@ -0,0 +1,79 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import math
+
+from decompiler.programextractor import Extractor
+from application.context import CompilerContext
+
+class Example(object):
+	__slots__ = 'value'
+
+	def __init__(self, value):
+		self.value = value
+
+class TestDemandExtraction(unittest.TestCase):
+	def setUp(self):
+		self.compiler = CompilerContext(None)
+		self.extractor = Extractor(self.compiler)
+		self.extractor.demand = True
+		self.extractor.codeCache = None
+
+	def getSlot(self, pyobj, slottype, key):
+		extractor = self.extractor
+		result = extractor.getSlot(extractor.getObject(pyobj), slottype, extractor.getObject(key))
+		return None if result is None else result.pyobj
+
+	def testModule(self):
+		obj = self.extractor.getObject(math)
+		self.extractor.ensureLoaded(obj)
+
+		# Only the dictionary slot is extracted until asked for.
+		self.assert_(obj in self.extractor.partial)
+		self.assertEqual(len(obj.slot), 1)
+
+		self.assert_(self.getSlot(math, 'Attribute', 'sqrt') is math.sqrt)
+		self.assertEqual(len(obj.slot), 2)
+		self.assertEqual(self.getSlot(math, 'Attribute', 'doesNotExist'), None)
+
+	def testContainers(self):
+		d = {1:'int', 'a':'str'}
+		self.assertEqual(self.getSlot(d, 'Dictionary', 1), 'int')
+		self.assertEqual(self.getSlot(d, 'Dictionary', 'a'), 'str')
+
+		# Equal, but not the same key.
+		self.assertEqual(self.getSlot(d, 'Dictionary', True), None)
+		self.assertEqual(self.getSlot(d, 'Dictionary', 1.0), None)
+
+		t = (3, 4)
+		self.assertEqual(self.getSlot(t, 'Array', 1), 4)
+		self.assertEqual(self.getSlot(t, 'Array', 2), None)
+		self.assertEqual(self.getSlot(t, 'LowLevel', 'length'), 2)
+
+	def testMember(self):
+		e = Example(7)
+		name = self.compiler.slots.uniqueSlotName(Example.__dict__['value'])
+		self.assertEqual(self.getSlot(e, 'Attribute', name), 7)
+
+	def testComplete(self):
+		d = {'a':1, 'b':2}
+		obj = self.extractor.getObject(d)
+		self.extractor.ensureLoaded(obj)
+
+		self.extractor.completeObject(obj)
+		self.assertFalse(obj in self.extractor.partial)
+		self.assertEqual(len(obj.dictionary), 2)
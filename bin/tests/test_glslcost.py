@@ -0,0 +1,116 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+
+from language.glsl import ast as glsl
+from language.glsl import builtintypes as types
+from language.glsl import cost
+
+class TestGLSLCost(unittest.TestCase):
+	def setUp(self):
+		self.normal   = glsl.Input(glsl.InputDecl(None, False, False, types.vec3, 'normal'))
+		self.texcoord = glsl.Input(glsl.InputDecl(None, False, False, types.vec2, 'texcoord'))
+		self.light    = glsl.Uniform(glsl.UniformDecl(False, types.vec3, 'light', None))
+		self.sampler  = glsl.Uniform(glsl.UniformDecl(False, types.sampler2D, 'albedo', None))
+		self.color    = glsl.Output(glsl.OutputDecl(None, False, False, False, types.vec4, 'color'))
+
+	def code(self, statements):
+		return glsl.Code('main', [], types.void, glsl.Suite(statements))
+
+	def testCategories(self):
+		n = glsl.Local(types.vec3, 'n')
+		d = glsl.Local(types.float, 'd')
+		albedo = glsl.Local(types.vec4, 'albedo')
+
+		statements = [
+			glsl.Assign(glsl.IntrinsicOp('normalize', [self.normal]), n),
+			glsl.Assign(glsl.IntrinsicOp('max', [glsl.IntrinsicOp('dot', [n, self.light]), glsl.Constant(types.float, 0.0)]), d),
+			glsl.Assign(glsl.IntrinsicOp('texture', [self.sampler, self.texcoord]), albedo),
+			glsl.Switch(glsl.BinaryOp(d, '>', glsl.Constant(types.float, 0.5)),
+				glsl.Suite([glsl.Assign(glsl.BinaryOp(albedo, '*', d), albedo)]),
+				glsl.Suite([])),
+			glsl.Assign(glsl.BinaryOp(albedo, '+', glsl.Constructor(types.vec4, [n, d])), self.color),
+		]
+
+		c = cost.evaluateCode(None, self.code(statements))
+
+		self.assertEqual(c.ops['geometric'], 2)
+		self.assertEqual(c.components['geometric'], 6)
+		self.assertEqual(c.ops['common'], 1)
+		self.assertEqual(c.components['common'], 1)
+		self.assertEqual(c.ops['mul'], 1)
+		self.assertEqual(c.components['mul'], 4)
+		self.assertEqual(c.ops['add'], 1)
+		self.assertEqual(c.components['add'], 4)
+		self.assertEqual(c.ops['compare'], 1)
+		self.assertEqual(c.ops['move'], 1)
+		self.assertEqual(c.textures, 1)
+		self.assertEqual(c.branches, 1)
+
+		self.assertEqual(len(c.uniforms), 2)
+		self.assertEqual(len(c.inputs), 2)
+		self.assertEqual(len(c.outputs), 1)
+
+		# All three temporaries are live at the final add.
+		self.assertEqual(c.temporaries, 3)
+		self.assertEqual(c.pressure, 3)
+		self.assertEqual(c.pressureComponents, 8)
+
+	def testMatrix(self):
+		m = glsl.Uniform(glsl.UniformDecl(False, types.mat4, 'm', None))
+		p = glsl.Input(glsl.InputDecl(None, False, False, types.vec4, 'p'))
+		out = glsl.Output(glsl.OutputDecl(None, False, False, True, types.vec4, 'gl_Position'))
+
+		c = cost.evaluateCode(None, self.code([glsl.Assign(glsl.BinaryOp(glsl.BinaryOp(m, '*', p), '+', p), out)]))
+		self.assertEqual(c.components['mul'], 16)
+		self.assertEqual(c.components['add'], 4)
+
+		# Builtins are not counted as varyings.
+		lines = dict(c.lines())
+		self.assertEqual(lines['outputs'], '0 0')
+		self.assertEqual(lines['uniforms'], '1 16')
+
+	def testLoopPressure(self):
+		i = glsl.Local(types.float, 'i')
+		a = glsl.Local(types.vec4, 'a')
+		b = glsl.Local(types.vec4, 'b')
+
+		one = glsl.Constant(types.float, 1.0)
+		statements = [
+			glsl.Assign(glsl.Constant(types.float, 0.0), i),
+			glsl.Assign(glsl.Constructor(types.vec4, [one]), a),
+			glsl.While(glsl.BinaryOp(i, '<', glsl.Constant(types.float, 4.0)), glsl.Suite([
+				glsl.Assign(glsl.BinaryOp(a, '*', a), b),
+				glsl.Assign(glsl.BinaryOp(b, '+', b), a),
+				glsl.Assign(glsl.BinaryOp(i, '+', one), i),
+			])),
+			glsl.Assign(a, self.color),
+		]
+
+		c = cost.evaluateCode(None, self.code(statements))
+		self.assertEqual(c.loops, 1)
+		self.assertEqual(c.pressure, 3)
+		self.assertEqual(c.pressureComponents, 9)
+
+	def testReport(self):
+		c = cost.evaluateCode(None, self.code([glsl.Assign(self.normal, self.color)]))
+		report = cost.formatReport('Example', [('vs', c), ('fs', c)])
+		lines = report.splitlines()
+		self.assertEqual(lines[0], '# Example')
+		self.assert_('vs.alu.total 0 0' in lines)
+		self.assert_('fs.inputs 1 3' in lines)
+		self.assertEqual(report, cost.formatReport('Example', [('vs', c), ('fs', c)]))
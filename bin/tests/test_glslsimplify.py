@@ -0,0 +1,161 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+
+from language.glsl import ast as glsl
+from language.glsl import builtintypes as types
+from language.glsl import cost
+from language.glsl import simplify
+
+class TestGLSLSimplify(unittest.TestCase):
+	def setUp(self):
+		self.normal = glsl.Input(glsl.InputDecl(None, False, False, types.vec3, 'normal'))
+		self.light  = glsl.Uniform(glsl.UniformDecl(False, types.vec3, 'light', None))
+		self.scale  = glsl.Uniform(glsl.UniformDecl(False, types.float, 'scale', None))
+		self.color  = glsl.Output(glsl.OutputDecl(None, False, False, False, types.vec4, 'color'))
+
+	def code(self, statements):
+		return glsl.Code('main', [], types.void, glsl.Suite(statements))
+
+	def const(self, value):
+		return glsl.Constant(types.float, value)
+
+	def simplify(self, statements):
+		code = self.code(statements)
+		before = cost.evaluateCode(None, code)
+		code = simplify.evaluateCode(None, code)
+		after  = cost.evaluateCode(None, code)
+		return code.body.statements, before, after
+
+	def testCSE(self):
+		a = glsl.Local(types.vec3, 'a')
+		b = glsl.Local(types.vec3, 'b')
+		d = glsl.Local(types.float, 'd')
+
+		statements, before, after = self.simplify([
+			glsl.Assign(glsl.IntrinsicOp('normalize', [self.normal]), a),
+			glsl.Assign(glsl.IntrinsicOp('normalize', [self.normal]), b),
+			glsl.Assign(glsl.IntrinsicOp('dot', [glsl.IntrinsicOp('normalize', [self.normal]), self.light]), d),
+			glsl.Assign(glsl.Constructor(types.vec4, [glsl.BinaryOp(a, '+', b), d]), self.color),
+		])
+
+		self.assertEqual(before.ops['geometric'], 4)
+		self.assertEqual(after.ops['geometric'], 2)
+
+		# Every use of the normal refers to the first temporary.
+		self.assertEqual(len(statements), 3)
+		self.assert_(statements[1].expr.args[0] is a)
+		add = statements[2].expr.args[0]
+		self.assert_(add.left is a and add.right is a)
+
+	def testScopes(self):
+		a = glsl.Local(types.vec3, 'a')
+		b = glsl.Local(types.vec3, 'b')
+		c = glsl.Local(types.vec3, 'c')
+		cond = glsl.BinaryOp(self.scale, '>', self.const(0.0))
+
+		statements, before, after = self.simplify([
+			glsl.Switch(cond,
+				glsl.Suite([glsl.Assign(glsl.BinaryOp(self.normal, '*', self.light), a)]),
+				glsl.Suite([])),
+			glsl.Assign(glsl.BinaryOp(self.normal, '*', self.light), b),
+			glsl.Assign(glsl.BinaryOp(self.normal, '*', self.light), c),
+			glsl.Assign(glsl.Constructor(types.vec4, [glsl.BinaryOp(a, '+', glsl.BinaryOp(b, '+', c)), self.scale]), self.color),
+		])
+
+		# The value computed in the branch is not available after it.
+		self.assertEqual(before.ops['mul'], 3)
+		self.assertEqual(after.ops['mul'], 2)
+
+	def testRedefined(self):
+		a = glsl.Local(types.vec3, 'a')
+		b = glsl.Local(types.vec3, 'b')
+
+		statements, before, after = self.simplify([
+			glsl.Assign(glsl.BinaryOp(self.normal, '*', self.light), a),
+			glsl.Assign(glsl.BinaryOp(a, '+', self.light), a),
+			glsl.Assign(glsl.BinaryOp(a, '+', self.light), b),
+			glsl.Assign(glsl.Constructor(types.vec4, [b, self.scale]), self.color),
+		])
+
+		# a does not hold a single value, so nothing is eliminated.
+		self.assertEqual(before.aluOps, after.aluOps)
+		self.assertEqual(len(statements), 4)
+
+	def testStrengthReduction(self):
+		d = glsl.Local(types.float, 'd')
+		e = glsl.Local(types.float, 'e')
+
+		statements, before, after = self.simplify([
+			glsl.Assign(glsl.IntrinsicOp('length', [self.light]), d),
+			glsl.Assign(glsl.IntrinsicOp('length', [self.light]), e),
+			glsl.Assign(glsl.Constructor(types.vec4, [
+				glsl.BinaryOp(self.normal, '*', self.const(1.0)),
+				glsl.BinaryOp(glsl.BinaryOp(d, '*', e), '+', glsl.IntrinsicOp('pow', [self.scale, self.const(2.0)])),
+				]), self.color),
+		])
+
+		self.assertEqual(before.ops['transcendental'], 1)
+		self.assertEqual(after.ops['transcendental'], 0)
+		self.assert_(after.aluOps < before.aluOps)
+
+		args = statements[0].expr.args
+		self.assert_(args[0] is self.normal)
+
+		dot, square = args[1].left, args[1].right
+		self.assertEqual(dot.name, 'dot')
+		self.assertEqual(square.op, '*')
+
+	def testStrengthReductionRedefined(self):
+		v = glsl.Local(types.vec3, 'v')
+		d = glsl.Local(types.float, 'd')
+		e = glsl.Local(types.float, 'e')
+
+		statements, before, after = self.simplify([
+			glsl.Assign(self.light, v),
+			glsl.Assign(glsl.IntrinsicOp('length', [v]), d),
+			glsl.Assign(glsl.BinaryOp(v, '*', self.const(2.0)), v),
+			glsl.Assign(glsl.IntrinsicOp('length', [v]), e),
+			glsl.Assign(glsl.Constructor(types.vec4, [self.normal, glsl.BinaryOp(d, '*', e)]), self.color),
+		])
+
+		# v holds a different value at each length, so they are not squared.
+		self.assertEqual(after.ops['geometric'], before.ops['geometric'])
+
+		# No dot is produced: the product still multiplies the two lengths.
+		product = statements[-1].expr.args[1]
+		self.assert_(isinstance(product, glsl.BinaryOp))
+		self.assert_(product.left is d and product.right is e)
+		self.assertEqual([stmt.expr.name for stmt in statements if isinstance(stmt.expr, glsl.IntrinsicOp)], ['length', 'length'])
+
+	def testConstructors(self):
+		v = glsl.BinaryOp(self.normal, '*', glsl.Constructor(types.vec3, [self.scale]))
+		w = glsl.BinaryOp(glsl.Constructor(types.vec3, [self.const(2.0)]), '+', glsl.Constructor(types.vec3, [self.const(1.0), self.const(2.0), self.const(3.0)]))
+		statements, before, after = self.simplify([
+			glsl.Assign(glsl.Constructor(types.vec4, [glsl.BinaryOp(v, '+', glsl.Constructor(types.vec3, [w])), self.const(1.0)]), self.color),
+		])
+
+		self.assertEqual(after.ops['move'], 2)
+		self.assert_(after.aluOps < before.aluOps)
+
+		add = statements[0].expr.args[0]
+		self.assert_(add.left.right is self.scale)
+
+		# Constant operations are folded into one constructor.
+		folded = add.right
+		self.assert_(isinstance(folded, glsl.Constructor))
+		self.assertEqual([arg.object for arg in folded.args], [3.0, 4.0, 5.0])
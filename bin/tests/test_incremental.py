@@ -0,0 +1,133 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from cStringIO import StringIO
+
+import config
+from util.application.console import Console
+from application.context import CompilerContext
+from application.interface.glsl import GLSLDeclaration
+from application import incremental
+
+moduleSource = """
+SCALE = %d
+
+class Light(object):
+	intensity = %d
+
+def scale(x):
+	return x*SCALE*Light.intensity
+"""
+
+class TestIncremental(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.cacheDirectory = config.cacheDirectory
+		config.cacheDirectory = self.directory
+
+		sys.path.insert(0, self.directory)
+		self.writeModule(2, 3)
+
+	def tearDown(self):
+		sys.path.remove(self.directory)
+		sys.modules.pop('incrementaltarget', None)
+		config.cacheDirectory = self.cacheDirectory
+		shutil.rmtree(self.directory)
+
+	def writeModule(self, scale, intensity):
+		f = open(os.path.join(self.directory, 'incrementaltarget.py'), 'w')
+		f.write(moduleSource % (scale, intensity))
+		f.close()
+
+		for ext in ('.pyc', '.pyo'):
+			filename = os.path.join(self.directory, 'incrementaltarget'+ext)
+			if os.path.exists(filename):
+				os.remove(filename)
+
+		sys.modules.pop('incrementaltarget', None)
+		__import__('incrementaltarget')
+		return sys.modules['incrementaltarget']
+
+	def record(self):
+		module = sys.modules['incrementaltarget']
+
+		class Code(object):
+			annotation = None
+
+		code = Code()
+		record = incremental.ShaderRecord('Shader')
+		record.dependencies[('compiler',)] = incremental.compilerFingerprint()
+		record.dependencies.update(incremental.codeDependencies({code:[module.scale]}, code))
+		return record
+
+	def testDependencies(self):
+		record = self.record()
+		filename = os.path.join(self.directory, 'incrementaltarget.py')
+		self.assert_(('function', 'incrementaltarget', 'scale') in record.dependencies)
+		self.assert_(('file', filename) in record.dependencies)
+		self.assertFalse(record.isDirty())
+
+	def testFunctionChanged(self):
+		record = self.record()
+		module = sys.modules['incrementaltarget']
+		module.scale = lambda x: x
+		self.assert_(record.isDirty())
+
+	def testConstantChanged(self):
+		record = self.record()
+		self.writeModule(4, 3)
+		self.assert_(record.isDirty())
+
+	def testClassAttributeChanged(self):
+		record = self.record()
+		self.writeModule(2, 5)
+		self.assert_(record.isDirty())
+
+	def testCompilerChanged(self):
+		record = self.record()
+		record.dependencies[('compiler',)] = 'an older compiler'
+		self.assert_(record.isDirty())
+
+	def testSelectShaders(self):
+		class Clean(object): pass
+		class Dirty(object): pass
+		class New(object): pass
+
+		makefile = os.path.join(self.directory, 'makefile.py')
+		open(makefile, 'w').close()
+
+		build = incremental.IncrementalBuild(makefile)
+		build.records['Clean'] = self.record()
+
+		record = self.record()
+		record.dependencies[('compiler',)] = 'an older compiler'
+		build.records['Dirty'] = record
+
+		glsl = GLSLDeclaration()
+		for cls in (Clean, Dirty, New):
+			glsl.shader(cls, 1)
+
+		compiler = CompilerContext(Console(out=StringIO()))
+		build.selectShaders(compiler, glsl)
+
+		self.assertEqual([shader.typeobj for shader, args in glsl._shader], [Dirty, New])
+		self.assertEqual(build.compiled, set(['Dirty', 'New']))
+		self.assertEqual(build.reused, set(['Clean']))
@@ -0,0 +1,78 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+
+from analysis.storegraph import setmanager
+
+class TestCachedSetManager(unittest.TestCase):
+	def createManager(self):
+		return setmanager.CachedSetManager()
+
+	def setUp(self):
+		self.manager = self.createManager()
+
+	def testCoerce(self):
+		a = self.manager.coerce(['a', 'b'])
+		b = self.manager.coerce(('b', 'a'))
+		self.assert_(a is b)
+		self.assert_('a' in a)
+		self.assert_('c' not in a)
+		self.assertEqual(len(a), 2)
+		self.assertEqual(set(self.manager.iter(a)), set(['a', 'b']))
+
+	def testEmpty(self):
+		e = self.manager.empty()
+		self.assertFalse(e)
+		self.assert_(self.manager.coerce([]) is e)
+
+	def testUnion(self):
+		a = self.manager.coerce([1, 2])
+		b = self.manager.coerce([2, 3])
+		c = self.manager.coerce([1, 2, 3])
+		self.assert_(self.manager.inplaceUnion(a, b) is c)
+		self.assert_(self.manager.inplaceUnion(c, a) is c)
+
+		# Sets from outside the manager are accepted.
+		self.assert_(self.manager.inplaceUnion(a, frozenset([3])) is c)
+
+	def testDiff(self):
+		a = self.manager.coerce([1, 2, 3])
+		b = self.manager.coerce([2])
+		c = self.manager.coerce([1, 3])
+		self.assert_(self.manager.diff(a, b) is c)
+		self.assert_(self.manager.diff(a, a) is self.manager.empty())
+		self.assertFalse(self.manager.diff(b, a))
+
+		temp = self.manager.tempDiff(a, b)
+		self.assertEqual(set(temp), set([1, 3]))
+		self.assertFalse(self.manager.tempDiff(b, a))
+
+	def testMemory(self):
+		self.manager.coerce(range(10))
+		self.assert_(self.manager.memory() > 0)
+
+class TestBitsetManager(TestCachedSetManager):
+	def createManager(self):
+		return setmanager.BitsetManager()
+
+	def testLarge(self):
+		values = range(0, 1000, 7)
+		a = self.manager.coerce(values)
+		self.assertEqual(list(a), values)
+		self.assertEqual(len(a), len(values))
+		self.assert_(self.manager.issubset(self.manager.coerce([7, 14]), a))
+		self.assertFalse(self.manager.issubset(a, self.manager.coerce([7, 14])))
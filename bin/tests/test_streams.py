@@ -0,0 +1,101 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import array
+
+from . bindbase import TestBindBase
+
+from language.python import ast
+from translator.dataflowtransform import bind
+
+from shader import vec
+from shader import streams
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class TestStreamLayout(unittest.TestCase):
+	def setUp(self):
+		self.layout = streams.StreamLayout(('position', 3), ('texcoord', 2))
+
+		self.position = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+		self.texcoord = [10.0, 11.0, 12.0, 13.0]
+		self.expected = [0.0, 1.0, 2.0, 10.0, 11.0, 3.0, 4.0, 5.0, 12.0, 13.0]
+
+	def testLayout(self):
+		self.assertEqual(self.layout.attributes, [('position', 3, 0), ('texcoord', 2, 12)])
+		self.assertEqual(self.layout.stride, 20)
+
+	def testArrays(self):
+		data = self.layout.interleave((array.array('f', self.position), array.array('f', self.texcoord)))
+		self.assertEqual(list(data), self.expected)
+
+	def testMismatch(self):
+		self.assertRaises(ValueError, self.layout.interleave, (array.array('f', self.position), array.array('f', self.texcoord[:2])))
+		self.assertRaises(ValueError, self.layout.interleave, (array.array('f', self.position[:5]), array.array('f', self.texcoord)))
+		self.assertRaises(TypeError, self.layout.interleave, (array.array('d', self.position), array.array('f', self.texcoord)))
+
+	def testAlias(self):
+		layout = streams.StreamLayout(('position', 3))
+		position = array.array('f', self.position)
+		data = layout.interleave((position,))
+
+		if numpy is not None:
+			# A view of the same memory.
+			data[0] = 7.0
+			self.assertEqual(position[0], 7.0)
+		else:
+			self.assert_(data is position)
+
+	if numpy is not None:
+		def testNumPy(self):
+			position = numpy.array(self.position).reshape(2, 3)
+			texcoord = memoryview(numpy.array(self.texcoord, dtype=numpy.float32))
+			data = self.layout.interleave((position, texcoord))
+			self.assertEqual(data.dtype, numpy.float32)
+			self.assertEqual(list(data), self.expected)
+
+class TestInterleavedBinding(TestBindBase):
+	def generate(self, types):
+		streams = [ast.Local(name) for name, t in types]
+		live    = [(lcl, 'vs_' + lcl.name, t) for lcl, (name, t) in zip(streams, types)]
+
+		layout, code = bind.interleavedCode(self.compiler, streams, live)
+		cdef = ast.ClassDef('Compiled', [], ast.Suite([
+			ast.Assign(layout, [ast.Local('streamLayout')]),
+			ast.FunctionDef('bindInterleaved', code, []),
+			]), [])
+
+		glbls = self.execute(cdef, {'shader':__import__('shader.streams')})
+		return glbls['Compiled']
+
+	def testBind(self):
+		Compiled = self.generate([('position', vec.vec3), ('texcoord', vec.vec2)])
+
+		uploads = []
+		class Shader(Compiled):
+			def bind_interleaved_streams(self, layout, data):
+				uploads.append((layout, list(data)))
+
+		Shader().bindInterleaved(array.array('f', [0.0, 1.0, 2.0]), array.array('f', [3.0, 4.0]))
+
+		self.assertEqual(len(uploads), 1)
+		layout, data = uploads[0]
+		self.assertEqual(layout.attributes, [('vs_position', 3, 0), ('vs_texcoord', 2, 12)])
+		self.assertEqual(data, [0.0, 1.0, 2.0, 3.0, 4.0])
@@ -0,0 +1,187 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import tempfile
+import shutil
+import collections
+
+from stubs.stublibrary import StubLibrary
+from util.io import filesystem
+from application.context import Slots
+from language.python import ast
+from language.python import program
+from util.monkeypatch import xtypes
+
+# Just enough of the extractor for the library to bind the stubs.
+class FakeExtractor(object):
+	def __init__(self):
+		self.objects = {}
+		self.desc = program.ProgramDescription()
+		self.nameLUT = {}
+		self.codeLUT = {}
+		self.attrLUT = collections.defaultdict(dict)
+		self.pointerToStub = {}
+
+	def getObject(self, pyobj):
+		key = id(pyobj)
+		if key not in self.objects:
+			self.objects[key] = (pyobj, program.Object(pyobj))
+		return self.objects[key][1]
+
+	def replaceCode(self, obj, code):
+		self.codeLUT[id(obj)] = code
+
+	def attachStubToPtr(self, stub, ptr):
+		self.pointerToStub[ptr] = stub
+
+	def replaceAttr(self, obj, attr, replacement):
+		self.attrLUT[id(obj)][attr] = replacement
+
+class FakeCompiler(object):
+	def __init__(self):
+		self.slots = Slots()
+		self.extractor = FakeExtractor()
+
+class FakeCollector(object):
+	def __init__(self):
+		self.journal = []
+		self.exports = {}
+		self.codeToFunction = {}
+
+	def cfuncptr(self, obj):
+		return id(obj)
+
+class Example(object):
+	__slots__ = 'value'
+
+def makeStubFunction():
+	other = None
+
+	def stubFunction(a, b=2):
+		return other(a, b)
+	return stubFunction
+
+class TestStubLibrary(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def makeCode(self, compiler, func):
+		extractor = compiler.extractor
+		slotName = compiler.slots.uniqueSlotName(Example.__dict__['value'])
+
+		a   = ast.Local('a')
+		ret = ast.Local('ret')
+		p = ast.CodeParameters(None, [a], ['a'], [], None, None, [ret])
+		s = ast.Suite([
+			ast.Assign(ast.Existing(extractor.getObject(slotName)), [a]),
+			ast.Assign(ast.Existing(extractor.getObject(func)), [a]),
+			ast.Assign(ast.Existing(extractor.getObject(xtypes.FunctionType)), [a]),
+			ast.Return([a])])
+		return ast.Code('stubFunction', p, s)
+
+	def testRoundTrip(self):
+		compiler  = FakeCompiler()
+		collector = FakeCollector()
+		func = makeStubFunction()
+		code = self.makeCode(compiler, func)
+
+		collector.codeToFunction[code] = func
+		collector.exports['stubFunction'] = code
+		collector.journal.append(('register', func, code))
+		collector.journal.append(('ptr', code, float.__dict__['__add__']))
+		collector.journal.append(('attr', Example, 'stub', func))
+
+		library = StubLibrary(compiler, self.directory)
+		self.assert_(library.store(collector))
+
+		# Load into a fresh compiler.
+		compiler  = FakeCompiler()
+		collector = FakeCollector()
+		library = StubLibrary(compiler, self.directory)
+		self.assert_(library.load(collector))
+
+		extractor = compiler.extractor
+		loaded = collector.exports['stubFunction']
+		self.assertEqual(extractor.desc.functions, [loaded])
+
+		# The stub function is rebuilt, and bound to the code.
+		rebuilt = extractor.nameLUT['stubFunction']
+		self.assert_(rebuilt is not func)
+		self.assertEqual(rebuilt.func_code.co_code, func.func_code.co_code)
+		self.assertEqual(rebuilt.func_defaults, (2,))
+		self.assert_(extractor.codeLUT[id(rebuilt)] is loaded)
+		self.assert_(extractor.attrLUT[id(Example)]['stub'] is rebuilt)
+		self.assert_(extractor.pointerToStub[id(float.__dict__['__add__'])] is loaded)
+
+		# References are re-extracted, slot names are regenerated.
+		slotName, function, functionType, ret = loaded.ast.blocks
+		self.assertEqual(compiler.slots.reverse[slotName.expr.object.pyobj], Example.__dict__['value'])
+		self.assert_(function.expr.object is extractor.getObject(rebuilt))
+		self.assert_(functionType.expr.object.pyobj is xtypes.FunctionType)
+
+	def testExecutedClosure(self):
+		compiler  = FakeCompiler()
+		collector = FakeCollector()
+
+		# A closure that is not a stub would be executed without its cells.
+		code = self.makeCode(compiler, makeStubFunction())
+		collector.journal.append(('register', None, code))
+
+		library = StubLibrary(compiler, self.directory)
+		self.assertFalse(library.store(collector))
+		self.assertFalse(library.load(FakeCollector()))
+
+	def testPartialLoad(self):
+		compiler  = FakeCompiler()
+		collector = FakeCollector()
+		func = makeStubFunction()
+		code = self.makeCode(compiler, func)
+		collector.codeToFunction[code] = func
+		collector.journal.append(('register', func, code))
+
+		library = StubLibrary(compiler, self.directory)
+		self.assert_(library.store(collector))
+
+		# Truncated after the key, some objects are extracted before the load fails.
+		data = filesystem.readData(self.directory, 'library', 'pickle', binary=True)
+		filesystem.writeBinaryData(self.directory, 'library', 'pickle', data[:-20])
+
+		compiler  = FakeCompiler()
+		collector = FakeCollector()
+		library = StubLibrary(compiler, self.directory)
+		self.assertFalse(library.load(collector))
+		self.assert_(library.extracted)
+		self.assertNotEqual(compiler.extractor.objects, {})
+		self.assertEqual(collector.exports, {})
+
+	def testStaleLoad(self):
+		compiler  = FakeCompiler()
+		collector = FakeCollector()
+		collector.journal.append(('register', None, self.makeCode(compiler, makeStubFunction())))
+		library = StubLibrary(compiler, self.directory)
+		library.key = 'an older key'
+		library.store(collector)
+
+		# Nothing is extracted from a stale library.
+		compiler = FakeCompiler()
+		library = StubLibrary(compiler, self.directory)
+		self.assertFalse(library.load(FakeCollector()))
+		self.assertFalse(library.extracted)
+		self.assertEqual(compiler.extractor.objects, {})
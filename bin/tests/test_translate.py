@@ -0,0 +1,108 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+from cStringIO import StringIO
+
+import config
+
+# Loaded first, to avoid an import cycle in the optimization package.
+import optimization.simplify
+
+from util.application.console import Console
+from application.context import CompilerContext
+from language.glsl import cost
+
+import translator.dataflowtransform as dataflowtransform
+
+def fakeEvaluateCode(compiler, prgm, name, vscode, fscode):
+	compiler.console.output("translating %s" % name)
+
+	with compiler.console.scope(name):
+		with compiler.console.scope('synthesize'):
+			compiler.console.count('statements', len(name))
+
+	vsCost = cost.ShaderCost()
+	vsCost.textures = len(name)
+
+	compiler.generated[name] = ("// vs %s" % name, "// fs %s" % name)
+	compiler.shaderCosts[name] = (vsCost, cost.ShaderCost())
+	compiler.stats['glsl'][name] = len(name)
+
+class FakeShaderProgram(object):
+	def __init__(self, name):
+		self.name = name
+
+	def vertexShaderCode(self):
+		return None
+
+	def fragmentShaderCode(self):
+		return None
+
+class FakeInterface(object):
+	def __init__(self, names):
+		self.names = names
+
+	def entryCode(self):
+		return [FakeShaderProgram(name) for name in self.names]
+
+class FakeProgram(object):
+	def __init__(self, names):
+		self.interface = FakeInterface(names)
+
+class TestTranslateParallel(unittest.TestCase):
+	def setUp(self):
+		self.compiler = CompilerContext(Console(out=StringIO()))
+		self.jobs = [('a', None, None), ('bb', None, None), ('ccc', None, None)]
+
+		self.evaluateCode  = dataflowtransform.evaluateCode
+		self.ShaderProgram = dataflowtransform.ShaderProgram
+		self.processes     = config.translationProcesses
+		dataflowtransform.evaluateCode  = fakeEvaluateCode
+		dataflowtransform.ShaderProgram = FakeShaderProgram
+
+	def tearDown(self):
+		dataflowtransform.evaluateCode  = self.evaluateCode
+		dataflowtransform.ShaderProgram = self.ShaderProgram
+		config.translationProcesses = self.processes
+
+	def testResults(self):
+		dataflowtransform.translateParallel(self.compiler, None, self.jobs, 2)
+
+		self.assertEqual(self.compiler.generated, {'a':('// vs a', '// fs a'), 'bb':('// vs bb', '// fs bb'), 'ccc':('// vs ccc', '// fs ccc')})
+		self.assertEqual(sorted(self.compiler.shaderCosts), ['a', 'bb', 'ccc'])
+		self.assertEqual(self.compiler.shaderCosts['ccc'][0].textures, 3)
+		self.assertEqual(self.compiler.stats['glsl'], {'a':1, 'bb':2, 'ccc':3})
+
+		# The output is merged in order.
+		out = self.compiler.console.out.getvalue()
+		self.assert_(out.index('translating a') < out.index('translating bb') < out.index('translating ccc'), out)
+
+	def testScopes(self):
+		config.translationProcesses = 2
+		dataflowtransform.translate(self.compiler, FakeProgram(['ccc', 'a', 'bb']))
+
+		translate, = self.compiler.console.root.children
+		self.assertEqual(translate.name, 'translate to glsl')
+
+		# Each worker's phases are attached under the parent's scope, in order.
+		self.assertEqual([scope.name for scope in translate.children], ['a', 'bb', 'ccc'])
+		for scope in translate.children:
+			self.assert_(scope.parent is translate)
+			synthesize, = scope.children
+			self.assertEqual(synthesize.path(), ('translate to glsl', scope.name, 'synthesize'))
+			self.assertEqual(synthesize.counters, {'statements':len(scope.name)})
+			self.assert_(synthesize.elapsed >= 0.0)
@@ -0,0 +1,151 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import struct
+
+from . bindbase import TestBindBase
+
+from language.python import ast
+from translator.dataflowtransform import bind
+from translator.dataflowtransform.glsltranslatortwo import UniformLayout
+
+from shader.vec import *
+
+class Uniforms(object):
+	pass
+
+class TestPackedUniforms(TestBindBase):
+	def setUp(self):
+		TestBindBase.setUp(self)
+
+		self.layout = UniformLayout('uni', {'m':0, 'v':48, 'f':60, 'i':64}, 80)
+		self.types  = {'m':mat3, 'v':vec3, 'f':float, 'i':int}
+
+		self.uploads = []
+
+	def generate(self):
+		packed = bind.PackedUniforms(self.layout)
+		selfarg = ast.Local('self')
+		shader  = ast.Local('shader')
+
+		statements = []
+		for name in sorted(self.types.iterkeys()):
+			value = ast.Local(name)
+			statements.append(ast.Assign(ast.GetAttr(shader, self.existing(name)), [value]))
+			statements.append(bind.packUniform(self.compiler, packed, name, self.types[name], value))
+
+		body = bind.packedUniformBody(self.compiler, selfarg, packed, statements)
+		code = ast.Code('_bindUniforms', ast.CodeParameters(None, [selfarg, shader], ['self', 'shader'], [], None, None, []), ast.Suite(body))
+		glbls = self.execute(ast.FunctionDef('_bindUniforms', code, []), {'struct':struct})
+
+		uploads = self.uploads
+		class Compiled(object):
+			uniformData    = None
+			_bindUniforms  = glbls['_bindUniforms']
+
+			def bind_uniform_block(self, name, data, offset):
+				uploads.append((name, data.tobytes(), offset))
+
+		return Compiled()
+
+	def testPack(self):
+		shader = Uniforms()
+		shader.m = mat3(1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0)
+		shader.v = vec3(10.0, 11.0, 12.0)
+		shader.f = 13.0
+		shader.i = 14
+
+		compiled = self.generate()
+		compiled._bindUniforms(shader)
+
+		self.assertEqual(len(self.uploads), 1)
+		name, data, offset = self.uploads[0]
+		self.assertEqual(name, 'uni')
+		self.assertEqual(offset, 0)
+		self.assertEqual(len(data), 80)
+
+		# Matrices are stored by column, padded to a vec4.
+		self.assertEqual(struct.unpack_from('<3f', data, 0), (1.0, 4.0, 7.0))
+		self.assertEqual(struct.unpack_from('<3f', data, 16), (2.0, 5.0, 8.0))
+		self.assertEqual(struct.unpack_from('<3f', data, 32), (3.0, 6.0, 9.0))
+		self.assertEqual(struct.unpack_from('<3f', data, 48), (10.0, 11.0, 12.0))
+		self.assertEqual(struct.unpack_from('<f', data, 60), (13.0,))
+		self.assertEqual(struct.unpack_from('<i', data, 64), (14,))
+
+	def testDirty(self):
+		shader = Uniforms()
+		shader.m = mat3(1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0)
+		shader.v = vec3(10.0, 11.0, 12.0)
+		shader.f = 13.0
+		shader.i = 14
+
+		compiled = self.generate()
+		compiled._bindUniforms(shader)
+
+		# Nothing changed, nothing is uploaded.
+		compiled._bindUniforms(shader)
+		self.assertEqual(len(self.uploads), 1)
+
+		# Only the range that changed is uploaded.
+		shader.v = vec3(1.0, 2.0, 3.0)
+		compiled._bindUniforms(shader)
+		self.assertEqual(len(self.uploads), 2)
+		name, data, offset = self.uploads[1]
+		self.assertEqual(offset, 48)
+		self.assertEqual(struct.unpack('<3f', data), (1.0, 2.0, 3.0))
+
+	def testMutated(self):
+		shader = Uniforms()
+		shader.m = mat3(1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0)
+		shader.v = vec3(10.0, 11.0, 12.0)
+		shader.f = 13.0
+		shader.i = 14
+
+		compiled = self.generate()
+		compiled._bindUniforms(shader)
+
+		# The same object, mutated in place.
+		shader.v.x = 99.0
+		compiled._bindUniforms(shader)
+		self.assertEqual(len(self.uploads), 2)
+		name, data, offset = self.uploads[1]
+		self.assertEqual(offset, 48)
+		self.assertEqual(struct.unpack('<3f', data), (99.0, 11.0, 12.0))
+		self.assertEqual(struct.unpack_from('<3f', compiled.uniformData, 48), (99.0, 11.0, 12.0))
+
+	def testZero(self):
+		shader = Uniforms()
+		shader.m = mat3(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+		shader.v = vec3(0.0, 0.0, 0.0)
+		shader.f = 0.0
+		shader.i = 0
+
+		# The first bind uploads the whole buffer, even if it matches the fresh buffer.
+		compiled = self.generate()
+		compiled._bindUniforms(shader)
+		self.assertEqual(len(self.uploads), 1)
+		name, data, offset = self.uploads[0]
+		self.assertEqual(offset, 0)
+		self.assertEqual(len(data), 80)
+
+	def testFormat(self):
+		self.assertEqual(bind.packFormat(mat2), ('<2f8x2f8x', ['m00', 'm10', 'm01', 'm11']))
+		self.assertEqual(bind.packFormat(vec4), ('<4f', ['x', 'y', 'z', 'w']))
+		self.assertEqual(bind.packFormat(bool), ('<i', None))
+
+		for t in (mat2, mat3, mat4, vec2, vec3, vec4, float, int):
+			fmt, fields = bind.packFormat(t)
+			self.assert_(struct.calcsize(fmt) <= 64)
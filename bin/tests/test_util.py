@@ -15,6 +15,7 @@
 from __future__ import absolute_import
 import unittest
 
+import util.typedispatch
 from util.typedispatch import *
 class TestTypeDisbatch(unittest.TestCase):
 	def testTD(self):
@@ -40,6 +41,60 @@ class TestTypeDisbatch(unittest.TestCase):
 		self.assertEqual(foo(2**70), 'number')
 		self.assertEqual(foo(1.0),   'default')
 
+	def testInherit(self):
+		class Base(TypeDispatcher):
+			@dispatch(int)
+			def visitInt(self, node):
+				return 'int'
+
+			@defaultdispatch
+			def visitDefault(self, node):
+				return 'default'
+
+		# Resolves bool to the int handler.
+		self.assertEqual(Base()(True), 'int')
+
+		class Derived(Base):
+			@dispatch(bool)
+			def visitBool(self, node):
+				return 'bool'
+
+		# The resolution in the base does not hide the declaration.
+		self.assertEqual(Derived()(True), 'bool')
+		self.assertEqual(Derived()(1),    'int')
+
+	def testCustomCall(self):
+		class Cached(TypeDispatcher):
+			@defaultdispatch
+			def visitDefault(self, node):
+				return node
+
+			def __call__(self, node):
+				return ('cached', TypeDispatcher.__call__(self, node))
+
+		class Derived(Cached):
+			pass
+
+		self.assertEqual(Derived()(1), ('cached', 1))
+
+	def testInstrumented(self):
+		class Counted(TypeDispatcher):
+			@defaultdispatch
+			def visitDefault(self, node):
+				return node
+
+		util.typedispatch.setInstrumented(True)
+		try:
+			Counted()(1)
+			Counted()(2)
+			Counted()('a')
+			self.assertEqual(util.typedispatch.visitCounts[('Counted', 'int')], 2)
+			self.assertEqual(util.typedispatch.visitCounts[('Counted', 'str')], 1)
+		finally:
+			util.typedispatch.setInstrumented(False)
+
+		self.assertEqual(Counted()(3), 3)
+
 
 import util.python.calling
 from util.tvl import *
@@ -433,3 +488,57 @@ class TestCallingUtility(unittest.TestCase):
 ##		finalStatement = f.code.ast.blocks[-1]
 ##		self.assertEqual(type(finalStatement), ast.Return)
 ##		self.assertEqual(type(finalStatement.expr), ast.Local)
+
+
+from util.application.async import WorkQueue
+class TestWorkQueue(unittest.TestCase):
+	def testJobs(self):
+		results = []
+		queue = WorkQueue(2)
+		for i in range(10):
+			queue.add(results.append, i)
+		queue.join()
+
+		self.assertEqual(sorted(results), range(10))
+		self.assertEqual(queue.threads, [])
+
+	def testError(self):
+		def fail():
+			raise ValueError, "failed"
+
+		queue = WorkQueue(2)
+		queue.add(fail)
+		self.assertRaises(ValueError, queue.join)
+
+
+import os
+import shutil
+import tempfile
+from util.io import filesystem
+class TestSourceHash(unittest.TestCase):
+	def setUp(self):
+		self.root = tempfile.mkdtemp()
+		filesystem.writeData(os.path.join(self.root, 'package'), 'module', 'py', 'x = 1\n')
+		filesystem.writeData(os.path.join(self.root, 'package'), 'notes', 'txt', 'ignored\n')
+		filesystem.writeData(self.root, 'config', 'py', 'y = 2\n')
+
+	def tearDown(self):
+		shutil.rmtree(self.root)
+
+	def sourceHash(self):
+		return filesystem.sourceHash(self.root, ['package', 'config.py'])
+
+	def testEdit(self):
+		original = self.sourceHash()
+		self.assertEqual(self.sourceHash(), original)
+
+		filesystem.writeData(os.path.join(self.root, 'package'), 'notes', 'txt', 'still ignored\n')
+		self.assertEqual(self.sourceHash(), original)
+
+		filesystem.writeData(os.path.join(self.root, 'package'), 'module', 'py', 'x = 3\n')
+		self.assertNotEqual(self.sourceHash(), original)
+
+	def testRename(self):
+		original = self.sourceHash()
+		os.rename(os.path.join(self.root, 'package', 'module.py'), os.path.join(self.root, 'package', 'other.py'))
+		self.assertNotEqual(self.sourceHash(), original)
@@ -0,0 +1,109 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import unittest
+import sys
+
+from shader.vec import *
+from shader.function import *
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# A small shader, written against the scalar types.
+def shade(m, n, l, color):
+	n = (m*vec4(n, 0.0)).xyz.normalize()
+	diffuse = clamp(n.dot(l), 0.0, 1.0)
+	return vec4(color*diffuse+vec3(0.1), smoothstep(0.0, 1.0, diffuse))
+
+if numpy is not None:
+	from shader import vecarray
+
+	class TestVecArray(unittest.TestCase):
+		def setUp(self):
+			self.a = [vec3(1.0, 2.0, 3.0), vec3(-1.0, 0.5, 0.25), vec3(0.0, 4.0, -2.0)]
+			self.b = [vec3(0.5, 0.5, 2.0), vec3(3.0, -1.0, 1.0), vec3(1.0, 1.0, 1.0)]
+			self.aa = vecarray.vec3array.fromvecs(self.a)
+			self.ba = vecarray.vec3array.fromvecs(self.b)
+
+		def assertVecsEqual(self, batched, expected):
+			self.assertEqual(len(batched), len(expected))
+			for actual, value in zip(batched.tolist(), expected):
+				self.assertEqual(type(actual), type(value))
+				for name in value.__slots__:
+					self.assertAlmostEqual(getattr(actual, name), getattr(value, name))
+
+		def testOperators(self):
+			self.assertVecsEqual(self.aa+self.ba, [a+b for a, b in zip(self.a, self.b)])
+			self.assertVecsEqual(self.aa*2.0-self.ba, [a*2.0-b for a, b in zip(self.a, self.b)])
+			self.assertVecsEqual(1.0/(self.ba+4.0), [1.0/(b+4.0) for b in self.b])
+			self.assertVecsEqual(-abs(self.aa), [-abs(a) for a in self.a])
+			self.assertVecsEqual(self.aa.cross(self.ba), [a.cross(b) for a, b in zip(self.a, self.b)])
+
+			# Scalar vectors act as uniforms.
+			self.assertVecsEqual(self.aa*vec3(1.0, 2.0, 3.0), [a*vec3(1.0, 2.0, 3.0) for a in self.a])
+
+			# Arrays of scalars act per element.
+			scale = numpy.array([1.0, 2.0, 3.0])
+			self.assertVecsEqual(scale*self.aa, [a*s for a, s in zip(self.a, scale)])
+
+		def testFunctions(self):
+			dots = self.aa.dot(self.ba)
+			for d, a, b in zip(dots, self.a, self.b):
+				self.assertAlmostEqual(d, a.dot(b))
+
+			self.assertVecsEqual(self.aa.normalize(), [a.normalize() for a in self.a])
+			self.assertVecsEqual(self.aa.reflect(self.ba), [a.reflect(b) for a, b in zip(self.a, self.b)])
+			self.assertVecsEqual(self.aa.mix(self.ba, 0.25), [a.mix(b, 0.25) for a, b in zip(self.a, self.b)])
+
+			n = self.ba.normalize()
+			i = self.aa.normalize()
+			self.assertVecsEqual(i.refract(n, 1.5), [a.normalize().refract(b.normalize(), 1.5) for a, b in zip(self.a, self.b)])
+
+		def testSwizzle(self):
+			self.assertVecsEqual(self.aa.zyx, [a.zyx for a in self.a])
+			self.assertVecsEqual(self.aa.rgbr, [a.rgbr for a in self.a])
+			self.assertVecsEqual(self.aa.xy, [a.xy for a in self.a])
+
+			self.aa.zx = vec2(7.0, 8.0)
+			for a in self.a: a.zx = vec2(7.0, 8.0)
+			self.assertVecsEqual(self.aa, self.a)
+
+		def testConstruct(self):
+			v = vecarray.vec4array(self.aa.xy, 1.0, numpy.array([1.0, 2.0, 3.0]))
+			self.assertEqual(len(v), 3)
+			self.assertEqual(v.element(2).w, 3.0)
+			self.assertRaises(TypeError, vecarray.vec4array, self.aa.xy)
+
+		def testBatchedShader(self):
+			m = mat4(0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+			l = vec3(0.0, 0.6, 0.8)
+			color = vec3(1.0, 0.5, 0.25)
+
+			expected = [shade(m, n, l, color) for n in self.a]
+
+			module = sys.modules[__name__]
+			batched = vecarray.run([module], shade, m, self.aa, l, color)
+			self.assertVecsEqual(batched, expected)
+
+			# The scalar types are restored.
+			self.assert_(isinstance(module.vec3(1.0), vecarray.vectorTypes))
+
+			# Without uniform(...), NumPy would apply the scalar vector per element.
+			self.assertRaises(TypeError, lambda: vecarray.vec3array(color*self.aa.x))
+			self.assertVecsEqual(vecarray.uniform(color)*self.aa.x, [color*a.x for a in self.a])
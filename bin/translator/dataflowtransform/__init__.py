@@ -12,6 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import collections
+import multiprocessing
+from cStringIO import StringIO
+
+import config
+
 import analysis.dataflowIR.dump
 import analysis.dataflowIR.convert
 from analysis.dataflowIR.transform import loadelimination
@@ -375,12 +382,68 @@ def evaluateCode(compiler, prgm, name, vscode, fscode):
 
 from language.python.shaderprogram import ShaderProgram
 
+# The analyzed program, inherited by forked worker processes.
+_parallelState = None
+
+def _translateWorker(index):
+	compiler, prgm, jobs = _parallelState
+	name, vs, fs = jobs[index]
+
+	# Buffer the output and results, the parent process merges them in order.
+	compiler.console.out = StringIO()
+	compiler.stats = collections.defaultdict(dict)
+	compiler.generated = {}
+	compiler.shaderCosts = {}
+
+	current = compiler.console.current
+	start = len(current.children)
+
+	evaluateCode(compiler, prgm, name, vs, fs)
+
+	# The finished scopes, for the parent's profile.
+	scopes = [scope.detach() for scope in current.children[start:]]
+
+	return compiler.console.out.getvalue(), dict(compiler.stats), compiler.generated, compiler.shaderCosts, scopes
+
+def translateParallel(compiler, prgm, jobs, processes):
+	global _parallelState
+
+	# The pool must be created after the state is set, so the workers inherit it.
+	_parallelState = (compiler, prgm, jobs)
+	try:
+		pool = multiprocessing.Pool(processes)
+		try:
+			results = pool.map(_translateWorker, range(len(jobs)), 1)
+		finally:
+			pool.close()
+			pool.join()
+	finally:
+		_parallelState = None
+
+	for output, shaderStats, generated, shaderCosts, scopes in results:
+		compiler.console.out.write(output)
+		for scope in scopes:
+			compiler.console.current.attach(scope)
+		for stage, lut in shaderStats.iteritems():
+			compiler.stats[stage].update(lut)
+		compiler.generated.update(generated)
+		compiler.shaderCosts.update(shaderCosts)
+
 def translate(compiler, prgm):
 	with compiler.console.scope('translate to glsl'):
+		jobs = []
 		for code in prgm.interface.entryCode():
 			if isinstance(code, ShaderProgram):
-				name = code.name
-				vs = code.vertexShaderCode()
-				fs = code.fragmentShaderCode()
-
+				jobs.append((code.name, code.vertexShaderCode(), code.fragmentShaderCode()))
+
+		# Translate in a deterministic order.
+		jobs.sort(key=lambda job: job[0])
+
+		# Each shader program is translated independently, so they can be done in parallel.
+		# The workers rely on fork to inherit the analyzed program.
+		processes = min(config.translationProcesses, len(jobs))
+		if processes > 1 and hasattr(os, 'fork'):
+			translateParallel(compiler, prgm, jobs, processes)
+		else:
+			for name, vs, fs in jobs:
 				evaluateCode(compiler, prgm, name, vs, fs)
@@ -14,6 +14,8 @@
 
 import sys
 
+import config
+
 from language.python import ast
 from language.python.simplecodegen import SimpleCodeGen
 
@@ -22,10 +24,12 @@ from util.asttools import symbols
 Symbol = symbols.Symbol
 
 from ... import intrinsics
+from shader import vec
 
 import cStringIO
 
 from util.io import filesystem
+from language.glsl import cost
 
 from . import existingtransform
 
@@ -51,6 +55,96 @@ def bindUniform(compiler, self, name, t, value):
 	methodName = "bind_uniform_" + t.__name__
 	return bind.rewrite(self=self, methodName=methodName, name=name, value=value)
 
+# When the shaders declare a std140 uniform block, the uniforms are packed
+# into one buffer instead of being bound one at a time.  Each leaf is packed
+# and compared with the bytes already in the buffer, and only the range of
+# the buffer that changed is uploaded.  The bytes are compared rather than
+# the objects, as vectors and matrices may be mutated in place.
+
+class PackedUniforms(object):
+	def __init__(self, layout):
+		self.layout  = layout
+		self.packed  = ast.Local('packed')
+		self.data    = ast.Local('data')
+		self.start   = ast.Local('start')
+		self.end     = ast.Local('end')
+
+		# The uniforms packed into the buffer.
+		self.leaves  = set()
+
+matrixSize = {vec.mat2:2, vec.mat3:3, vec.mat4:4}
+
+def packFormat(t):
+	# Returns the struct format and the fields of a uniform, in std140 order.
+	if t in matrixSize:
+		size = matrixSize[t]
+		column = "%df" % size
+		if size < 4: column += "%dx" % ((4-size)*4)
+		fields = ['m%d%d' % (row, col) for col in range(size) for row in range(size)]
+		return "<" + column*size, fields
+	elif t in intrinsics.vectorTypes:
+		return "<%df" % len(t.__slots__), list(t.__slots__)
+	elif t is float:
+		return "<f", None
+	else:
+		assert t in (int, bool), t
+		return "<i", None
+
+uniformPackTemplate = ast.Suite([
+	ast.Assign(
+		ast.Call(
+			ast.GetAttr(ast.GetGlobal(existingConstant('struct')), existingConstant('pack')),
+			symbols.Symbol('args'),
+			[], None, None
+		),
+		[symbols.Symbol('packed')]
+	),
+	ast.Switch(
+		ast.Condition(ast.Suite([]),
+			ast.BinaryOp(ast.GetSlice(symbols.Symbol('data'), existingSymbol('offset'), existingSymbol('offsetEnd'), None), '!=', symbols.Symbol('packed'))
+		),
+		ast.Suite([
+			ast.SetSlice(symbols.Symbol('packed'), symbols.Symbol('data'), existingSymbol('offset'), existingSymbol('offsetEnd'), None),
+			ast.Switch(
+				ast.Condition(ast.Suite([]), ast.BinaryOp(symbols.Symbol('start'), '>', existingSymbol('offset'))),
+				ast.Suite([ast.Assign(existingSymbol('offset'), [symbols.Symbol('start')])]),
+				ast.Suite([])
+			),
+			ast.Switch(
+				ast.Condition(ast.Suite([]), ast.BinaryOp(symbols.Symbol('end'), '<', existingSymbol('offsetEnd'))),
+				ast.Suite([ast.Assign(existingSymbol('offsetEnd'), [symbols.Symbol('end')])]),
+				ast.Suite([])
+			),
+		]),
+		ast.Suite([])
+	),
+])
+
+def packUniform(compiler, packed, name, t, value):
+	pack = symbols.SymbolRewriter(compiler.extractor, uniformPackTemplate)
+
+	offset = packed.layout.offsets[name]
+	fmt, fields = packFormat(t)
+
+	packed.leaves.add(name)
+
+	args = [ast.Existing(compiler.extractor.getObject(fmt))]
+	if fields is None:
+		args.append(value)
+	else:
+		for field in fields:
+			args.append(ast.GetAttr(value, ast.Existing(compiler.extractor.getObject(field))))
+
+	return pack.rewrite(packed=packed.packed, data=packed.data,
+		args=args, start=packed.start, end=packed.end,
+		offset=offset, offsetEnd=offset+intrinsics.byteSize[t])
+
+def bindLeaf(compiler, self, packed, name, t, value):
+	if packed is not None and name in packed.layout.offsets:
+		return packUniform(compiler, packed, name, t, value)
+	else:
+		return bindUniform(compiler, self, name, t, value)
+
 typeCheckTemplate = ast.Call(
 	ast.GetGlobal(existingConstant('isinstance')),
 	[symbols.Symbol('root'), existingSymbol('type')],
@@ -62,7 +156,7 @@ typeBindTemplate = ast.Suite([
 
 # self -> the serializing class
 # root -> the current uniform local
-def serializeUniformNode(compiler, translator, self, holdingSlot, refs, root):
+def serializeUniformNode(compiler, translator, self, packed, holdingSlot, refs, root):
 	check = symbols.SymbolRewriter(compiler.extractor, typeCheckTemplate)
 
 	types = sorted(set([ref.xtype.obj.pythonType() for ref in refs]))
@@ -78,13 +172,13 @@ def serializeUniformNode(compiler, translator, self, holdingSlot, refs, root):
 
 	if len(types) == 1:
 		t = types[0]
-		return handleUniformType(compiler, translator, self, holdingSlot, typeLUT[t], root, t)
+		return handleUniformType(compiler, translator, self, packed, holdingSlot, typeLUT[t], root, t)
 	else:
 		switches = []
 		for t in types:
 			cond  = check.rewrite(root=root, type=t)
 
-			body     = handleUniformType(compiler, translator, self, holdingSlot, typeLUT[t], root, t)
+			body     = handleUniformType(compiler, translator, self, packed, holdingSlot, typeLUT[t], root, t)
 
 			switches.append((cond, ast.Suite(body)))
 
@@ -122,7 +216,7 @@ def classAttrFromField(compiler, field):
 
 	return cls, attr
 
-def handleUniformType(compiler, translator, self, holdingSlot, ref, root, t):
+def handleUniformType(compiler, translator, self, packed, holdingSlot, ref, root, t):
 	statements = []
 
 	# Find the group name
@@ -137,7 +231,7 @@ def handleUniformType(compiler, translator, self, holdingSlot, ref, root, t):
 			uid  = translator.typeIDs[t]
 			uidO = compiler.extractor.getObject(uid)
 
-			statements.append(bindUniform(compiler, self, name, int, ast.Existing(uidO)))
+			statements.append(bindLeaf(compiler, self, packed, name, int, ast.Existing(uidO)))
 
 		if intrinsics.isIntrinsicType(t):
 			if t in intrinsics.samplerTypes:
@@ -147,7 +241,7 @@ def handleUniformType(compiler, translator, self, holdingSlot, ref, root, t):
 			else:
 				sub = structInfo.lut.subpools[t]
 				name = sub.name
-			statements.append(bindUniform(compiler, self, name, t, root))
+			statements.append(bindLeaf(compiler, self, packed, name, t, root))
 
 		# TODO fields?
 
@@ -170,7 +264,7 @@ def handleUniformType(compiler, translator, self, holdingSlot, ref, root, t):
 			statements.append(assign)
 
 			# Recurse
-			statements.extend(serializeUniformNode(compiler, translator, self, field, field, target))
+			statements.extend(serializeUniformNode(compiler, translator, self, packed, field, field, target))
 
 	return statements
 
@@ -183,20 +277,76 @@ uniformCodeTemplate = ast.Code(
 	symbols.Symbol('body')
 )
 
-def bindUniforms(compiler, translator, uniformSlot):
+uniformPrologueTemplate = ast.Suite([
+	ast.Assign(ast.GetAttr(symbols.Symbol('self'), existingConstant('uniformData')), [symbols.Symbol('data')]),
+	ast.Switch(
+		ast.Condition(ast.Suite([]), ast.Is(symbols.Symbol('data'), existingConstant(None))),
+		ast.Suite([
+			# The first bind, allocate the buffer and upload all of it.
+			ast.Assign(ast.Call(ast.GetGlobal(existingConstant('bytearray')), [existingSymbol('size')], [], None, None), [symbols.Symbol('data')]),
+			ast.SetAttr(symbols.Symbol('data'), symbols.Symbol('self'), existingConstant('uniformData')),
+			ast.Assign(existingConstant(0), [symbols.Symbol('start')]),
+			ast.Assign(existingSymbol('size'), [symbols.Symbol('end')]),
+		]),
+		ast.Suite([
+			ast.Assign(existingSymbol('size'), [symbols.Symbol('start')]),
+			ast.Assign(existingConstant(0), [symbols.Symbol('end')]),
+		])
+	),
+])
+
+uniformUploadTemplate = ast.Switch(
+	ast.Condition(ast.Suite([]), ast.BinaryOp(symbols.Symbol('start'), '<', symbols.Symbol('end'))),
+	ast.Suite([
+		ast.Discard(
+			ast.Call(
+				ast.GetAttr(symbols.Symbol('self'), existingConstant('bind_uniform_block')),
+				[
+					existingSymbol('name'),
+					ast.GetSlice(
+						ast.Call(ast.GetGlobal(existingConstant('memoryview')), [symbols.Symbol('data')], [], None, None),
+						symbols.Symbol('start'), symbols.Symbol('end'), None
+					),
+					symbols.Symbol('start'),
+				],
+				[], None, None
+			)
+		),
+	]),
+	ast.Suite([])
+)
+
+def bindUniforms(compiler, translator, uniformSlot, layout=None):
 	code = symbols.SymbolRewriter(compiler.extractor, uniformCodeTemplate)
 
 	self   = ast.Local('self')
 	shader = ast.Local('shader')
 
+	packed = PackedUniforms(layout) if layout is not None else None
+
 	if uniformSlot.annotation.references:
 		uniformRefs = uniformSlot.annotation.references.merged
-		body = ast.Suite(serializeUniformNode(compiler, translator, self, uniformSlot, uniformRefs, shader))
+		statements = serializeUniformNode(compiler, translator, self, packed, uniformSlot, uniformRefs, shader)
 	else:
 		# No uniforms are used.
-		body = ast.Suite([])
+		statements = []
+
+	if packed is not None and packed.leaves:
+		statements = packedUniformBody(compiler, self, packed, statements)
+
+	return code.rewrite(args=[self, shader], body=ast.Suite(statements))
+
+def packedUniformBody(compiler, self, packed, statements):
+	prologue = symbols.SymbolRewriter(compiler.extractor, uniformPrologueTemplate)
+	upload   = symbols.SymbolRewriter(compiler.extractor, uniformUploadTemplate)
+
+	layout = packed.layout
 
-	return code.rewrite(args=[self, shader], body=body)
+	body = [prologue.rewrite(self=self, data=packed.data,
+		start=packed.start, end=packed.end, size=layout.size)]
+	body.extend(statements)
+	body.append(upload.rewrite(self=self, data=packed.data, start=packed.start, end=packed.end, name=layout.name))
+	return body
 
 
 streamCodeTemplate = ast.Code(
@@ -217,19 +367,12 @@ streamBindTemplate = ast.Discard(
 	)
 )
 
-def bindStreams(compiler, translator, context):
-	code = symbols.SymbolRewriter(compiler.extractor, streamCodeTemplate)
-	bind = symbols.SymbolRewriter(compiler.extractor, streamBindTemplate)
-
-	originalParams = context.originalParams
-	currentParams = context.code.codeparameters
-
-	self   = ast.Local('self')
-	streams   = []
-
-	statements = []
+def liveStreams(translator, context):
+	# Returns the stream parameters, and the live streams as (parameter, shader name, type)
+	streams = []
+	live    = []
 
-	for original in originalParams.params[2:]:
+	for original in context.originalParams.params[2:]:
 		root = ast.Local(original.name)
 		streams.append(root)
 
@@ -241,13 +384,28 @@ def bindStreams(compiler, translator, context):
 			obj = refs[0]
 			assert intrinsics.isIntrinsicObject(obj)
 			t = obj.xtype.obj.pythonType()
-			attr = "bind_stream_" + t.__name__
 
 			structInfo = translator.ioRefInfo.get(ioname)
 
 			shaderName = structInfo.lut.subpools[t].name
 
-			statements.append(bind.rewrite(self=self, attr=attr, shaderName=shaderName, name=root))
+			live.append((root, shaderName, t))
+
+	return streams, live
+
+def bindStreams(compiler, translator, context):
+	code = symbols.SymbolRewriter(compiler.extractor, streamCodeTemplate)
+	bind = symbols.SymbolRewriter(compiler.extractor, streamBindTemplate)
+
+	self = ast.Local('self')
+
+	statements = []
+
+	streams, live = liveStreams(translator, context)
+
+	for root, shaderName, t in live:
+		attr = "bind_stream_" + t.__name__
+		statements.append(bind.rewrite(self=self, attr=attr, shaderName=shaderName, name=root))
 
 #	for original, current in zip(originalParams.params, currentParams.params)[2:]:
 #		root = ast.Local(original.name)
@@ -277,6 +435,80 @@ def bindStreams(compiler, translator, context):
 
 	return code.rewrite(args=args, argnames=names, body=body)
 
+# Interleaved streams are packed by shader.streams, and uploaded as a single buffer.
+# Only streams of floats can be interleaved, otherwise the streams are bound separately.
+
+streamLayoutTemplate = ast.Call(
+	ast.GetAttr(
+		ast.GetAttr(ast.GetGlobal(existingConstant('shader')), existingConstant('streams')),
+		existingConstant('StreamLayout')
+	),
+	symbols.Symbol('attributes'),
+	[], None, None
+)
+
+interleavedBindTemplate = ast.Suite([
+	ast.Assign(
+		ast.Call(
+			ast.GetAttr(ast.GetAttr(symbols.Symbol('self'), existingConstant('streamLayout')), existingConstant('interleave')),
+			[ast.BuildList(symbols.Symbol('streams'))],
+			[], None, None
+		),
+		[symbols.Symbol('data')]
+	),
+	ast.Discard(
+		ast.Call(
+			ast.GetAttr(symbols.Symbol('self'), existingConstant('bind_interleaved_streams')),
+			[ast.GetAttr(symbols.Symbol('self'), existingConstant('streamLayout')), symbols.Symbol('data')],
+			[], None, None
+		)
+	),
+])
+
+interleavedFallbackTemplate = ast.Discard(
+	ast.Call(
+		ast.GetAttr(symbols.Symbol('self'), existingConstant('bindStreams')),
+		symbols.Symbol('streams'),
+		[], None, None
+	)
+)
+
+def interleavedLayout(compiler, live):
+	attributes = []
+	for root, shaderName, t in live:
+		ctype, count = intrinsics.typeComponents[t]
+		if ctype is not float:
+			return None
+		attributes.append(ast.BuildList([ast.Existing(compiler.extractor.getObject(shaderName)), ast.Existing(compiler.extractor.getObject(count))]))
+
+	layout = symbols.SymbolRewriter(compiler.extractor, streamLayoutTemplate)
+	return layout.rewrite(attributes=attributes)
+
+def bindInterleaved(compiler, translator, context):
+	streams, live = liveStreams(translator, context)
+	return interleavedCode(compiler, streams, live)
+
+def interleavedCode(compiler, streams, live):
+	code = symbols.SymbolRewriter(compiler.extractor, streamCodeTemplate)
+
+	self = ast.Local('self')
+
+	layout = interleavedLayout(compiler, live)
+
+	if layout is not None:
+		bind = symbols.SymbolRewriter(compiler.extractor, interleavedBindTemplate)
+		body = bind.rewrite(self=self, streams=[root for root, shaderName, t in live], data=ast.Local('data'))
+	else:
+		bind = symbols.SymbolRewriter(compiler.extractor, interleavedFallbackTemplate)
+		body = ast.Suite([bind.rewrite(self=self, streams=streams)])
+		layout = ast.Existing(compiler.extractor.getObject(None))
+
+	args = [self]
+	args.extend(streams)
+	names = [arg.name for arg in args]
+
+	return layout, code.rewrite(args=args, argnames=names, body=body)
+
 classTemplate = ast.ClassDef(
 	symbols.Symbol('className'),
 	[ast.GetAttr(
@@ -287,8 +519,11 @@ classTemplate = ast.ClassDef(
 		ast.Assign(existingSymbol('original'), [ast.Local('original')]),
 		ast.Assign(existingSymbol('vsCode'), [ast.Local('vs')]),
 		ast.Assign(existingSymbol('fsCode'), [ast.Local('fs')]),
+		ast.Assign(existingConstant(None), [ast.Local('uniformData')]),
 		ast.FunctionDef('_bindUniforms', symbols.Symbol('bindUniforms'), []),
-		ast.FunctionDef('bindStreams',  symbols.Symbol('bindStreams'), [])
+		ast.FunctionDef('bindStreams',  symbols.Symbol('bindStreams'), []),
+		ast.Assign(symbols.Symbol('streamLayout'), [ast.Local('streamLayout')]),
+		ast.FunctionDef('bindInterleaved',  symbols.Symbol('bindInterleaved'), []),
 	]),
 	[]
 )
@@ -325,14 +560,20 @@ def generateBindingClass(compiler, prgm, shaderprgm, translator):
 		# May be unused in vs.
 		uniformSlot = shaderprgm.fscontext.originalParams.params[0]
 
-	uniformCode = bindUniforms(compiler, translator, uniformSlot)
+	# The runtime must implement bind_uniform_block to use the packed uniforms.
+	uniformLayout = shaderprgm.uniformLayout if config.packUniformBlocks else None
+
+	uniformCode = bindUniforms(compiler, translator, uniformSlot, uniformLayout)
 	streamCode  = bindStreams(compiler, translator, shaderprgm.vscontext)
+	streamLayout, interleavedCode = bindInterleaved(compiler, translator, shaderprgm.vscontext)
 
 	vsCode = shaderprgm.vscontext.shaderCode
 	fsCode = shaderprgm.fscontext.shaderCode
+	compiler.generated[shaderprgm.name] = (vsCode, fsCode)
+	compiler.shaderCosts[shaderprgm.name] = (shaderprgm.vscontext.shaderCost, shaderprgm.fscontext.shaderCost)
 
 	code = symbols.SymbolRewriter(compiler.extractor, classTemplate)
-	cdef = code.rewrite(className=className, original=original, vsCode=vsCode, fsCode=fsCode, bindUniforms=uniformCode, bindStreams=streamCode)
+	cdef = code.rewrite(className=className, original=original, vsCode=vsCode, fsCode=fsCode, bindUniforms=uniformCode, bindStreams=streamCode, streamLayout=streamLayout, bindInterleaved=interleavedCode)
 	cdef = existingtransform.evaluateAST(compiler, cdef)
 
 	register = symbols.SymbolRewriter(compiler.extractor, registerTemplate)
@@ -345,7 +586,7 @@ def generateBindingClass(compiler, prgm, shaderprgm, translator):
 	s = buffer.getvalue()
 
 	# HACK for imports
-	s = "import pystreamruntime\nimport tests.full.physics\n\n" + s
+	s = "import struct\nimport pystreamruntime\nimport shader.streams\nimport tests.full.physics\n\n" + s
 
 #	print
 #	print s
@@ -353,4 +594,8 @@ def generateBindingClass(compiler, prgm, shaderprgm, translator):
 
 	filesystem.writeData('summaries/shaders', shaderprgm.name, 'py', s)
 
+	# The estimated cost of the shaders, for diffing between compiler versions.
+	report = cost.formatReport(shaderprgm.name, [('vs', shaderprgm.vscontext.shaderCost), ('fs', shaderprgm.fscontext.shaderCost)])
+	filesystem.writeData('summaries/shaders', shaderprgm.name, 'cost', report)
+
 	return cdef
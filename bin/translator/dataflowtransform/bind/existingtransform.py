@@ -64,7 +64,9 @@ class ExistingTransform(TypeDispatcher):
 	@dispatch(ast.ClassDef, ast.GetGlobal, ast.CodeParameters, ast.Suite,
 			ast.Switch, ast.Condition, ast.Assert,
 			ast.Assign, ast.Discard,
-			ast.Call, ast.GetAttr)
+			ast.Call, ast.GetAttr,
+			ast.SetAttr, ast.GetSubscript, ast.SetSubscript, ast.GetSlice, ast.SetSlice,
+			ast.Is, ast.Not, ast.BinaryOp, ast.BuildList)
 	def visitOK(self, node):
 		return node.rewriteChildren(self)
 
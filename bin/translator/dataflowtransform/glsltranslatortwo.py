@@ -20,11 +20,15 @@ from translator import intrinsics
 from translator.exceptions import TemporaryLimitation
 
 from language.glsl import codegen
+from language.glsl import cost
+from language.glsl import simplify
 
 from newpoolanalysis import model
 
 import collections
 
+import config
+
 
 def makeRef(ref, subref):
 	bt = intrinsics.intrinsicTypeNodes[subref.t]
@@ -483,6 +487,14 @@ def padding(offset, granularity):
 	return size-offset
 
 
+class UniformLayout(object):
+	__slots__ = 'name', 'offsets', 'size'
+
+	def __init__(self, name, offsets, size):
+		self.name    = name
+		self.offsets = offsets # uniform name -> byte offset
+		self.size    = size
+
 def buildBlocks(prepassInfo, shaderprgm, context):
 	block = []
 	decls = []
@@ -512,6 +524,8 @@ def buildBlocks(prepassInfo, shaderprgm, context):
 	#print
 
 	# Pack the fields, greedily minimizing the fragmentation.
+	# The offsets follow the std140 rules, so the host can fill the block without querying them.
+	layout = {}
 	offset = 0
 	while alignedCount:
 		bestErr = 1024
@@ -540,6 +554,7 @@ def buildBlocks(prepassInfo, shaderprgm, context):
 		else:
 			decls.append(chosen)
 
+		layout[chosen.name] = offset+bestErr
 		offset += bestErr+size
 
 		alignedCount -= 1
@@ -548,7 +563,8 @@ def buildBlocks(prepassInfo, shaderprgm, context):
 	# Make sure the uniform block is shared between shaders
 	if not shaderprgm.uniformBlock:
 		if block:
-			shaderprgm.uniformBlock = glsl.BlockDecl('shared', 'uni', block)
+			shaderprgm.uniformBlock  = glsl.BlockDecl('std140', 'uni', block)
+			shaderprgm.uniformLayout = UniformLayout('uni', layout, offset+padding(offset, 16))
 
 	if shaderprgm.uniformBlock:
 		decls.append(shaderprgm.uniformBlock)
@@ -574,7 +590,11 @@ def processCode(compiler, prgm, exgraph, ioinfo, prepassInfo, poolInfo, context,
 
 	uniblock = buildBlocks(prepassInfo, shaderprgm, context)
 
+	if config.simplifyGLSL:
+		result = simplify.evaluateCode(compiler, result)
+
 	s = codegen.evaluateCode(compiler, result, uniblock)
+	context.shaderCost = cost.evaluateCode(compiler, result)
 
 	#print
 	#print s
@@ -21,6 +21,10 @@ from translator import intrinsics
 from translator.exceptions import TemporaryLimitation
 
 from language.glsl import codegen
+from language.glsl import cost
+from language.glsl import simplify
+
+import config
 
 
 def makeRef(mode, t, name=None):
@@ -544,7 +548,12 @@ class GLSLTranslator(TypeDispatcher):
 def processContext(compiler, trans, context):
 
 	result = trans.process(context.code)
+
+	if config.simplifyGLSL:
+		result = simplify.evaluateCode(compiler, result)
+
 	s = codegen.evaluateCode(compiler, result)
+	context.shaderCost = cost.evaluateCode(compiler, result)
 
 	#print
 	#print s
@@ -32,7 +32,7 @@ class IOInfo(object):
 		self.specialOutputs = {}
 
 class ProgramDescription(object):
-	__slots__ = 'prgm', 'name', 'vscontext', 'fscontext', 'mapping', 'vs2fs', 'ioinfo', 'uniformBlock'
+	__slots__ = 'prgm', 'name', 'vscontext', 'fscontext', 'mapping', 'vs2fs', 'ioinfo', 'uniformBlock', 'uniformLayout'
 
 	def __init__(self, prgm, name, vscontext, fscontext):
 		self.prgm = prgm
@@ -42,7 +42,8 @@ class ProgramDescription(object):
 
 		self.vs2fs = {}
 
-		self.uniformBlock = None
+		self.uniformBlock  = None
+		self.uniformLayout = None
 
 	def makeMap(self, tree, slot, mapping):
 		if tree.used:
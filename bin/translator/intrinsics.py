@@ -91,8 +91,9 @@ def init(compiler):
 		components(cls, ctype, cnum)
 
 	def matrixComponents(cls, ctype, col, row):
+		# Columns are padded to a vec4, as if they were an array.
 		byteAlignment[cls] = 4*4
-		byteSize[cls] = basicAlignment(ctype, row)*col
+		byteSize[cls] = 4*4*col
 		components(cls, ctype, col*row)
 
 	scalarComponents(float, float, 1)
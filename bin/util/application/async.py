@@ -12,10 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-__all__ = ['async', 'async_limited']
+__all__ = ['async', 'async_limited', 'WorkQueue']
 
 import threading
 import functools
+import Queue
 
 enabled = True
 
@@ -55,3 +56,62 @@ def async_limited(count):
 			return func
 
 	return limited_func
+
+class WorkQueue(object):
+	# A fixed number of threads, for running many slow external tools,
+	# such as Graphviz, without starting a thread for each one.
+	def __init__(self, count):
+		self.count    = max(count, 1)
+		self.jobs     = Queue.Queue()
+		self.done     = Queue.Queue()
+		self.threads  = []
+		self.pending  = 0
+
+	def worker(self):
+		while True:
+			job = self.jobs.get()
+			if job is None: break
+
+			func, args = job
+			try:
+				func(*args)
+				self.done.put(None)
+			except Exception, e:
+				self.done.put(e)
+
+	def add(self, func, *args):
+		if not enabled:
+			func(*args)
+			return
+
+		if len(self.threads) < self.count:
+			t = threading.Thread(target=self.worker)
+			t.setDaemon(True)
+			t.start()
+			self.threads.append(t)
+
+		self.jobs.put((func, args))
+		self.pending += 1
+
+	def join(self, console=None, name='jobs'):
+		# Wait for every job, reporting progress as they finish.
+		total  = self.pending
+		errors = []
+
+		for i in range(total):
+			error = self.done.get()
+			if error is not None:
+				errors.append(error)
+			if console is not None:
+				console.output("%s %d/%d" % (name, i+1, total))
+
+		self.pending = 0
+
+		for t in self.threads:
+			self.jobs.put(None)
+		for t in self.threads:
+			t.join()
+		self.threads = []
+
+		if errors:
+			raise errors[0]
@@ -13,25 +13,81 @@
 # limitations under the License.
 
 import sys
+import os
+import gc
 import time
 from util.io import formatting
 
+try:
+	import resource
+except ImportError:
+	# Not available on Windows.
+	resource = None
+
+def cpuTime():
+	t = os.times()
+	return t[0]+t[1]
+
+def peakMemory():
+	if resource is None:
+		return None
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	# Linux reports kilobytes, OSX reports bytes.
+	if sys.platform != 'darwin':
+		peak *= 1024
+	return peak
+
 class Scope(object):
 	def __init__(self, parent, name):
 		self.parent   = parent
 		self.name     = name
 		self.children = []
+		self.counters = {}
+
+		self.trackObjects = parent.trackObjects if parent is not None else False
 
 	def begin(self):
-		self._start = time.clock()
+		self._start     = time.clock()
+		self._wallStart = time.time()
+		self._cpuStart  = cpuTime()
+		self._peakStart = peakMemory()
+		self._objectsStart = len(gc.get_objects()) if self.trackObjects else None
 
 	def end(self):
-		self._end = time.clock()
+		self._end     = time.clock()
+		self._wallEnd = time.time()
+		self._cpuEnd  = cpuTime()
+		self._peakEnd = peakMemory()
+		self._objectsEnd = len(gc.get_objects()) if self.trackObjects else None
 
 	@property
 	def elapsed(self):
 		return self._end-self._start
 
+	@property
+	def wallElapsed(self):
+		return self._wallEnd-self._wallStart
+
+	@property
+	def cpuElapsed(self):
+		return self._cpuEnd-self._cpuStart
+
+	@property
+	def peakMemoryDelta(self):
+		if self._peakStart is None: return None
+		return self._peakEnd-self._peakStart
+
+	@property
+	def objectsDelta(self):
+		# The net change in the number of objects tracked by the GC.
+		if self._objectsStart is None: return None
+		return self._objectsEnd-self._objectsStart
+
+	def count(self, name, amount=1):
+		self.counters[name] = self.counters.get(name, 0)+amount
+
 	def path(self):
 		if self.parent is None:
 			return ()
@@ -39,7 +95,20 @@ class Scope(object):
 			return self.parent.path()+(self.name,)
 
 	def child(self, name):
-		return Scope(self, name)
+		scope = Scope(self, name)
+		self.children.append(scope)
+		return scope
+
+	# A finished scope may be detached, sent to another process, and attached there.
+	def detach(self):
+		self.parent.children.remove(self)
+		self.parent = None
+		return self
+
+	def attach(self, scope):
+		assert scope.parent is None, scope
+		scope.parent = self
+		self.children.append(scope)
 
 
 class ConsoleScopeManager(object):
@@ -55,12 +124,13 @@ class ConsoleScopeManager(object):
 		self.console.end()
 
 class Console(object):
-	def __init__(self, out=None):
+	def __init__(self, out=None, trackObjects=False):
 		if out is None:
 			out = sys.stdout
 		self.out = out
 
 		self.root = Scope(None, 'root')
+		self.root.trackObjects = trackObjects
 		self.current = self.root
 
 		self.blameOutput  = False
@@ -83,6 +153,10 @@ class Console(object):
 	def scope(self, name):
 		return ConsoleScopeManager(self, name)
 
+	# Attributes a count, such as the number of constraints processed, to the current scope.
+	def count(self, name, amount=1):
+		self.current.count(name, amount)
+
 	def blame(self):
 		caller = sys._getframe(2)
 		globals = caller.f_globals
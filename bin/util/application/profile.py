@@ -0,0 +1,74 @@
+# Copyright 2011 Nicholas Bray
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Exports the scope tree recorded by the console as a phase profile.
+# The JSON file contains the full tree, the collapsed stack file can be
+# fed directly into flamegraph.pl.
+
+import json
+
+from util.io import filesystem
+
+def finished(scope):
+	return hasattr(scope, '_wallEnd')
+
+def scopeData(scope):
+	data = {'name':scope.name}
+
+	if finished(scope):
+		data['wall']    = scope.wallElapsed
+		data['cpu']     = scope.cpuElapsed
+		data['peakRSS'] = scope.peakMemoryDelta
+		if scope.objectsDelta is not None:
+			data['objects'] = scope.objectsDelta
+
+	if scope.counters:
+		data['counters'] = dict(scope.counters)
+
+	data['children'] = [scopeData(child) for child in scope.children if finished(child)]
+	return data
+
+def selfTime(scope):
+	# Wall time not accounted for by the children.
+	total = scope.wallElapsed
+	for child in scope.children:
+		if finished(child):
+			total -= child.wallElapsed
+	return max(total, 0.0)
+
+def collapsedStacks(scope, prefix=()):
+	# Scopes with the same path are merged, as the flame graph would merge them anyway.
+	lines = {}
+
+	def visit(scope, prefix):
+		if not finished(scope): return
+		path = prefix+(scope.name.replace(';', ':').replace(' ', '_'),)
+		key = ";".join(path)
+		lines[key] = lines.get(key, 0)+int(selfTime(scope)*1000000)
+
+		for child in scope.children:
+			visit(child, path)
+
+	for child in scope.children:
+		visit(child, prefix)
+
+	return ["%s %d" % (key, value) for key, value in sorted(lines.iteritems())]
+
+def dump(console, directory, name):
+	root = console.root
+	data = {'name':root.name, 'counters':dict(root.counters),
+		'children':[scopeData(child) for child in root.children if finished(child)]}
+
+	filesystem.writeData(directory, name, 'json', json.dumps(data, indent=1, sort_keys=True))
+	filesystem.writeData(directory, name, 'collapsed', "\n".join(collapsedStacks(root))+"\n")
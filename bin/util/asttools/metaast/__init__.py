@@ -20,6 +20,7 @@ import sys
 import re
 from . import codegeneration
 from .. symbols import SymbolBase
+from util import typedispatch
 
 ### The field parser ###
 
@@ -241,7 +242,9 @@ class ClassBuilder(object):
 
 class astnode(type):
 	def __new__(self, name, bases, d):
-		return ClassBuilder(self, name, bases, d).build()
+		cls = ClassBuilder(self, name, bases, d).build()
+		typedispatch.registerNodeType(cls)
+		return cls
 
 class ASTNode(object):
 	__metaclass__ = astnode
@@ -62,6 +62,36 @@ def dataHash(s):
 def fileHash(directory, name, format=None, binary=False):
 	return dataHash(readData(directory, name, format, binary))
 
+def sourceHash(root, names, extension='.py'):
+	# Hashes the named files, and the source files in the named directories.
+	# Renaming or removing a file changes the hash, as well as editing one.
+	parts = []
+	for name in names:
+		path = os.path.join(root, name)
+		if os.path.isdir(path):
+			for directory, dirs, files in os.walk(path):
+				dirs.sort()
+				for filename in sorted(files):
+					if filename.endswith(extension):
+						parts.append(relative(join(directory, filename), root))
+						parts.append(fileHash(directory, filename, binary=True))
+		elif os.path.exists(path):
+			parts.append(name)
+			parts.append(fileHash(root, name, binary=True))
+	return dataHash("\0".join(parts))
+
+# The directory holding the compiler's packages.
+compilerRoot = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_compilerSourceHashes = {}
+
+def compilerSourceHash(names):
+	# The compiler's source does not change while it runs, so each hash is only computed once.
+	names = tuple(names)
+	if names not in _compilerSourceHashes:
+		_compilerSourceHashes[names] = sourceHash(compilerRoot, names)
+	return _compilerSourceHashes[names]
+
 def writeFileIfChanged(directory, name, format, data, binary=False):
 	if os.path.exists(join(directory, name, format)):
 		if fileHash(directory, name, format, binary) == dataHash(data):
@@ -18,6 +18,7 @@ __all__ = [
 		]
 
 import inspect
+import collections
 
 def flattenTypesInto(l, result):
 	for child in l:
@@ -47,43 +48,124 @@ def defaultdispatch(f):
 	return defaultWrap
 
 
-def dispatch__call__(self, p, *args):
-	t = type(p)
-	table = self.__typeDispatchTable__
+# Node types that every dispatcher resolves when it is created.
+# AST node classes register themselves as they are defined.
+knownTypes = []
 
-	func = table.get(t)
+def registerNodeType(t):
+	knownTypes.append(t)
 
-	if func is None:
-		# Search for a matching superclass
-		# This should occur only once per class.
+# Every dispatcher class, for switching instrumentation on and off.
+dispatcherClasses = []
 
-		if self.__concrete__:
-			possible = (t,)
-		else:
-			possible = t.mro()
+# When instrumented, counts visits by (dispatcher, node type).
+visitCounts = None
+
+def resolveType(cls, t):
+	# Search for a matching superclass
+	# This should occur only once per class.
+	table = cls.__typeDispatchTable__
 
-		for supercls in possible:
-			func = table.get(supercls)
+	if cls.__concrete__:
+		possible = (t,)
+	else:
+		possible = t.mro()
+
+	for supercls in possible:
+		func = table.get(supercls)
+
+		if func is not None:
+			break
+		elif cls.__namedispatch__:
+			# The emulates "visitor" dispatch, to allow for evolutionary refactoring
+			name = cls.__nameprefix__ + t.__name__
+			func = cls.__dict__.get(name)
 
 			if func is not None:
 				break
-			elif self.__namedispatch__:
-				# The emulates "visitor" dispatch, to allow for evolutionary refactoring
-				name = self.__nameprefix__ + t.__name__
-				func = type(self).__dict__.get(name)
 
-				if func is not None:
-					break
+	# default
+	if func is None:
+		func = table.get(None)
 
-		# default
-		if func is None:
-			func = table.get(None)
+	# Cache the function that we found
+	table[t] = func
+	return func
 
-		# Cache the function that we found
-		table[t] = func
+def dispatch__call__(self, p, *args):
+	t = type(p)
+	func = self.__typeDispatchTable__.get(t)
+
+	if func is None:
+		func = resolveType(type(self), t)
+
+	if visitCounts is not None:
+		visitCounts[(type(self).__name__, t.__name__)] += 1
 
 	return func(self, p, *args)
 
+# Each dispatcher class gets its own entry point, bound to its own table.
+def makeDispatch(cls):
+	get = cls.__typeDispatchTable__.get
+
+	def dispatch__call__(self, p, *args):
+		func = get(type(p))
+		if func is None:
+			func = resolveType(cls, type(p))
+		return func(self, p, *args)
+
+	return dispatch__call__
+
+def makeCountingDispatch(cls):
+	get  = cls.__typeDispatchTable__.get
+	name = cls.__name__
+
+	def dispatch__call__(self, p, *args):
+		t = type(p)
+		func = get(t)
+		if func is None:
+			func = resolveType(cls, t)
+		visitCounts[(name, t.__name__)] += 1
+		return func(self, p, *args)
+
+	return dispatch__call__
+
+def bindDispatch(cls):
+	if visitCounts is None:
+		call = makeDispatch(cls)
+	else:
+		call = makeCountingDispatch(cls)
+
+	cls.__dispatch__ = call
+
+	# Classes that define their own __call__ keep it.
+	if cls.__ownsCall__:
+		cls.__call__ = call
+
+def setInstrumented(enabled):
+	global visitCounts
+
+	if enabled:
+		visitCounts = collections.defaultdict(int)
+	else:
+		visitCounts = None
+
+	for cls in dispatcherClasses:
+		bindDispatch(cls)
+
+def dumpVisitCounts(console, limit=20):
+	passes = collections.defaultdict(int)
+	for (name, typename), count in visitCounts.iteritems():
+		passes[name] += count
+
+	console.output("Visits by pass")
+	for name, count in sorted(passes.iteritems(), key=lambda item: -item[1])[:limit]:
+		console.output("%8d %s" % (count, name))
+
+	console.output("Visits by pass and node type")
+	for (name, typename), count in sorted(visitCounts.iteritems(), key=lambda item: -item[1])[:limit]:
+		console.output("%8d %s %s" % (count, name, typename))
+
 
 class TypeDispatchError(Exception):
 	pass
@@ -97,12 +179,28 @@ def exceptionDefault(self, node, *args):
 
 
 def inlineAncestor(t, lut):
-	if hasattr(t, '__typeDispatchTable__'):
+	# Only the declared types are inherited, the resolved types in the
+	# ancestor's table may be overridden by this class's declarations.
+	if hasattr(t, '__typeDispatchDeclared__'):
 		# Search for types that haven't been defined, yet.
-		for k, v in t.__typeDispatchTable__.iteritems():
+		for k, v in t.__typeDispatchDeclared__.iteritems():
 			if k not in lut:
 				lut[k] = v
 
+def inheritsDispatch(bases, d):
+	# Does __call__ dispatch, or has it been replaced?
+	if '__call__' in d:
+		return False
+
+	for base in bases:
+		for t in inspect.getmro(base):
+			if '__call__' in t.__dict__:
+				if t.__dict__.get('__ownsCall__') or t.__dict__['__call__'] is dispatch__call__:
+					break
+				else:
+					return False
+	return True
+
 class typedispatcher(type):
 	def __new__(self, name, bases, d):
 		lut = {}
@@ -133,9 +231,21 @@ class typedispatcher(type):
 		if None not in lut:
 			raise TypeDispatchDeclarationError, "%s has no default dispatch" % (name,)
 
-		d['__typeDispatchTable__'] = lut
+		d['__typeDispatchDeclared__'] = lut
+		d['__typeDispatchTable__']    = dict(lut)
+		d['__ownsCall__']             = inheritsDispatch(bases, d)
+
+		cls = type.__new__(self, name, bases, d)
+
+		# Resolve the known node types up front, rather than on the first visit.
+		for t in knownTypes:
+			if t not in lut:
+				resolveType(cls, t)
+
+		bindDispatch(cls)
+		dispatcherClasses.append(cls)
 
-		return type.__new__(self, name, bases, d)
+		return cls
 
 class TypeDispatcher(object):
 	__metaclass__    = typedispatcher
@@ -14,4 +14,4 @@
 
 from __future__ import absolute_import
 
-from . kernel import stream, kernel, StreamMismatchError, uniform
+from . kernel import stream, kernel, StreamMismatchError, uniform, setProcesses
@@ -14,7 +14,29 @@
 
 from __future__ import absolute_import
 
+import sys
 import types
+import atexit
+import multiprocessing
+import cPickle
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# Kernels are executed with one of three strategies.
+# A pure kernel whose streams all hold floating point arrays is called once,
+# on the whole arrays.  A pure kernel over long streams may be split into chunks
+# that are run by a pool of processes.  Otherwise, the kernel is called once
+# per element.
+# Pure kernels have no side effects, and do the same thing for every element.
+
+# The number of worker processes for pure kernels, zero runs everything in this process.
+processes = 0
+
+# Streams shorter than this are not worth sending to other processes.
+minimumParallelLength = 4096
 
 def shouldIterate(o, role):
 	return isinstance(o, stream) and role != 'uniform'
@@ -48,6 +70,12 @@ def checkStreams(args, config):
 				raise StreamMismatchError, "Kernel called with streams of different lengths: %s" % str(tuple(lengths))
 	return streams
 
+def streamLength(args, config):
+	for arg, role in zip(args, config.roles):
+		if shouldIterate(arg, role):
+			return len(arg)
+	return 0
+
 
 
 
@@ -73,6 +101,118 @@ def argiterator(args, config):
 	while args:
 		yield [it.next() for it in args]
 
+def serial(f, args, config):
+	out = []
+	for iterargs in argiterator(args, config):
+		out.append(f(*iterargs))
+	return out
+
+
+### Vectorization ###
+
+def isNumericArray(o):
+	return numpy is not None and isinstance(o, numpy.ndarray) and o.dtype.kind in 'biufc'
+
+# NumPy integers wrap on overflow, where Python integers are promoted,
+# so only floating point streams are vectorized.
+def isFloatArray(o):
+	return isNumericArray(o) and o.dtype.kind in 'fc'
+
+def vectorizable(args, config):
+	for arg, role in zip(args, config.roles):
+		if shouldIterate(arg, role) and not isFloatArray(arg.elements):
+			return False
+	return True
+
+def vectorized(f, args, config, length):
+	# Streams become their arrays, uniforms are broadcast by NumPy.
+	args = [arg.elements if shouldIterate(arg, role) else arg for arg, role in zip(args, config.roles)]
+
+	# Division by zero, overflow and invalid operations raise, rather than
+	# quietly producing values the kernel would not produce element by element.
+	try:
+		with numpy.errstate(all='raise'):
+			result = f(*args)
+	except Exception:
+		# The kernel branches on the value of an element, calls a function
+		# that only takes scalars, or hit one of the errors above.
+		# Run it element by element, and let it raise there if it must.
+		return None
+
+	if not isinstance(result, numpy.ndarray) or result.shape[:1] != (length,):
+		return None
+
+	return result
+
+def scalarArgs(args, config):
+	# Python scalars, so arrays that are not vectorized behave as lists would.
+	return [stream(arg.elements.tolist()) if shouldIterate(arg, role) and isNumericArray(arg.elements) else arg for arg, role in zip(args, config.roles)]
+
+
+### Parallel execution ###
+
+pool = None
+
+def closePool():
+	global pool
+	if pool is not None:
+		pool.close()
+		pool.join()
+		pool = None
+
+atexit.register(closePool)
+
+def setProcesses(count):
+	global processes
+	closePool()
+	processes = count
+
+def getPool():
+	global pool
+	if pool is None:
+		pool = multiprocessing.Pool(processes)
+	return pool
+
+def kernelReference(k):
+	# Worker processes find the kernel again by name.
+	# Kernels that are not module globals, such as methods, cannot be sent.
+	f = k.f
+	module = sys.modules.get(getattr(f, '__module__', None))
+	if module is None or getattr(module, f.__name__, None) is not k:
+		return None
+	return (f.__module__, f.__name__)
+
+def runChunk(task):
+	(mname, name), args = task
+	__import__(mname)
+	k = getattr(sys.modules[mname], name)
+	return serial(k.f, args, k.config)
+
+def chunkArgs(args, config, start, stop):
+	return [stream(list(arg.elements[start:stop])) if shouldIterate(arg, role) else arg for arg, role in zip(args, config.roles)]
+
+def parallel(k, args, length):
+	ref = kernelReference(k)
+	if ref is None:
+		return None
+
+	# A few chunks per process, so that uneven chunks balance out.
+	config = k.config
+	chunks = processes*4
+	chunkSize = (length+chunks-1)//chunks
+	tasks = [(ref, chunkArgs(args, config, start, start+chunkSize)) for start in range(0, length, chunkSize)]
+
+	try:
+		cPickle.dumps(tasks[0], 2)
+	except (cPickle.PicklingError, TypeError):
+		# The uniforms cannot be sent.
+		return None
+
+	out = []
+	for chunk in getPool().map(runChunk, tasks):
+		out.extend(chunk)
+	return out
+
 
 class kernel(object):
 	__slots__ = 'f', 'config'
@@ -83,13 +223,29 @@ class kernel(object):
 
 	def __call__(self, *args):
 		if checkStreams(args, self.config):
-			out = []
-			for iterargs in argiterator(args, self.config):
-				out.append(self.f(*iterargs))
-			return stream(out)
+			return stream(self.execute(args))
 		else:
 			return self.f(*args)
 
+	def execute(self, args):
+		config = self.config
+
+		if config.pure and vectorizable(args, config):
+			result = vectorized(self.f, args, config, streamLength(args, config))
+			if result is not None:
+				return result
+
+		args = scalarArgs(args, config)
+
+		if config.pure:
+			length = streamLength(args, config)
+			if processes > 1 and length >= minimumParallelLength:
+				result = parallel(self, args, length)
+				if result is not None:
+					return result
+
+		return serial(self.f, args, config)
+
 	def __get__(self, instance, owner):
 		return types.MethodType(self, instance, owner)
 
@@ -102,25 +258,34 @@ def getArgnames(f):
 	return code.co_varnames[:code.co_argcount]
 
 class KernelConfiguration(object):
-	__slots__ = 'unpack', 'roles'
-	def __init__(self, unpack, roles):
+	__slots__ = 'unpack', 'roles', 'pure'
+	def __init__(self, unpack, roles, pure=False):
 		self.unpack = unpack
 		self.roles  = roles
+		self.pure   = pure
 
 
 
 class KernelConfigAccumulator(object):
-	__slots__ = '_roles', '_unpack'
+	__slots__ = '_roles', '_unpack', '_pure'
 	def __init__(self):
 		self._roles = {}
 		self._unpack = False
+		self._pure = False
 
 	@property
 	def unpack(self):
 		self._unpack = True
+		return self
+
+	@property
+	def pure(self):
+		self._pure = True
+		return self
 
 	def roles(self, **kargs):
 		self._roles = kargs
+		return self
 
 	def __call__(self, f):
 		assert hasattr(f, '__call__')
@@ -136,7 +301,7 @@ class KernelConfigAccumulator(object):
 			else:
 				roleList.append(default)
 
-		return KernelConfiguration(self._unpack, roleList)
+		return KernelConfiguration(self._unpack, roleList, self._pure)
 
 
 
@@ -153,6 +318,12 @@ class KernelDecorator(object):
 		accum.unpack
 		return accum
 
+	@property
+	def pure(self):
+		accum = KernelConfigAccumulator()
+		accum.pure
+		return accum
+
 	def __call__(self, *args, **kargs):
 		accum = KernelConfigAccumulator()
 
@@ -175,10 +346,10 @@ kernel = kerneldecorator
 class stream(object):
 	__slots__ = 'elements'
 	def __init__(self, l=None):
-		if l == None:
+		if l is None:
 			self.elements = []
 		else:
-			assert isinstance(l, list)
+			assert isinstance(l, list) or isNumericArray(l), type(l)
 			self.elements = l
 
 	def __getitem__(self, key):
@@ -190,44 +361,49 @@ class stream(object):
 	def __iter__(self):
 		return iter(self.elements)
 
+	def list(self):
+		if not isinstance(self.elements, list):
+			self.elements = self.elements.tolist()
+		return self.elements
+
 	# HACK?
 	def append(self, value):
-		self.elements.append(value)
+		self.list().append(value)
 
 	# Check writeability?
 	def push(self, value):
-		self.elements.append(value)
+		self.list().append(value)
 
-	@kernel
+	@kernel.pure
 	def __add__(self, other):
 		return self+other
 
-	@kernel
+	@kernel.pure
 	def __sub__(self, other):
 		return self-other
 
-	@kernel
+	@kernel.pure
 	def __mul__(self, other):
 		return self*other
 
-	@kernel
+	@kernel.pure
 	def __div__(self, other):
 		return self/other
 
-	@kernel
+	@kernel.pure
 	def __floordiv__(self, other):
 		return self//other
 
-	@kernel
+	@kernel.pure
 	def __mod__(self, other):
 		return self%other
 
-	@kernel
+	@kernel.pure
 	def __divmod__(self, other):
 		return divmod(self, other)
 
 
-	@kernel
+	@kernel.pure
 	def __pow__(self, other, modulo=None):
 		if modulo == None:
 			return self**other
@@ -237,18 +413,18 @@ class stream(object):
 	# Binary: lshift, rshift, and, or, xor
 	#
 
-	@kernel
+	@kernel.pure
 	def __radd__(self, other):
 		return other+self
 
-	@kernel
+	@kernel.pure
 	def __rsub__(self, other):
 		return other-self
 
-	@kernel
+	@kernel.pure
 	def __rmul__(self, other):
 		return other*self
 
-	@kernel
+	@kernel.pure
 	def __rdiv__(self, other):
 		return other/self
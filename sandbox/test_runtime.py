@@ -15,9 +15,34 @@
 from __future__ import absolute_import
 
 import unittest
+import math
 
 from streamRT import *
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+@kernel.pure
+def scaleOffset(a, scale, offset):
+	return a*scale+offset
+
+@kernel.pure
+def absolute(a):
+	if a < 0:
+		return -a
+	else:
+		return a
+
+@kernel.pure
+def root(a):
+	return math.sqrt(a)
+
+@kernel.pure
+def reciprocal(a):
+	return 1.0/a
+
 class TestFunctionKernel(unittest.TestCase):
 	def setUp(self):
 		self.a = stream([1, 2, 3, 4])
@@ -119,3 +144,57 @@ class TestUniformKernel(unittest.TestCase):
 	def testPureStream(self):
 		out = self.kernel(self.index, self.values)
 		self.assertEqual(out.elements, [2, 8, 6])
+
+class TestPureKernel(unittest.TestCase):
+	def setUp(self):
+		self.values = range(-5000, 5000)
+		self.expected = [v*2+1 for v in self.values]
+
+	def tearDown(self):
+		setProcesses(0)
+
+	def testParallel(self):
+		setProcesses(2)
+		out = scaleOffset(stream(list(self.values)), 2, 1)
+		self.assertEqual(out.elements, self.expected)
+
+	def testLocalKernel(self):
+		# Cannot be found by name, so it runs in this process.
+		@kernel.pure
+		def local(a):
+			return a+1
+
+		setProcesses(2)
+		out = local(stream(list(self.values)))
+		self.assertEqual(out.elements, [v+1 for v in self.values])
+
+	if numpy is not None:
+		def testVectorized(self):
+			out = scaleOffset(stream(numpy.array(self.values, dtype=float)), 2, 1)
+			self.assert_(isinstance(out.elements, numpy.ndarray))
+			self.assertEqual(out.elements.tolist(), self.expected)
+
+		def testVectorizedOperators(self):
+			a = stream(numpy.array([1.0, 2.0, 3.0]))
+			out = a*a+1.0
+			self.assertEqual(out.elements.tolist(), [2.0, 5.0, 10.0])
+
+			out.push(4.0)
+			self.assertEqual(out.elements, [2.0, 5.0, 10.0, 4.0])
+
+		def testBranchingFallback(self):
+			out = absolute(stream(numpy.array([-1.0, 2.0, -3.0])))
+			self.assertEqual(list(out.elements), [1.0, 2.0, 3.0])
+
+		def testScalarFallback(self):
+			out = root(stream(numpy.array([1.0, 4.0, 9.0])))
+			self.assertEqual(out.elements, [1.0, 2.0, 3.0])
+
+		def testDivideByZero(self):
+			# Raises, as it would on a list.
+			self.assertRaises(ZeroDivisionError, reciprocal, stream(numpy.array([1.0, 0.0])))
+
+		def testIntegerOverflow(self):
+			# Not vectorized, so the result is promoted rather than wrapped.
+			out = scaleOffset(stream(numpy.array([2**62])), 4, 0)
+			self.assertEqual(out.elements, [2**64])